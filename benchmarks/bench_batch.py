@@ -0,0 +1,80 @@
+"""
+批量发送基准：不同窗口下服务器每秒发出的数据包数与附加延迟
+
+按固定速率生成频道消息（模拟时钟），经 ChannelBatcher 合并后由 FanoutEngine 真实发送给本机接收端，
+统计数据包数、每秒数据包数（按模拟时长）、发送耗时以及消息的平均附加延迟。
+
+用法: python -m benchmarks.bench_batch [--members 200] [--rate 500] [--duration 1.0] [--windows 0,1,5,10,20]
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import dumps
+from server.utils.batcher import ChannelBatcher
+from server.utils.fanout import FanoutEngine
+
+
+def run(window_ms, members, rate, duration, payload, sock, addrs):
+    engine = FanoutEngine(sock)
+    send = lambda channel, data: engine.send(data, addrs)
+    batcher = ChannelBatcher(send, {"default_window": window_ms / 1000, "channels": {}})
+    count = int(rate * duration)
+    start = time.perf_counter()
+    if window_ms:
+        # 以 0.1ms 为步长推进模拟时钟，窗口到期即发送
+        sent = 0
+        for tick in range(int(duration * 10000) + 1):
+            now = tick / 10000
+            batcher.flush(now)
+            while sent < count and sent / rate <= now:
+                batcher.add("general", payload, now)
+                sent += 1
+        batcher.flush(duration, force=True)
+    else:
+        for _ in range(count):
+            send("general", payload)
+    elapsed = time.perf_counter() - start
+    stats = engine.report()
+    delay = batcher.report()["avg_delay_ms"] if window_ms else 0.0
+    return stats["datagrams"], elapsed, delay
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量发送基准")
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--rate", type=int, default=500, help="频道每秒消息数")
+    parser.add_argument("--duration", type=float, default=1.0, help="模拟时长（秒）")
+    parser.add_argument("--windows", default="0,1,5,10,20", help="窗口大小（毫秒），逗号分隔")
+    args = parser.parse_args()
+
+    receivers = []
+    for _ in range(args.members):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receivers.append(receiver)
+    addrs = [r.getsockname() for r in receivers]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    payload = dumps({
+        "type": "message", "id": 2 ** 60, "sender": "bench", "content": "hello " * 10,
+        "timestamp": str(time.time()), "channel": "general"
+    })
+
+    print(f"成员 {args.members}, 消息速率 {args.rate}/s, 负载 {len(payload)} 字节")
+    print(f"{'窗口':>8} {'数据包':>10} {'包/秒':>12} {'发送耗时':>10} {'平均延迟':>10}")
+    for window_ms in (float(w) for w in args.windows.split(",")):
+        datagrams, elapsed, delay = run(window_ms, args.members, args.rate, args.duration, payload, sock, addrs)
+        print(f"{window_ms:>6.0f}ms {datagrams:>10} {datagrams / args.duration:>12.0f} "
+              f"{elapsed * 1000:>8.1f}ms {delay:>8.2f}ms")
+
+    for receiver in receivers:
+        receiver.close()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
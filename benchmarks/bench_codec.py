@@ -0,0 +1,69 @@
+"""
+JSON 编解码吞吐基准：以 history 消息（50 条频道消息）为负载
+
+对比标准库 json（原先每个字段 isoformat() 后 json.dumps().encode()）与 common.codec 当前后端
+
+用法: python -m benchmarks.bench_codec [--rounds 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import codec
+
+
+def make_history(count=50):
+    now = datetime.now()
+    return [{
+        "id": 100000 + i,
+        "channel_id": 1,
+        "sender_id": i % 7,
+        "content": f"第 {i} 条消息：hello world " * 3,
+        "created_at": now - timedelta(seconds=i),
+        "is_private": False,
+        "recipient_id": None
+    } for i in range(count)]
+
+
+def stdlib_encode(history):
+    return json.dumps({
+        "type": "history",
+        "messages": [{**m, "created_at": m["created_at"].isoformat()} for m in history]
+    }).encode()
+
+
+def codec_encode(history):
+    return codec.dumps({"type": "history", "messages": history})
+
+
+def bench(name, func, arg, rounds, size):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(arg)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {rounds / elapsed:>10,.0f} ops/s  {size * rounds / elapsed / 1e6:>8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 编解码吞吐基准")
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    history = make_history()
+    stdlib_payload = stdlib_encode(history)
+    codec_payload = codec_encode(history)
+
+    print(f"codec 后端: {codec.BACKEND}")
+    bench("encode stdlib", stdlib_encode, history, args.rounds, len(stdlib_payload))
+    bench(f"encode {codec.BACKEND}", codec_encode, history, args.rounds, len(codec_payload))
+    bench("decode stdlib", lambda d: json.loads(d.decode()), stdlib_payload, args.rounds, len(stdlib_payload))
+    bench(f"decode {codec.BACKEND}", codec.loads, codec_payload, args.rounds, len(codec_payload))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+广播基准：1,000 人频道的单条消息扇出耗时
+
+对比:
+- 原始路径: 遍历全部在线客户端，按频道过滤，每个 sendto 各自 try/except
+- 广播引擎: 频道成员索引取地址，FanoutEngine 按批次发送同一份负载
+
+用法: python -m benchmarks.bench_fanout [--members 1000] [--others 1000] [--rounds 200]
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import dumps
+from server.utils.fanout import FanoutEngine
+
+
+def make_receivers(count):
+    receivers = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        receivers.append(sock)
+    return receivers
+
+
+def legacy_broadcast(sock, clients, payload, channel):
+    for username, (addr, user_channel) in clients.items():
+        if user_channel == channel:
+            try:
+                sock.sendto(payload, addr)
+            except Exception as e:
+                print(f"发送消息错误: {str(e)}")
+
+
+def engine_broadcast(engine, clients, members, payload, channel):
+    addrs = [clients[username][0] for username in tuple(members[channel]) if username in clients]
+    engine.send(payload, addrs)
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="广播基准")
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--others", type=int, default=1000, help="其他频道的在线人数")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    receivers = make_receivers(args.members)
+    clients, members = {}, {"general": set(), "random": set()}
+    for i, receiver in enumerate(receivers):
+        clients[f"user{i}"] = (receiver.getsockname(), "general")
+        members["general"].add(f"user{i}")
+    for i in range(args.others):
+        clients[f"other{i}"] = (receivers[i % len(receivers)].getsockname(), "random")
+        members["random"].add(f"other{i}")
+
+    payload = dumps({
+        "type": "message", "sender": "bench", "content": "hello " * 20,
+        "timestamp": str(time.time()), "channel": "general"
+    })
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    engine = FanoutEngine(sock)
+
+    legacy = timed(lambda: legacy_broadcast(sock, clients, payload, "general"), args.rounds)
+    batched = timed(lambda: engine_broadcast(engine, clients, members, payload, "general"), args.rounds)
+
+    print(f"成员 {args.members}, 其他在线 {args.others}, 负载 {len(payload)} 字节")
+    print(f"原始路径   {legacy * 1000:>8.3f} ms/条")
+    print(f"广播引擎   {batched * 1000:>8.3f} ms/条  ({legacy / batched:.2f}x, {engine.backend})")
+    print(f"引擎统计   {engine.report()}")
+
+    for receiver in receivers:
+        receiver.close()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+接收路径分配基准：模拟心跳包洪泛
+
+对比:
+- 原始路径: recvfrom() -> bytes.decode() -> json.loads()
+- 复用缓冲区路径: recvfrom_into(预分配缓冲区) -> codec.loads(memoryview)
+
+用法: python -m benchmarks.bench_recv_alloc [--packets 200000]
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import loads
+from server.utils.recv_buffer import ReceiveBuffer
+
+BATCH = 256
+BUFFER_SIZE = 8192
+
+
+def make_sockets():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    return sender, receiver
+
+
+def recv_copying(receiver):
+    data, addr = receiver.recvfrom(BUFFER_SIZE)
+    return json.loads(data.decode())
+
+
+def make_recv_reused(buf):
+    def recv_reused(receiver):
+        return loads(buf.recv_from(receiver))
+    return recv_reused
+
+
+def run(name, recv, packets):
+    sender, receiver = make_sockets()
+    target = receiver.getsockname()
+    heartbeat = json.dumps({"command": "heartbeat", "username": "bench_user"}).encode()
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_blocks = sys.getallocatedblocks()
+    elapsed = 0.0
+    for _ in range(packets // BATCH):
+        for _ in range(BATCH):
+            sender.sendto(heartbeat, target)
+        start = time.perf_counter()
+        for _ in range(BATCH):
+            recv(receiver)
+        elapsed += time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:<10} {packets / elapsed:>12,.0f} pkt/s  "
+        f"{elapsed / packets * 1e6:>7.2f} us/pkt  "
+        f"峰值内存 {peak / 1024:>8.1f} KiB  "
+        f"存活块增量 {sys.getallocatedblocks() - start_blocks:>6}"
+    )
+    sender.close()
+    receiver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接收路径分配基准")
+    parser.add_argument("--packets", type=int, default=200000)
+    args = parser.parse_args()
+
+    run("recvfrom", recv_copying, args.packets)
+    run("reused", make_recv_reused(ReceiveBuffer(BUFFER_SIZE)), args.packets)
+
+
+if __name__ == "__main__":
+    main()
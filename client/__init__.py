@@ -1,7 +1,20 @@
 """
 聊天客户端模块
+ChatClient（TUI）依赖 Textual，按需导入；无界面客户端只依赖标准库
 """
-from .chat_client import ChatClient
+from .config import ChatConfig
+from .network import NetworkManager
 
 __version__ = "1.0.0"
-__all__ = ['ChatClient']
\ No newline at end of file
+__all__ = ['ChatClient', 'ChatConfig', 'NetworkManager', 'HeadlessClient']
+
+
+def __getattr__(name):
+    # 延迟导入 TUI，避免无界面场景加载 Textual
+    if name == "ChatClient":
+        from .chat_client import ChatClient
+        return ChatClient
+    if name == "HeadlessClient":
+        from .headless import HeadlessClient
+        return HeadlessClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
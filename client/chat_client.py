@@ -1,112 +1,15 @@
 import argparse
 import socket
-import json
 import threading
 import sys
-import time
 from .config import ChatConfig
+from .network import NetworkManager, describe_presence
 from textual.app import App, ComposeResult
 from textual.widgets import Header, Footer, Input, Static, Button, Label, ListView, ListItem
 from textual.containers import Container, Horizontal, Vertical
 from textual.screen import Screen
 from textual.validation import Length
 
-class NetworkManager:
-    def __init__(self, host='127.0.0.1', port=12345):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.settimeout(0.5)  # 设置超时
-        self.server_address = (host, port)
-        self.username = None
-        self.current_channel = "general"
-        self.channels = []
-        self.heartbeat_thread = None
-        self.running = False
-
-    def authenticate(self, username, password):
-        message = json.dumps({
-            "command": "auth",
-            "username": username, 
-            "password": password
-        }).encode()
-        
-        self.socket.sendto(message, self.server_address)
-        try:
-            # 第一个响应：频道列表或失败
-            data, _ = self.socket.recvfrom(4096)
-            response = json.loads(data.decode())
-            
-            # 如果是频道列表，说明认证成功
-            if response.get("type") == "channel_list":
-                self.channels = response.get("channels", [])
-                
-                # 接收历史消息
-                data, _ = self.socket.recvfrom(4096)
-                history = json.loads(data.decode())
-                
-                return {
-                    "status": True,
-                    "channels": self.channels,
-                    "history": history.get("messages", [])
-                }
-            
-            # 如果不是频道列表，可能是认证失败
-            return {"status": False}
-        
-        except Exception as e:
-            print(f"认证错误: {e}")
-            return {"status": False}
-    def register(self, username, password):
-        message = json.dumps({
-            "command": "register",
-            "username": username, 
-            "password": password
-        }).encode()
-        
-        self.socket.sendto(message, self.server_address)
-        data, _ = self.socket.recvfrom(4096)
-        return data.decode() == "REGISTER_SUCCESS"
-
-    def send_message(self, content, recipient=None):
-        message = {
-            "command": "message",
-            "username": self.username,
-            "content": content,
-            "channel": self.current_channel
-        }
-        if recipient:
-            message["recipient"] = recipient
-        
-        encoded_message = json.dumps(message).encode()
-        self.socket.sendto(encoded_message, self.server_address)
-
-    def join_channel(self, channel_name):
-        message = {
-            "command": "join_channel",
-            "username": self.username,
-            "channel": channel_name
-        }
-        encoded_message = json.dumps(message).encode()
-        self.socket.sendto(encoded_message, self.server_address)
-        self.current_channel = channel_name
-
-    def start_heartbeat(self):
-        def heartbeat_loop():
-            while self.running:
-                try:
-                    heartbeat = {
-                        "command": "heartbeat",
-                        "username": self.username
-                    }
-                    self.socket.sendto(json.dumps(heartbeat).encode(), self.server_address)
-                    time.sleep(30)  # 每30秒发送一次心跳
-                except Exception as e:
-                    print(f"心跳错误: {e}")
-                    break
-
-        self.running = True
-        self.heartbeat_thread = threading.Thread(target=heartbeat_loop, daemon=True)
-        self.heartbeat_thread.start()
-
 class AuthScreen(Screen):
     def __init__(self, network_manager):
         super().__init__()
@@ -276,13 +179,25 @@ class ChatScreen(Screen):
     def receive_messages(self):
         while True:
             try:
-                data, _ = self.network_manager.socket.recvfrom(4096)
-                message = json.loads(data.decode())
+                message = self.network_manager.receive()
+                if message is None:
+                    continue
                 
                 # 处理不同类型的消息
                 if message.get("type") == "message":
                     self.received_messages.append(message)
                     self.update_message_list(self.received_messages)
+                elif message.get("type") == "presence":
+                    # 合并后的加入/离开事件
+                    for line in describe_presence(message):
+                        self.received_messages.append({"sender": "system", "content": line})
+                    self.update_message_list(self.received_messages)
+                elif message.get("type") == "offline_messages":
+                    # 离线期间收到的私聊消息，批量到达
+                    for offline_message in message.get("messages", []):
+                        offline_message["is_private"] = True
+                        self.received_messages.append(offline_message)
+                    self.update_message_list(self.received_messages)
             except socket.timeout:
                 continue
             except Exception as e:
@@ -293,6 +208,7 @@ def parse_args():
     parser.add_argument("--host", help="服务器地址")
     parser.add_argument("--port", type=int, help="服务器端口")
     parser.add_argument("--config", help="配置文件路径", default="chat_config.json")
+    parser.add_argument("--reliable", action="store_true", help="启用可靠传输（服务器未启用时回退为普通 UDP）")
     return parser.parse_args()
 
 class ChatClient(App):
@@ -314,7 +230,7 @@ class ChatClient(App):
     """
     def __init__(self, config: ChatConfig):
         super().__init__()
-        self.network_manager = NetworkManager(host=config.host, port=config.port)
+        self.network_manager = NetworkManager(host=config.host, port=config.port, reliable=config.reliable)
 
     def on_mount(self):
         self.push_screen(AuthScreen(self.network_manager))
@@ -331,6 +247,8 @@ def main():
         config.host = args.host
     if args.port:
         config.port = args.port
+    if args.reliable:
+        config.reliable = True
     
     # 保存当前配置
     config.save_to_file(args.config)
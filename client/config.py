@@ -5,6 +5,7 @@ from dataclasses import dataclass
 class ChatConfig:
     host: str = "127.0.0.1"
     port: int = 12345
+    reliable: bool = False
 
     @classmethod
     def load_from_file(cls, filepath: str) -> "ChatConfig":
@@ -22,5 +23,6 @@ class ChatConfig:
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump({
                 "host": self.host,
-                "port": self.port
+                "port": self.port,
+                "reliable": self.reliable
             }, f, ensure_ascii=False, indent=2)
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+无界面客户端：用于机器人、监控探针和压测，不导入 Textual
+
+命令行:
+    python -m client.headless -u alice -p secret send "你好" [--channel general] [--to bob]
+    python -m client.headless -u alice -p secret listen [--count 10] [--duration 30] [--json] [--subscribe random help]
+    python -m client.headless -u alice -p secret join random
+    python -m client.headless -u alice -p secret roster [--channel general]
+
+Python:
+    with HeadlessClient("127.0.0.1", 12345) as client:
+        client.login("alice", "secret")
+        client.send("你好")
+        for message in client.messages(duration=5):
+            print(message)
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from common.codec import dumps
+from .config import ChatConfig
+from .network import NetworkManager, describe_presence
+
+
+class HeadlessClient:
+    """基于 NetworkManager 的脚本化客户端"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 12345, reliable: bool = False):
+        self.network = NetworkManager(host=host, port=port, reliable=reliable)
+        self.channels = []
+        self.history = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def username(self) -> Optional[str]:
+        return self.network.username
+
+    def login(self, username: str, password: str) -> bool:
+        """认证并启动心跳，成功后 channels/history 为服务器返回的频道列表和历史消息"""
+        result = self.network.authenticate(username, password)
+        if not result["status"]:
+            return False
+        self.network.username = username
+        self.channels = result["channels"]
+        self.history = result["history"]
+        self.network.start_heartbeat()
+        return True
+
+    def resume(self, timeout: float = 2.0) -> bool:
+        """地址变化或短暂断开后凭会话令牌恢复，服务器补发的消息随后由 messages() 产出"""
+        if not self.network.resume():
+            return False
+        for message in self.messages(duration=timeout):
+            if message.get("type") == "resumed":
+                return True
+            if message.get("type") == "resume_failed":
+                return False
+        return False
+
+    def send(self, content: str, recipient: str = None, channel: str = None) -> str:
+        """发送消息，返回 client_msg_id"""
+        if channel and channel != self.network.current_channel:
+            self.join(channel)
+        return self.network.send_message(content, recipient)
+
+    def join(self, channel: str, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+        """切换频道，返回服务器确认的频道信息；无权加入或超时返回 None"""
+        self.network.join_channel(channel)
+        for message in self.messages(duration=timeout):
+            if message.get("type") == "channel_denied" and message.get("channel") == channel:
+                return None
+            if message.get("type") == "history":
+                self.history = message.get("messages", [])
+            elif message.get("type") == "channel_joined":
+                return message.get("channel")
+        return None
+
+    def subscribe(self, channels: List[str], timeout: float = 2.0) -> Optional[Dict[str, int]]:
+        """订阅多个频道，返回 {频道: 未读数}；超时返回 None"""
+        self.network.subscribe(channels)
+        for message in self.messages(duration=timeout):
+            if message.get("type") == "subscriptions":
+                return dict(self.network.unread)
+        return None
+
+    def invite(self, channel: str, target: str, timeout: float = 2.0) -> bool:
+        """邀请用户加入私有频道，返回是否成功"""
+        self.network.invite(channel, target)
+        return self._member_result("invite", timeout)
+
+    def kick(self, channel: str, target: str, timeout: float = 2.0) -> bool:
+        """把用户移出私有频道，返回是否成功"""
+        self.network.kick(channel, target)
+        return self._member_result("kick", timeout)
+
+    def _member_result(self, action: str, timeout: float) -> bool:
+        for message in self.messages(duration=timeout):
+            if message.get("type") == "channel_member" and message.get("action") == action:
+                return bool(message.get("ok"))
+        return False
+
+    def roster(self, channel: str = None, timeout: float = 2.0) -> Optional[List[str]]:
+        """返回频道在线成员，超时返回 None"""
+        channel = channel or self.network.current_channel
+        self.network.get_roster(channel)
+        for message in self.messages(duration=timeout):
+            roster = self.network.rosters.get(channel)
+            if message.get("type") == "roster" and message.get("channel") == channel \
+                    and roster and roster.get("complete"):
+                return sorted(roster["members"])
+        return None
+
+    def messages(self, duration: float = None, count: int = None) -> Iterator[Dict[str, Any]]:
+        """逐条产出服务器消息，到达 duration 秒或 count 条后结束，均未指定时一直接收"""
+        deadline = time.monotonic() + duration if duration is not None else None
+        received = 0
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                message = self.network.receive()
+            except socket.timeout:
+                continue
+            if not isinstance(message, dict):
+                continue
+            yield message
+            received += 1
+            if count is not None and received >= count:
+                return
+
+    def close(self):
+        self.network.running = False
+        self.network.session = None
+        self.network.socket.close()
+
+
+def format_message(message: Dict[str, Any]) -> str:
+    """把一条消息格式化为单行文本"""
+    if message.get("type") == "offline_messages":
+        return "\n".join(
+            f"[离线][私聊] {m.get('sender', 'Unknown')}: {m.get('content', '')}"
+            for m in message.get("messages", [])
+        )
+    if message.get("type") == "presence":
+        return "\n".join(f"[{message.get('channel', '')}] {line}" for line in describe_presence(message))
+    if message.get("type") != "message":
+        return dumps(message).decode()
+    prefix = "[私聊] " if message.get("is_private") else f"[{message.get('channel', '')}] "
+    sender = message.get("sender", message.get("sender_id", "Unknown"))
+    return f"{prefix}{sender}: {message.get('content', '')}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="聊天室无界面客户端")
+    parser.add_argument("--host", help="服务器地址")
+    parser.add_argument("--port", type=int, help="服务器端口")
+    parser.add_argument("--config", help="配置文件路径", default="chat_config.json")
+    parser.add_argument("--reliable", action="store_true", help="启用可靠传输（服务器未启用时回退为普通 UDP）")
+    parser.add_argument("-u", "--username", required=True)
+    parser.add_argument("-p", "--password", default=os.environ.get("CHAT_PASSWORD"),
+                        help="密码，默认读取环境变量 CHAT_PASSWORD")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    send = commands.add_parser("send", help="发送一条消息")
+    send.add_argument("content", nargs="+")
+    send.add_argument("--channel", help="发送到的频道")
+    send.add_argument("--to", dest="recipient", help="私聊对象")
+
+    listen = commands.add_parser("listen", help="打印收到的消息")
+    listen.add_argument("--channel", help="先切换到该频道")
+    listen.add_argument("--count", type=int, help="收到多少条后退出")
+    listen.add_argument("--duration", type=float, help="监听多少秒后退出")
+    listen.add_argument("--json", action="store_true", help="每行输出一条原始 JSON")
+    listen.add_argument("--subscribe", nargs="+", default=[], help="同时订阅的其他频道")
+
+    join = commands.add_parser("join", help="切换频道并打印历史消息")
+    join.add_argument("channel")
+
+    roster = commands.add_parser("roster", help="打印频道在线成员")
+    roster.add_argument("--channel", help="频道，默认当前频道")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.password:
+        print("缺少密码：使用 -p 或设置 CHAT_PASSWORD", file=sys.stderr)
+        return 2
+
+    # 只读取配置文件，不回写
+    config = ChatConfig.load_from_file(args.config)
+    host = args.host or config.host
+    port = args.port or config.port
+
+    with HeadlessClient(host, port, reliable=args.reliable or config.reliable) as client:
+        if not client.login(args.username, args.password):
+            print("登录失败", file=sys.stderr)
+            return 1
+
+        if args.command == "send":
+            client.send(" ".join(args.content), args.recipient, args.channel)
+            session = client.network.session
+            if session is not None:
+                # 等待可靠传输确认后再退出
+                deadline = time.monotonic() + 2
+                while session.sender.pending and time.monotonic() < deadline:
+                    for _ in client.messages(duration=0.1):
+                        pass
+        elif args.command == "join":
+            channel = client.join(args.channel)
+            if channel is None:
+                print(f"加入频道失败: {args.channel}", file=sys.stderr)
+                return 1
+            for message in reversed(client.history):
+                print(format_message({"type": "message", "channel": args.channel, **message}))
+        elif args.command == "roster":
+            members = client.roster(args.channel)
+            if members is None:
+                print("获取在线成员超时", file=sys.stderr)
+                return 1
+            print("\n".join(members))
+        elif args.command == "listen":
+            if args.channel and args.channel != client.network.current_channel:
+                client.join(args.channel)
+            if args.subscribe and client.subscribe(args.subscribe) is None:
+                print("订阅频道超时", file=sys.stderr)
+                return 1
+            try:
+                for message in client.messages(args.duration, args.count):
+                    print(dumps(message).decode() if args.json else format_message(message), flush=True)
+            except KeyboardInterrupt:
+                pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from common.codec import dumps, loads
+from common.reliability import ReliableSession, unwrap
+
+def describe_presence(event, limit=5):
+    """把 presence 事件转成可显示的文字，人数较多时只列出前 limit 个"""
+    lines = []
+    for key, action in (("joined", "加入了频道"), ("left", "离开了频道")):
+        names = event.get(key, [])
+        if not names:
+            continue
+        shown = "、".join(names[:limit])
+        if len(names) > limit:
+            shown += f" 等 {len(names)} 人"
+        lines.append(f"{shown} {action}")
+    return lines
+
+class NetworkManager:
+    RETRANSMIT_TICK = 0.05  # 重传线程轮询间隔（秒）
+    RESUME_INTERVAL = 1.0   # 两次会话恢复请求的最小间隔（秒）
+    HEARTBEAT_INTERVAL = 30  # 服务器未下发心跳间隔时的默认值（秒）
+
+    def __init__(self, host='127.0.0.1', port=12345, reliable=False):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # 加大接收缓冲区，减少消息突发时的丢包
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+        self.socket.settimeout(0.5)  # 设置超时
+        self.server_address = (host, port)
+        self.username = None
+        self.current_channel = "general"
+        self.previous_channel = None  # 加入频道被拒绝时退回
+        self.channels = []
+        self.channel_etag = None  # 已缓存频道列表的 ETag，认证和刷新时带上，未变化时服务器不重发
+        self.heartbeat_thread = None
+        self.heartbeat_interval = self.HEARTBEAT_INTERVAL
+        self.last_sent = time.monotonic()  # 最近一次发送命令的时间，空闲时才发送心跳
+        self.running = False
+        # 可选的可靠传输：认证时协商，服务器未启用 RELIABILITY_CONFIG 时回退为普通 UDP
+        self.reliable = reliable
+        self.session = None
+        self._session_lock = threading.Lock()
+        self.retransmit_thread = None
+        # 会话恢复：认证时服务器下发令牌，地址变化后凭令牌恢复并补发错过的消息
+        self.session_token = None
+        self.last_message_id = 0
+        # 服务器批量发送的消息拆开后逐条交给 receive() 的调用方
+        self._inbox = deque()
+        # 频道在线成员缓存 channel -> {"epoch", "version", "members", "parts"}，由 roster 消息增量更新
+        self.rosters = {}
+        self.unread = {}  # 订阅的频道 -> 未读数，切换查看的频道无需重新加载历史
+        self._resume_sent_at = 0.0
+
+    def _send(self, message, reliable=True):
+        """编码并发送命令；可靠会话中的命令带序号并在超时后重传"""
+        payload = dumps(message)
+        self.last_sent = time.monotonic()
+        if self.session is None or not reliable:
+            self.socket.sendto(payload, self.server_address)
+            return
+        with self._session_lock:
+            packets = self.session.sender.send(payload)
+        for packet in packets:
+            self.socket.sendto(packet, self.server_address)
+
+    def receive(self):
+        """
+        接收一条服务器消息
+        可靠会话中自动回复确认；确认包、重复的包和会话控制消息返回 None；
+        batch 数据包拆开后逐条返回
+        """
+        if self._inbox:
+            return self._inbox.popleft()
+        data, _ = self.socket.recvfrom(4096)
+        message = loads(data)
+        if self.session is not None and isinstance(message, dict):
+            message = self._receive_reliable(message)
+        if not isinstance(message, dict):
+            return message
+        if message.get("type") == "batch":
+            for item in message.get("messages", []):
+                item = self._on_session_message(item)
+                if item is not None:
+                    self._inbox.append(item)
+            return self._inbox.popleft() if self._inbox else None
+        return self._on_session_message(message)
+
+    def _receive_reliable(self, message):
+        if message.get("type") == "ack":
+            with self._session_lock:
+                packets = self.session.sender.on_ack(message.get("ack", 0), message.get("sack", ()))
+            for packet in packets:
+                self.socket.sendto(packet, self.server_address)
+            return None
+        seq, body = unwrap(message)
+        if seq is None:
+            return message
+        with self._session_lock:
+            is_new = self.session.receiver.on_packet(seq)
+            ack = {"command": "ack", **self.session.receiver.ack_fields()}
+        self.socket.sendto(dumps(ack), self.server_address)
+        return body if is_new else None
+
+    def _on_session_message(self, message):
+        """记录最后收到的消息 id，处理会话恢复相关的控制消息"""
+        message_type = message.get("type")
+        if message_type == "message":
+            self.last_message_id = max(self.last_message_id, message.get("id") or 0)
+            channel = message.get("channel")
+            if not message.get("is_private") and channel != self.current_channel and channel in self.unread:
+                self.unread[channel] += 1
+        elif message_type == "resume_required":
+            # 服务器发现本端地址已变化
+            self.resume()
+            return None
+        elif message_type == "resumed":
+            self.heartbeat_interval = message.get("heartbeat_interval", self.heartbeat_interval)
+            # 服务器端的可靠会话已丢失时双方重新编号
+            if message.get("reset") and self.session is not None:
+                with self._session_lock:
+                    self.session = ReliableSession()
+        elif message_type == "resume_failed":
+            self.session_token = None
+        elif message_type == "roster":
+            self._apply_roster(message)
+        elif message_type == "channel_list":
+            self._apply_channel_list(message)
+        elif message_type == "subscriptions":
+            self.unread = dict(message.get("unread", {}))
+        elif message_type == "channel_denied":
+            if message.get("channel") == self.current_channel and self.previous_channel:
+                self.current_channel = self.previous_channel
+        elif message_type == "kicked":
+            self.unread.pop(message.get("channel"), None)
+            self.current_channel = message.get("current_channel", self.current_channel)
+        return message
+
+    def _apply_channel_list(self, message):
+        """更新频道列表缓存；not_modified 时沿用已缓存的列表"""
+        if not message.get("not_modified"):
+            self.channels = message.get("channels", [])
+            self.channel_etag = message.get("etag")
+
+    def _apply_roster(self, message):
+        """把完整列表分包或差异合并进本地成员缓存"""
+        channel = message.get("channel")
+        roster = self.rosters.get(channel)
+        if "members" in message:
+            if message.get("part", 0) == 0 or roster is None or roster["version"] != message["version"]:
+                roster = self.rosters[channel] = {
+                    "epoch": message["epoch"],
+                    "version": message["version"],
+                    "members": set(),
+                    "parts": set()
+                }
+            roster["members"].update(message["members"])
+            roster["parts"].add(message.get("part", 0))
+            roster["complete"] = len(roster["parts"]) == message.get("parts", 1)
+        elif roster and roster["epoch"] == message["epoch"] and roster["version"] == message.get("since"):
+            roster["members"].update(message.get("joined", []))
+            roster["members"].difference_update(message.get("left", []))
+            roster["version"] = message["version"]
+
+    def resume(self):
+        """
+        凭会话令牌恢复会话，无需重新认证；结果以 resumed / resume_failed 消息返回，
+        成功后服务器补发 last_message_id 之后错过的消息
+        """
+        now = time.monotonic()
+        if not (self.username and self.session_token) or now - self._resume_sent_at < self.RESUME_INTERVAL:
+            return False
+        self._resume_sent_at = now
+        self._send({
+            "command": "resume",
+            "username": self.username,
+            "token": self.session_token,
+            "last_id": self.last_message_id,
+            "reliable": self.session is not None
+        }, reliable=False)
+        return True
+
+    def _receive_reply(self):
+        """等待下一条非确认消息，超时抛出 socket.timeout"""
+        while True:
+            message = self.receive()
+            if message is not None:
+                return message
+
+    def _start_retransmit(self):
+        def retransmit_loop():
+            while self.session is not None:
+                time.sleep(self.RETRANSMIT_TICK)
+                with self._session_lock:
+                    session = self.session
+                    packets = session.sender.poll() if session and session.sender.in_flight else []
+                for packet in packets:
+                    try:
+                        self.socket.sendto(packet, self.server_address)
+                    except OSError as e:
+                        print(f"重传错误: {e}")
+
+        if self.retransmit_thread is None or not self.retransmit_thread.is_alive():
+            self.retransmit_thread = threading.Thread(target=retransmit_loop, daemon=True)
+            self.retransmit_thread.start()
+
+    def authenticate(self, username, password):
+        message = {
+            "command": "auth",
+            "username": username, 
+            "password": password
+        }
+        if self.channel_etag:
+            message["channel_etag"] = self.channel_etag
+        # 每次认证都与服务器重新建立可靠会话
+        self.session = None
+        if self.reliable:
+            message["reliable"] = True
+            self.session = ReliableSession()
+            self._start_retransmit()
+        
+        self._send(message, reliable=False)
+        try:
+            # 第一个响应：频道列表或失败
+            response = self._receive_reply()
+            
+            # 如果是频道列表，说明认证成功
+            if response.get("type") == "channel_list":
+                # 服务器未启用可靠传输时不带 reliable，之后的命令不再包装
+                if not response.get("reliable"):
+                    self.session = None
+                self.session_token = response.get("session_token")
+                self.heartbeat_interval = response.get("heartbeat_interval", self.HEARTBEAT_INTERVAL)
+                
+                # 接收历史消息；先于历史到达的其他消息（如乱序的订阅、离线消息）留给之后的 receive()
+                early = []
+                history = self._receive_reply()
+                while history.get("type") != "history":
+                    early.append(history)
+                    history = self._receive_reply()
+                self._inbox.extend(early)
+                self.last_message_id = max(
+                    [m.get("id") or 0 for m in history.get("messages", [])], default=0
+                )
+                
+                return {
+                    "status": True,
+                    "channels": self.channels,
+                    "history": history.get("messages", [])
+                }
+            
+            # 如果不是频道列表，可能是认证失败
+            self.session = None
+            return {"status": False}
+        
+        except Exception as e:
+            self.session = None
+            print(f"认证错误: {e}")
+            return {"status": False}
+    def register(self, username, password):
+        message = dumps({
+            "command": "register",
+            "username": username, 
+            "password": password
+        })
+        
+        self.socket.sendto(message, self.server_address)
+        data, _ = self.socket.recvfrom(4096)
+        return data.decode() == "REGISTER_SUCCESS"
+
+    def send_message(self, content, recipient=None, client_msg_id=None):
+        """发送消息并返回其 client_msg_id；重试时传入同一个 id，服务器只处理一次"""
+        client_msg_id = client_msg_id or uuid.uuid4().hex
+        message = {
+            "command": "message",
+            "username": self.username,
+            "content": content,
+            "channel": self.current_channel,
+            "client_msg_id": client_msg_id
+        }
+        if recipient:
+            message["recipient"] = recipient
+        
+        self._send(message)
+        return client_msg_id
+
+    def join_channel(self, channel_name):
+        message = {
+            "command": "join_channel",
+            "username": self.username,
+            "channel": channel_name
+        }
+        self._send(message)
+        self.previous_channel = self.current_channel
+        self.current_channel = channel_name
+
+    def subscribe(self, channels):
+        """订阅多个频道，之后这些频道的消息都会收到；结果以 subscriptions 消息返回并更新 unread"""
+        self._send({
+            "command": "subscribe",
+            "username": self.username,
+            "channels": list(channels)
+        })
+
+    def unsubscribe(self, channels):
+        """取消订阅，结果以 subscriptions 消息返回"""
+        self._send({
+            "command": "unsubscribe",
+            "username": self.username,
+            "channels": list(channels)
+        })
+
+    def view_channel(self, channel_name):
+        """切换到已订阅的频道查看，本地已有其消息，不重新加载历史"""
+        self._send({
+            "command": "view_channel",
+            "username": self.username,
+            "channel": channel_name
+        })
+        self.current_channel = channel_name
+        self.unread[channel_name] = 0
+
+    def invite(self, channel_name, target):
+        """邀请用户加入私有频道（仅频道所有者），结果以 channel_member 消息返回"""
+        self._send({
+            "command": "invite",
+            "username": self.username,
+            "channel": channel_name,
+            "target": target
+        })
+
+    def kick(self, channel_name, target):
+        """把用户移出私有频道（仅频道所有者），结果以 channel_member 消息返回"""
+        self._send({
+            "command": "kick",
+            "username": self.username,
+            "channel": channel_name,
+            "target": target
+        })
+
+    def list_channels(self):
+        """刷新频道列表，结果以 channel_list 消息返回并更新 channels；列表未变化时服务器只回复 not_modified"""
+        message = {
+            "command": "list_channels",
+            "username": self.username
+        }
+        if self.channel_etag:
+            message["etag"] = self.channel_etag
+        self._send(message)
+
+    def list_conversations(self):
+        """请求私聊会话列表，结果以 conversations 消息返回"""
+        message = {
+            "command": "list_conversations",
+            "username": self.username
+        }
+        self._send(message)
+
+    def get_channel_history(self, before_id=None, channel=None):
+        """分页请求频道历史，结果以 history 消息返回；before_id 为已有最早一条消息的 id"""
+        message = {
+            "command": "channel_history",
+            "username": self.username,
+            "channel": channel or self.current_channel
+        }
+        if before_id is not None:
+            message["before_id"] = before_id
+        self._send(message)
+
+    def get_roster(self, channel=None):
+        """请求频道在线成员；本地已有完整缓存时只请求之后的差异，结果合并到 rosters"""
+        channel = channel or self.current_channel
+        message = {
+            "command": "roster",
+            "username": self.username,
+            "channel": channel
+        }
+        roster = self.rosters.get(channel)
+        if roster and roster.get("complete"):
+            message["epoch"] = roster["epoch"]
+            message["version"] = roster["version"]
+        self._send(message)
+
+    def get_private_history(self, peer, before_id=None):
+        """分页请求与 peer 的私聊记录，结果以 private_history 消息返回"""
+        message = {
+            "command": "private_history",
+            "username": self.username,
+            "peer": peer
+        }
+        if before_id is not None:
+            message["before_id"] = before_id
+        self._send(message)
+
+    def start_heartbeat(self):
+        """服务器把任何数据包都视为存活，因此只在空闲 heartbeat_interval 秒后才发送心跳"""
+        def heartbeat_loop():
+            while self.running:
+                try:
+                    idle = time.monotonic() - self.last_sent
+                    if idle >= self.heartbeat_interval:
+                        heartbeat = {
+                            "command": "heartbeat",
+                            "username": self.username
+                        }
+                        # 心跳本身会周期发送，无需重传
+                        self._send(heartbeat, reliable=False)
+                        idle = 0
+                    time.sleep(self.heartbeat_interval - idle)
+                except Exception as e:
+                    print(f"心跳错误: {e}")
+                    break
+
+        self.running = True
+        self.heartbeat_thread = threading.Thread(target=heartbeat_loop, daemon=True)
+        self.heartbeat_thread.start()
@@ -0,0 +1,6 @@
+"""
+客户端与服务器共用的模块
+"""
+from .codec import dumps, loads, BACKEND
+
+__all__ = ['dumps', 'loads', 'BACKEND']
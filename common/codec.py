@@ -0,0 +1,45 @@
+"""
+JSON 编解码
+优先使用 orjson，未安装时回退到标准库 json；两种后端输出格式一致（紧凑、UTF-8、datetime 为 ISO 8601）
+"""
+import json
+from datetime import datetime
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson 的解码错误同样是 json.JSONDecodeError 的子类
+JSONDecodeError = json.JSONDecodeError
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def dumps(obj: Any) -> bytes:
+        """编码为 UTF-8 字节串，datetime 原生序列化"""
+        return orjson.dumps(obj)
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """解码，可直接传入 memoryview 避免复制"""
+        return orjson.loads(data)
+else:
+    BACKEND = "json"
+
+    def _default(obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+
+    def dumps(obj: Any) -> bytes:
+        """编码为 UTF-8 字节串，datetime 转为 ISO 8601 字符串"""
+        return _encoder.encode(obj).encode()
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """解码；memoryview 需先转为 bytes"""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
@@ -0,0 +1,201 @@
+"""
+UDP 可靠传输层（客户端与服务器共用，不涉及 socket）
+
+- 每个会话的每个方向独立编号，序号从 1 开始
+- 接收方回复累计确认 ack（连续收到的最大序号）和选择确认 sack（ack 之后已收到的序号）
+- 发送方维护滑动窗口，超时按 RTT 估计（RFC 6298）重传，重传的包不参与 RTT 采样（Karn 算法）
+- 被选择确认越过 3 次的包立即快速重传
+- 接收方按序号去重，消息到达即交付，不等待前面的空洞
+
+可靠包格式: {"rel": <seq>, "body": <原始负载>}
+确认包格式: 服务器 -> 客户端 {"type": "ack", ...}，客户端 -> 服务器 {"command": "ack", ...}
+"""
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_CONFIG = {
+    "window": 64,           # 最多未确认的包数
+    "backlog": 1024,        # 窗口满时等待发送的队列上限，超出丢弃最旧的
+    "initial_rto": 1.0,     # 初始重传超时（秒）
+    "min_rto": 0.2,
+    "max_rto": 5.0,
+    "max_retries": 8,       # 超过后放弃该包
+    "max_sack": 32,         # 每个确认包携带的 sack 数量上限
+    "fast_retransmit": 3    # 被 sack 越过多少次后快速重传
+}
+
+_PREFIX = b'{"rel":'
+_MIDDLE = b',"body":'
+_SUFFIX = b'}'
+
+
+def wrap(seq: int, payload: bytes) -> bytes:
+    """给已编码的负载加上序号，无需重新编码"""
+    return b"".join((_PREFIX, str(seq).encode(), _MIDDLE, payload, _SUFFIX))
+
+
+class RttEstimator:
+    """按 RFC 6298 估计 RTT 与重传超时"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.min_rto = config["min_rto"]
+        self.max_rto = config["max_rto"]
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.rto = config["initial_rto"]
+
+    def sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(self.max_rto, max(self.min_rto, self.srtt + 4 * self.rttvar))
+
+
+class _InFlight:
+    __slots__ = ("packet", "sent_at", "retries", "skipped")
+
+    def __init__(self, packet: bytes, now: float):
+        self.packet = packet
+        self.sent_at = now
+        self.retries = 0
+        self.skipped = 0
+
+
+class ReliableSender:
+    """发送方状态：序号分配、滑动窗口和重传"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.rtt = RttEstimator(self.config)
+        self.next_seq = 1
+        self.in_flight: "OrderedDict[int, _InFlight]" = OrderedDict()
+        self.backlog: deque = deque()
+        self.retransmits = 0
+        self.lost = 0
+        self.dropped = 0
+
+    def send(self, payload: bytes, now: float = None) -> List[bytes]:
+        """提交一个负载，返回现在可以发出的数据包（窗口满时为空）"""
+        if len(self.backlog) >= self.config["backlog"]:
+            self.backlog.popleft()
+            self.dropped += 1
+        self.backlog.append(payload)
+        return self._fill_window(time.monotonic() if now is None else now)
+
+    def _fill_window(self, now: float) -> List[bytes]:
+        packets = []
+        while self.backlog and len(self.in_flight) < self.config["window"]:
+            seq = self.next_seq
+            self.next_seq += 1
+            packet = wrap(seq, self.backlog.popleft())
+            self.in_flight[seq] = _InFlight(packet, now)
+            packets.append(packet)
+        return packets
+
+    def on_ack(self, ack: int, sack: List[int] = (), now: float = None) -> List[bytes]:
+        """处理确认，返回需要发送的数据包（快速重传及窗口腾出后的新包）"""
+        now = time.monotonic() if now is None else now
+        acked = [seq for seq in self.in_flight if seq <= ack]
+        acked.extend(seq for seq in sack if seq in self.in_flight and seq > ack)
+        for seq in acked:
+            entry = self.in_flight.pop(seq)
+            if entry.retries == 0:
+                self.rtt.sample(now - entry.sent_at)
+
+        packets = []
+        if sack:
+            highest = max(sack)
+            for seq, entry in self.in_flight.items():
+                if seq >= highest:
+                    break
+                entry.skipped += 1
+                if entry.skipped == self.config["fast_retransmit"]:
+                    packets.append(self._retransmit(entry, now))
+        packets.extend(self._fill_window(now))
+        return packets
+
+    def _retransmit(self, entry: _InFlight, now: float) -> bytes:
+        entry.retries += 1
+        entry.sent_at = now
+        self.retransmits += 1
+        return entry.packet
+
+    def poll(self, now: float = None) -> List[bytes]:
+        """返回超时需要重传的数据包；超过重试次数的包被放弃"""
+        now = time.monotonic() if now is None else now
+        packets = []
+        for seq, entry in list(self.in_flight.items()):
+            # 每次重传后该包的超时时间翻倍
+            if now - entry.sent_at < min(self.rtt.rto * (2 ** entry.retries), self.config["max_rto"]):
+                continue
+            if entry.retries >= self.config["max_retries"]:
+                del self.in_flight[seq]
+                self.lost += 1
+                continue
+            packets.append(self._retransmit(entry, now))
+        packets.extend(self._fill_window(now))
+        return packets
+
+    @property
+    def pending(self) -> int:
+        return len(self.in_flight) + len(self.backlog)
+
+
+class ReliableReceiver:
+    """接收方状态：去重并生成累计/选择确认"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.cumulative = 0
+        self.out_of_order = set()
+        self.duplicates = 0
+
+    def on_packet(self, seq: int) -> bool:
+        """记录收到的序号，首次收到返回 True，重复返回 False"""
+        if seq <= self.cumulative or seq in self.out_of_order:
+            self.duplicates += 1
+            return False
+        if seq == self.cumulative + 1:
+            self.cumulative = seq
+            while self.cumulative + 1 in self.out_of_order:
+                self.cumulative += 1
+                self.out_of_order.discard(self.cumulative)
+        else:
+            self.out_of_order.add(seq)
+            # 发送方放弃的包会留下永久空洞，积压过多时跳过空洞
+            if len(self.out_of_order) > self.config["window"] * 4:
+                self.cumulative = min(self.out_of_order)
+                self.out_of_order.discard(self.cumulative)
+                while self.cumulative + 1 in self.out_of_order:
+                    self.cumulative += 1
+                    self.out_of_order.discard(self.cumulative)
+        return True
+
+    def ack_fields(self) -> Dict[str, Any]:
+        """确认包中的 ack/sack 字段"""
+        return {
+            "ack": self.cumulative,
+            "sack": sorted(self.out_of_order)[:self.config["max_sack"]]
+        }
+
+
+class ReliableSession:
+    """一个会话两个方向的可靠传输状态"""
+
+    def __init__(self, config: Dict[str, Any] = None, first_seq: int = None):
+        self.sender = ReliableSender(config)
+        self.receiver = ReliableReceiver(config)
+        if first_seq is not None:
+            # 对端在本端建立会话之前已开始编号（例如服务器重启），从其当前序号接续
+            self.receiver.cumulative = first_seq - 1
+
+
+def unwrap(message: Dict[str, Any]) -> Tuple[Optional[int], Any]:
+    """拆开可靠包，返回 (序号, 负载)；普通包序号为 None"""
+    if isinstance(message, dict) and "rel" in message:
+        return message["rel"], message.get("body")
+    return None, message
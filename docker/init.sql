@@ -38,28 +38,66 @@ CREATE TABLE IF NOT EXISTS channels (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     is_private BOOLEAN DEFAULT FALSE,
     owner_id INT,
+    storage_policy ENUM('persistent', 'ephemeral', 'none') NOT NULL DEFAULT 'persistent',  -- ephemeral 只存 Redis，none 不存
     INDEX idx_name (name),
     FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- 创建私有频道成员表（所有者之外被邀请的用户）
+CREATE TABLE IF NOT EXISTS channel_members (
+    channel_id INT NOT NULL,
+    user_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (channel_id, user_id),
+    INDEX idx_user (user_id),
+    FOREIGN KEY (channel_id) REFERENCES channels(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- 创建消息表
 CREATE TABLE IF NOT EXISTS messages (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT PRIMARY KEY,  -- 服务器生成的 snowflake ID，按时间递增，不使用自增
     channel_id INT NOT NULL,
     sender_id INT NOT NULL,
     content TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     is_private BOOLEAN DEFAULT FALSE,
     recipient_id INT,
-    INDEX idx_channel (channel_id),
+    INDEX idx_channel (channel_id, id),
     INDEX idx_sender (sender_id),
     INDEX idx_recipient (recipient_id),
     INDEX idx_created (created_at),
+    INDEX idx_private_pair (sender_id, recipient_id, id),
     FOREIGN KEY (channel_id) REFERENCES channels(id) ON DELETE CASCADE,
     FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (recipient_id) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- 创建离线私聊消息表（Redis 不可用时的后备存储）
+CREATE TABLE IF NOT EXISTS offline_messages (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    recipient_id INT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_recipient_id (recipient_id, id),
+    FOREIGN KEY (recipient_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 创建私聊会话索引表（有序用户对，维护最后消息和双方未读数）
+CREATE TABLE IF NOT EXISTS conversations (
+    user_low_id INT NOT NULL,
+    user_high_id INT NOT NULL,
+    last_message_id BIGINT,
+    last_message_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+    unread_low INT NOT NULL DEFAULT 0,
+    unread_high INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_low_id, user_high_id),
+    INDEX idx_low_recent (user_low_id, last_message_at),
+    INDEX idx_high_recent (user_high_id, last_message_at),
+    FOREIGN KEY (user_low_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_high_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- 创建默认频道
 INSERT IGNORE INTO channels (name, description) VALUES 
     ('general', '默认通用频道'),
@@ -89,27 +127,62 @@ CREATE TABLE IF NOT EXISTS channels (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     is_private BOOLEAN DEFAULT FALSE,
     owner_id INT,
+    storage_policy ENUM('persistent', 'ephemeral', 'none') NOT NULL DEFAULT 'persistent',  -- ephemeral 只存 Redis，none 不存
     INDEX idx_name (name),
     FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+CREATE TABLE IF NOT EXISTS channel_members (
+    channel_id INT NOT NULL,
+    user_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (channel_id, user_id),
+    INDEX idx_user (user_id),
+    FOREIGN KEY (channel_id) REFERENCES channels(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 CREATE TABLE IF NOT EXISTS messages (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT PRIMARY KEY,  -- 服务器生成的 snowflake ID，按时间递增，不使用自增
     channel_id INT NOT NULL,
     sender_id INT NOT NULL,
     content TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     is_private BOOLEAN DEFAULT FALSE,
     recipient_id INT,
-    INDEX idx_channel (channel_id),
+    INDEX idx_channel (channel_id, id),
     INDEX idx_sender (sender_id),
     INDEX idx_recipient (recipient_id),
     INDEX idx_created (created_at),
+    INDEX idx_private_pair (sender_id, recipient_id, id),
     FOREIGN KEY (channel_id) REFERENCES channels(id) ON DELETE CASCADE,
     FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (recipient_id) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+CREATE TABLE IF NOT EXISTS offline_messages (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    recipient_id INT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_recipient_id (recipient_id, id),
+    FOREIGN KEY (recipient_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS conversations (
+    user_low_id INT NOT NULL,
+    user_high_id INT NOT NULL,
+    last_message_id BIGINT,
+    last_message_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+    unread_low INT NOT NULL DEFAULT 0,
+    unread_high INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_low_id, user_high_id),
+    INDEX idx_low_recent (user_low_id, last_message_at),
+    INDEX idx_high_recent (user_high_id, last_message_at),
+    FOREIGN KEY (user_low_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_high_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- 创建测试数据库的默认频道
 INSERT IGNORE INTO channels (name, description) VALUES 
     ('general', '默认通用频道'),
@@ -0,0 +1,7 @@
+import sys
+
+# 无界面客户端，不导入 Textual
+from client.headless import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,116 @@
 import socket
-import json
 import threading
 import time
+from collections import defaultdict
 from datetime import datetime
 import logging
 
-from .config import HEARTBEAT_CONFIG, SERVER_CONFIG, DB_CONFIG, REDIS_CONFIG, CHANNEL_CONFIG
+from common.codec import dumps, loads, JSONDecodeError
+
+from .config import (
+    HEARTBEAT_CONFIG, SERVER_CONFIG, DB_CONFIG, DB_REPLICA_CONFIGS, REDIS_CONFIG,
+    CHANNEL_CONFIG, CACHE_CONFIG, OFFLINE_CONFIG, MESSAGE_CONFIG, SEND_QUEUE_CONFIG,
+    RELIABILITY_CONFIG, ROSTER_CONFIG, INGRESS_CONFIG, PIPELINE_CONFIG
+)
 from .models.user import User, UserManager
 from .models.message import Message, MessageManager
 from .models.channel import Channel, ChannelManager
+from .models.offline_message import OfflineMessageManager
+from .models.ephemeral_message import EphemeralMessageStore
+from .models.conversation import ConversationManager
 from .utils.database import DatabaseManager
+from .utils.cache import TwoTierCache
+from .utils.recv_buffer import ReceiveBuffer
+from .utils.fanout import FanoutEngine
+from .utils.send_queue import SendQueueManager
+from .utils.reliable_transport import ReliableTransport
+from .utils.dedupe import DedupeWindow
+from .utils.snowflake import SnowflakeGenerator
+from .utils.session import SessionStore
+from .utils.presence import PresenceAggregator
+from .utils.roster import RosterLog
+from .utils.batcher import ChannelBatcher
+from .utils.subscription import SubscriptionStore
+from .utils.scheduler import IngressScheduler
+from .utils.pipeline import Pipeline, Request, RateLimiter
+from .utils.logger import setup_logging
 from .utils.security import SecurityManager
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# 客户端地址变化时的提示，客户端收到后凭令牌恢复会话
+RESUME_REQUIRED = dumps({"type": "resume_required"})
+# 不要求来自用户已登记地址的命令：认证、注册、会话恢复本身，以及可靠传输的确认
+ADDRESS_FREE_COMMANDS = ("auth", "register", "resume", "ack")
 
 class ChatServer:
     def __init__(self, host=SERVER_CONFIG['host'], port=SERVER_CONFIG['port']):
+        # 配置日志：按 LOG_CONFIG 写入轮转文件，写日志只进入内存队列，由后台线程格式化和写出
+        setup_logging()
         self.server_address = (host, port)
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.bind(self.server_address)
+        self._configure_socket_buffers()
+        self.recv_buffer = ReceiveBuffer(SERVER_CONFIG['buffer_size'])
+        self.fanout = FanoutEngine(self.socket)
+        # 可选的可靠传输，接口与广播引擎相同，启用后所有发送都经过它
+        self.transport = None
+        if RELIABILITY_CONFIG["enabled"]:
+            self.transport = ReliableTransport(self.fanout, authorize=self._is_client_addr)
+            self.transport.start()
+        self.outbound = self.transport or self.fanout
+        # 可选的客户端发送队列，未启用时广播直接发出
+        self.send_queues = None
+        if SEND_QUEUE_CONFIG["enabled"]:
+            self.send_queues = SendQueueManager(self.outbound, on_disconnect=self._on_slow_client)
+            self.send_queues.start()
         
         # 客户端连接信息
-        self.clients = {}  # username -> (address, channel)
+        self.clients = {}  # username -> (address, 正在查看的频道)
+        self.channel_members = defaultdict(set)  # channel -> {username}，包括正在查看和订阅了该频道的用户
         self.heartbeats = {}  # username -> timestamp
+        # 客户端重发的消息按 client_msg_id 去重，窗口跨重连保留
+        self.dedupe = DedupeWindow()
+        # 消息 ID 在接收时分配，广播、存储和分页游标使用同一个 ID
+        self.id_generator = SnowflakeGenerator()
+        # 可恢复的会话，地址变化或短暂断开后无需重新认证
+        self.sessions = SessionStore()
+        # 加入/离开按频道合并成 presence 事件，定时发送
+        self.presence = PresenceAggregator(self._emit_to_channel)
+        self.presence.start()
+        # 频道成员列表的版本与变化记录，用于 roster 增量同步
+        self.roster = RosterLog()
+        # 可选的按频道批量发送，BATCH_CONFIG 中窗口大于 0 的频道启用
+        self.batcher = ChannelBatcher(self._emit_to_channel)
+        if self.batcher.enabled:
+            self.batcher.start()
+        else:
+            self.batcher = None
+        # 入站调度：接收循环只解析请求和刷新存活时间，命令由处理线程按优先级执行
+        self.scheduler = None
+        if INGRESS_CONFIG["enabled"]:
+            self.scheduler = IngressScheduler(self._dispatch, self._reply_busy)
+        # 入站管道在接收线程中解码并刷新存活时间；分发管道在处理线程中校验后调用命令处理函数
+        self.ingress = Pipeline(fallback=self._schedule)
+        self.ingress.use("decode", self._decode)
+        self.ingress.use("liveness", self._refresh_liveness)
+        self._build_dispatcher()
         
         # 初始化数据库管理器
-        self.db = DatabaseManager(DB_CONFIG, REDIS_CONFIG)
+        self.db = DatabaseManager(DB_CONFIG, REDIS_CONFIG, DB_REPLICA_CONFIGS)
+        
+        # 初始化两级缓存，并订阅其他进程的失效通知
+        self.cache = TwoTierCache(self.db.redis, CACHE_CONFIG)
+        self.cache.start()
+        
+        # 多频道订阅与未读计数，内存中累加，定时写入 Redis
+        self.subscriptions = SubscriptionStore(self.db.redis)
         
         # 初始化各个管理器
-        self.user_manager = UserManager(self.db)
-        self.message_manager = MessageManager(self.db)
-        self.channel_manager = ChannelManager(self.db)
+        self.user_manager = UserManager(self.db, self.cache)
+        self.message_manager = MessageManager(self.db, self.id_generator)
+        self.channel_manager = ChannelManager(self.db, self.cache)
+        self.offline_manager = OfflineMessageManager(self.db)
+        self.ephemeral_store = EphemeralMessageStore(self.db)
+        self.conversation_manager = ConversationManager(self.db)
         
         logging.info(f"服务器启动于 {host}:{port}")
         
@@ -44,6 +120,18 @@ class ChatServer:
         # 启动心跳检测线程
         threading.Thread(target=self._monitor_heartbeats, daemon=True).start()
 
+    def _configure_socket_buffers(self):
+        """按配置设置 socket 收发缓冲区大小"""
+        for option, key in ((socket.SO_SNDBUF, "send_buffer_size"), (socket.SO_RCVBUF, "recv_buffer_size")):
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, option, SERVER_CONFIG[key])
+            except OSError as e:
+                logging.warning(f"设置 {key} 失败: {str(e)}")
+        logging.info(
+            f"socket 缓冲区: SO_SNDBUF={self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)}, "
+            f"SO_RCVBUF={self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)}"
+        )
+
     def _ensure_system_channels(self):
         """确保系统默认频道存在"""
         for channel_name in CHANNEL_CONFIG['system_channels']:
@@ -52,7 +140,8 @@ class ChatServer:
                     id=None,
                     name=channel_name,
                     description=f"System channel: {channel_name}",
-                    created_at=datetime.now()
+                    created_at=datetime.now(),
+                    storage_policy=CHANNEL_CONFIG["storage_policies"].get(channel_name, "persistent")
                 )
                 self.channel_manager.create_channel(channel)
 
@@ -64,79 +153,264 @@ class ChatServer:
             return user
         return None
 
-    def _store_message(self, message: Message):
-        """存储消息"""
+    def _store_message(self, message: Message, storage_policy="persistent"):
+        """按频道的存储策略存储消息：persistent 写入 MySQL，ephemeral 只写 Redis 缓冲区，none 不存储"""
+        if storage_policy == "ephemeral":
+            return self.ephemeral_store.append(message)
+        if storage_policy == "none":
+            return None
         return self.message_manager.create_message(message)
 
-    def _get_channel_messages(self, channel_name, limit=50):
-        """获取频道消息"""
+    def _get_channel_messages(self, channel_name, limit=50, user_id=None, before_id=None):
+        """获取频道消息，user_id 为读取者，刚发送过消息的用户从主库读取"""
         channel = self.channel_manager.get_channel_by_name(channel_name)
-        if channel:
-            return self.message_manager.get_channel_messages(channel.id, limit)
-        return []
+        if not channel or channel.storage_policy == "none":
+            return []
+        if channel.storage_policy == "ephemeral":
+            return self.ephemeral_store.get_recent(channel.id, limit, before_id=before_id)
+        return self.message_manager.get_channel_messages(
+            channel.id, limit, session=user_id, before_id=before_id
+        )
+
+    def _set_client(self, username, addr, channel):
+        """登记客户端地址和所在频道，同时维护频道成员索引和在线状态"""
+        previous = self.clients.get(username)
+        if previous and previous[1] != channel and not self.subscriptions.is_subscribed(username, previous[1]):
+            self._leave_index(previous[1], username)
+        self.clients[username] = (addr, channel)
+        self._join_index(channel, username)
+
+    def _is_client_addr(self, addr, message):
+        """地址是否属于消息中的已登录用户"""
+        entry = self.clients.get(message.get("username")) if isinstance(message, dict) else None
+        return entry is not None and entry[0] == addr
+
+    def _remove_client(self, username):
+        """移除客户端，返回其 (address, channel)，不存在时返回 None"""
+        entry = self.clients.pop(username, None)
+        if entry:
+            for channel in {entry[1]} | self.subscriptions.channels(username):
+                self._leave_index(channel, username)
+        return entry
+
+    def _join_index(self, channel, username):
+        """把用户加入频道成员索引"""
+        if username not in self.channel_members[channel]:
+            self.channel_members[channel].add(username)
+            self._member_changed(channel, username, True)
+
+    def _leave_index(self, channel, username):
+        """把用户移出频道成员索引，频道没有成员时删除其索引"""
+        members = self.channel_members.get(channel)
+        if members is not None and username in members:
+            members.discard(username)
+            if not members:
+                self.channel_members.pop(channel, None)
+            self._member_changed(channel, username, False)
+
+    def _member_changed(self, channel, username, joined):
+        """频道成员变化：记入 presence 事件和 roster 版本"""
+        if joined:
+            self.presence.joined(channel, username)
+        else:
+            self.presence.left(channel, username)
+        self.roster.record(channel, username, joined)
+
+    def _channel_addresses(self, channel, exclude_username=None):
+        """返回频道内所有成员的地址"""
+        clients = self.clients
+        return [
+            clients[username][0]
+            for username in tuple(self.channel_members.get(channel, ()))
+            if username != exclude_username and username in clients
+        ]
+
+    def _fan_out(self, payload, addrs, key=None):
+        """发送同一份负载给多个地址；启用发送队列时进入各客户端队列"""
+        if self.send_queues:
+            self.send_queues.enqueue(payload, addrs, key)
+        else:
+            self.outbound.send(payload, addrs)
+
+    def _send_to(self, payload, addr):
+        """单独发送给一个客户端，启用可靠传输时同样带序号和重传"""
+        if self.transport:
+            self.transport.send(payload, (addr,))
+        else:
+            self.socket.sendto(payload, addr)
+
+    def _emit_to_channel(self, channel, payload):
+        """发送合并后的 presence 事件或消息批次给频道当前成员"""
+        self._fan_out(payload, self._channel_addresses(channel))
 
-    def _broadcast_message(self, sender, content, channel, exclude_username=None):
-        """广播消息到频道"""
+    def _broadcast_message(self, sender, content, channel, exclude_username=None, message_id=None):
+        """广播消息到频道：只编码一次，由广播引擎批量发送"""
         message = {
             "type": "message",
+            "id": message_id or self.id_generator.next_id(),
             "sender": sender,
             "content": SecurityManager.sanitize_input(content),
             "timestamp": str(time.time()),
             "channel": channel
         }
         
-        encoded_message = json.dumps(message).encode()
-        
-        for username, (addr, user_channel) in self.clients.items():
-            if username != exclude_username and user_channel == channel:
-                try:
-                    self.socket.sendto(encoded_message, addr)
-                except Exception as e:
-                    logging.error(f"发送消息错误: {str(e)}")
+        # 系统消息在 coalesce 策略下可以互相合并
+        key = f"system:{channel}" if sender == "system" else None
+        payload = dumps(message)
+        self.sessions.record_channel(channel, message["id"], payload)
+        # 订阅了该频道但正在查看其他频道的成员累加未读数
+        clients = self.clients
+        self.subscriptions.increment([
+            username for username in tuple(self.channel_members.get(channel, ()))
+            if username != sender and username in clients and clients[username][1] != channel
+        ], channel)
+        if self.batcher and exclude_username is None and self.batcher.window(channel) > 0:
+            # 窗口内的消息合并后每个成员只收到一个数据包
+            self.batcher.add(channel, payload)
+        else:
+            self._fan_out(payload, self._channel_addresses(channel, exclude_username), key)
 
-    def _send_private_message(self, sender: User, recipient: User, content: str, channel: str):
-        """发送私聊消息"""
+    def _send_private_message(self, sender: User, recipient: User, content: str, channel: str,
+                              message_id=None):
+        """发送私聊消息，接收者不在线时放入其离线队列"""
+        message = {
+            "type": "message",
+            "id": message_id or self.id_generator.next_id(),
+            "sender": sender.username,
+            "content": SecurityManager.sanitize_input(content),
+            "timestamp": str(time.time()),
+            "channel": channel,
+            "is_private": True
+        }
+        
+        encoded_message = dumps(message)
+        
+        # 发送给发送者（回显）
+        addrs = [self.clients[sender.username][0]]
+        usernames = [sender.username]
         if recipient.username in self.clients:
-            message = {
-                "type": "message",
-                "sender": sender.username,
-                "content": SecurityManager.sanitize_input(content),
-                "timestamp": str(time.time()),
-                "channel": channel,
-                "is_private": True
-            }
-            
-            encoded_message = json.dumps(message).encode()
-            
-            try:
-                # 发送给接收者
-                self.socket.sendto(encoded_message, self.clients[recipient.username][0])
-                # 发送给发送者（回显）
-                self.socket.sendto(encoded_message, self.clients[sender.username][0])
-                return True
-            except Exception as e:
-                logging.error(f"发送私聊消息错误: {str(e)}")
-                return False
-        return False
+            # 发送给接收者
+            addrs.append(self.clients[recipient.username][0])
+            usernames.append(recipient.username)
+        elif not self.offline_manager.enqueue(recipient.id, message):
+            return False
+        self.sessions.record_private(usernames, message["id"], encoded_message)
+        self._fan_out(encoded_message, addrs)
+        return True
+
+    def _deliver_offline_messages(self, user: User, addr):
+        """登录后批量投递离线私聊消息，每个数据包不超过 max_datagram_size"""
+        messages = self.offline_manager.drain(user.id)
+        if not messages:
+            return
+        
+        prefix = b'{"type":"offline_messages","messages":['
+        suffix = b']}'
+        budget = OFFLINE_CONFIG["max_datagram_size"] - len(prefix) - len(suffix)
+        batch, size = [], 0
+        for message in messages:
+            # 批量包本身表明了类型和私聊属性，去掉重复字段
+            item = dumps({
+                "id": message.get("id"),
+                "sender": message["sender"],
+                "content": message["content"],
+                "timestamp": message["timestamp"],
+                "channel": message["channel"]
+            })
+            if batch and size + len(item) + 1 > budget:
+                self._send_to(prefix + b",".join(batch) + suffix, addr)
+                batch, size = [], 0
+            batch.append(item)
+            size += len(item) + 1
+        self._send_to(prefix + b",".join(batch) + suffix, addr)
+        logging.info("向 %s 投递 %d 条离线消息", user.username, len(messages), extra={"user": user.username})
+    def _report_fanout(self):
+        """汇总上一周期的广播耗时和发送失败的地址"""
+        stats = self.fanout.report()
+        if stats["messages"]:
+            logging.info(
+                f"广播统计: {stats['messages']} 条消息, {stats['datagrams']} 个数据包, "
+                f"平均 {stats['avg_ms']:.3f}ms, 最大 {stats['max_ms']:.3f}ms"
+            )
+        failed = self.fanout.drain_failed()
+        if failed:
+            addrs = {addr for addr, _, _ in failed}
+            logging.warning(f"{len(failed)} 次发送失败, 涉及 {len(addrs)} 个地址, 最近错误: {failed[-1][2]}")
+        if self.send_queues:
+            summary = self.send_queues.summary()
+            if summary["queued"] or summary["drops"]:
+                logging.info(
+                    f"发送队列: {summary['clients']} 个客户端, 积压 {summary['queued']}, "
+                    f"最大深度 {summary['max_depth']}, 累计丢弃 {summary['drops']}, "
+                    f"合并 {summary['coalesced']}, 断开 {summary['disconnects']}"
+                )
+        if self.batcher:
+            stats = self.batcher.report()
+            if stats["messages"]:
+                logging.info(
+                    f"批量发送: {stats['messages']} 条消息合并为 {stats['batches']} 批, "
+                    f"平均延迟 {stats['avg_delay_ms']:.2f}ms"
+                )
+        for name, pipeline in (("入站", self.ingress), ("分发", self.dispatcher)):
+            stages = pipeline.report()
+            if stages:
+                logging.info(f"{name}管道耗时: " + ", ".join(
+                    f"{stage} {stats['count']}次 平均 {stats['avg_ms']:.3f}ms 最大 {stats['max_ms']:.3f}ms"
+                    for stage, stats in stages.items()
+                ))
+        if self.scheduler:
+            stats = self.scheduler.report()
+            if stats["shed"] or stats["queued"]:
+                logging.warning(
+                    f"入站调度: 处理 {stats['processed']}, 拒绝 {stats['shed']}, "
+                    f"积压 {stats['queued']}, 最大排队 {stats['max_wait_ms']:.1f}ms"
+                )
+        if self.transport:
+            summary = self.transport.summary()
+            if summary["in_flight"] or summary["retransmits"]:
+                logging.info(
+                    f"可靠传输: {summary['sessions']} 个会话, 未确认 {summary['in_flight']}, "
+                    f"累计重传 {summary['retransmits']}, 放弃 {summary['lost']}, 重复 {summary['duplicates']}"
+                )
+
+    def _disconnect_client(self, username, reason):
+        """断开客户端并通知其所在频道"""
+        entry = self._remove_client(username)
+        self.heartbeats.pop(username, None)
+        if not entry:
+            return
+        # 会话保留一段时间，客户端可凭令牌恢复
+        self.sessions.detach(username)
+        self.subscriptions.unload(username)
+        addr = entry[0]
+        if self.send_queues:
+            self.send_queues.remove(addr)
+        if self.transport:
+            self.transport.close(addr)
+        # 离开事件由 _remove_client 记入 presence，随下一个窗口发出
+        logging.info("用户 %s %s", username, reason, extra={"sample": "disconnect", "user": username})
+
+    def _on_slow_client(self, addr):
+        """发送队列以 disconnect 策略判定为慢客户端时调用"""
+        for username, (client_addr, _) in list(self.clients.items()):
+            if client_addr == addr:
+                self._disconnect_client(username, "接收过慢被断开")
+                return
+
     def _monitor_heartbeats(self):
         """监控客户端心跳"""
         while True:
             current_time = time.time()
+            self._report_fanout()
+            self.dedupe.prune()
+            self.sessions.prune()
+            self.subscriptions.flush()
+            for limiter in self.rate_limiters.values():
+                limiter.prune()
             for username, last_heartbeat in list(self.heartbeats.items()):
-                # 如果超过心跳超时时间
+                # 如果超过心跳超时时间，从客户端列表中移除
                 if current_time - last_heartbeat > HEARTBEAT_CONFIG['timeout']:
-                    # 从客户端列表中移除
-                    if username in self.clients:
-                        addr, channel = self.clients.pop(username)
-                        # 广播用户离开消息
-                        self._broadcast_message(
-                            "system", 
-                            f"{username} 因心跳超时断开连接", 
-                            channel
-                        )
-                        # 从心跳记录中移除
-                        del self.heartbeats[username]
-                        logging.info(f"用户 {username} 因心跳超时断开连接")
+                    self._disconnect_client(username, "因心跳超时断开连接")
             
             # 每隔一段时间检查一次
             time.sleep(HEARTBEAT_CONFIG['interval'])
@@ -163,6 +437,21 @@ class ChatServer:
             return "REGISTER_FAILED"
 
 
+    def _channel_list_payload(self, etag=None, extra=None):
+        """拼接 channel_list 回复：频道列表使用预先编码好的负载，ETag 匹配时省略"""
+        current_etag, channels = self.channel_manager.get_channel_list()
+        header = {"type": "channel_list", "etag": current_etag, **(extra or {})}
+        if etag == current_etag:
+            header["not_modified"] = True
+            return dumps(header)
+        return dumps(header)[:-1] + b',"channels":' + channels + b'}'
+
+    def _handle_list_channels(self, message, addr):
+        """处理频道列表请求，支持按 ETag 条件获取"""
+        if message.get("username") not in self.clients:
+            return
+        self._send_to(self._channel_list_payload(message.get("etag")), addr)
+
     def _handle_auth(self, message, addr):
         """处理认证请求"""
         username = message["username"]
@@ -175,40 +464,100 @@ class ChatServer:
             
         user = self._authenticate_user(username, password)
         if user:
-            self.clients[username] = (addr, CHANNEL_CONFIG["default_channel"])
+            self._set_client(username, addr, CHANNEL_CONFIG["default_channel"])
+            self._restore_subscriptions(username)
             self.heartbeats[username] = time.time()
+            token = self.sessions.create(username, CHANNEL_CONFIG["default_channel"], self.id_generator.next_id())
+            session_info = {
+                "session_token": token,
+                "heartbeat_interval": HEARTBEAT_CONFIG["client_interval"]
+            }
+            # 客户端声明支持可靠传输时为其建立新会话，否则丢弃该地址上之前的会话
+            # 回复中的 reliable 告知客户端服务器已启用可靠传输，未启用时客户端不得包装命令
+            if self.transport and message.get("reliable"):
+                self.transport.open(addr)
+                session_info["reliable"] = True
+            elif self.transport:
+                self.transport.close(addr)
             
-            # 发送频道列表
-            channels = self.channel_manager.get_public_channels()
-            self.socket.sendto(
-                json.dumps({
-                    "type": "channel_list",
-                    "channels": [c.to_dict() for c in channels]
-                }).encode(),
-                addr
-            )
+            # 发送频道列表，客户端缓存的 ETag 未变化时只回复 not_modified
+            self._send_to(self._channel_list_payload(message.get("channel_etag"), session_info), addr)
             
-            # 发送历史消息
-            history = self._get_channel_messages(CHANNEL_CONFIG["default_channel"])
-            self.socket.sendto(
-                json.dumps({
+            # 发送历史消息，客户端把频道列表之后的第一条回复当作历史
+            history = self._get_channel_messages(CHANNEL_CONFIG["default_channel"], user_id=user.id)
+            self._send_to(
+                dumps({
                     "type": "history",
                     "messages": [m.to_dict() for m in history]
-                }).encode(),
+                }),
                 addr
             )
             
-            # 广播用户加入消息
-            self._broadcast_message(
-                "system", 
-                f"{username} 加入了聊天室", 
-                CHANNEL_CONFIG["default_channel"],
-                username
-            )
-            logging.info(f"用户认证成功: {username}")
+            # 投递离线期间收到的私聊消息
+            self._deliver_offline_messages(user, addr)
+            
+            self._send_subscriptions(username, addr)
+            
+            logging.info("用户认证成功: %s", username, extra={"user": username})
         else:
             self.socket.sendto(b"AUTH_FAILED", addr)
-            logging.warning(f"用户认证失败: {username}")
+            logging.warning("用户认证失败: %s", username, extra={"user": username})
+
+    def _handle_resume(self, message, addr):
+        """处理会话恢复：校验令牌后更新客户端地址并补发错过的消息，无需重新认证"""
+        username = message.get("username")
+        session = self.sessions.resume(username, message.get("token", ""))
+        if session is None:
+            self.socket.sendto(dumps({"type": "resume_failed"}), addr)
+            logging.warning("会话恢复失败: %s", username, extra={"user": username})
+            return
+        
+        entry = self.clients.get(username)
+        old_addr = entry[0] if entry else None
+        reset = False
+        if old_addr is not None and old_addr != addr and self.send_queues:
+            self.send_queues.remove(old_addr)
+        if self.transport and message.get("reliable"):
+            # 旧地址上的可靠会话转移到新地址；已丢失时双方重新编号
+            if old_addr != addr and not (old_addr and self.transport.move(old_addr, addr)):
+                self.transport.open(addr)
+                reset = True
+        # 断开期间可能已被移出私有频道：改回默认频道，不补发原频道的消息
+        denied_channel = None
+        if not self._can_access(username, self.channel_manager.get_channel_by_name(session.channel)):
+            denied_channel = session.channel
+            default_channel = CHANNEL_CONFIG["default_channel"]
+            self.sessions.leave_channel(username, denied_channel, default_channel, self.id_generator.next_id())
+            user = self.user_manager.get_user_by_username(username)
+            if user:
+                self.user_manager.update_user_channel(user.id, default_channel)
+        self._set_client(username, addr, session.channel)
+        self._restore_subscriptions(username)
+        self.heartbeats[username] = time.time()
+        
+        replay = self.sessions.replay(session, message.get("last_id", 0))
+        self.socket.sendto(
+            dumps({
+                "type": "resumed",
+                "channel": session.channel,
+                "replayed": len(replay),
+                "reset": reset,
+                "heartbeat_interval": HEARTBEAT_CONFIG["client_interval"]
+            }),
+            addr
+        )
+        if denied_channel:
+            self._send_to(
+                dumps({"type": "kicked", "channel": denied_channel, "current_channel": session.channel}),
+                addr
+            )
+        for payload in replay:
+            self._send_to(payload, addr)
+        # 其他订阅频道错过的消息不补发，只同步未读数
+        self._send_subscriptions(username, addr)
+        
+        logging.info("用户 %s 恢复会话 %s -> %s, 补发 %d 条消息", username, old_addr, addr, len(replay),
+                     extra={"user": username})
 
     def _handle_message(self, message):
         """处理消息请求"""
@@ -222,16 +571,29 @@ class ChatServer:
             channel = self.channel_manager.get_channel_by_name(channel_name)
             
             if not channel:
-                logging.error(f"频道不存在: {channel_name}")
+                logging.error("频道不存在: %s", channel_name, extra={"user": username})
+                return
+            if not self.channel_manager.can_access(channel, sender.id):
+                logging.warning("用户 %s 无权在私有频道发言: %s", username, channel_name,
+                                extra={"user": username, "channel": channel_name})
+                self._send_to(self._channel_denied(channel_name), self.clients[username][0])
+                return
+            
+            # 超时重发的消息已处理过，不再广播和存储
+            client_msg_id = message.get("client_msg_id")
+            if client_msg_id is not None and self.dedupe.seen(username, client_msg_id):
+                logging.info("丢弃重复消息: %s %s", username, client_msg_id,
+                             extra={"sample": "duplicate_message", "user": username})
                 return
                 
+            message_id = self.id_generator.next_id()
             if recipient_name:
                 recipient = self.user_manager.get_user_by_username(recipient_name)
                 if recipient:
-                    if self._send_private_message(sender, recipient, content, channel_name):
+                    if self._send_private_message(sender, recipient, content, channel_name, message_id):
                         # 创建并存储私聊消息
                         msg = Message(
-                            id=None,
+                            id=message_id,
                             channel_id=channel.id,
                             sender_id=sender.id,
                             content=content,
@@ -241,16 +603,16 @@ class ChatServer:
                         )
                         self._store_message(msg)
             else:
-                self._broadcast_message(username, content, channel_name)
+                self._broadcast_message(username, content, channel_name, message_id=message_id)
                 # 创建并存储公共消息
                 msg = Message(
-                    id=None,
+                    id=message_id,
                     channel_id=channel.id,
                     sender_id=sender.id,
                     content=content,
                     created_at=datetime.now()
                 )
-                self._store_message(msg)
+                self._store_message(msg, channel.storage_policy)
 
     def _handle_heartbeat(self, message):
         """处理心跳包"""
@@ -264,7 +626,7 @@ class ChatServer:
         new_channel_name = message["channel"]
         
         if username not in self.clients:
-            logging.warning(f"未认证的用户尝试加入频道: {username}")
+            logging.warning("未认证的用户尝试加入频道: %s", username, extra={"sample": "unauthenticated"})
             return
             
         # 获取用户和频道信息
@@ -272,87 +634,469 @@ class ChatServer:
         new_channel = self.channel_manager.get_channel_by_name(new_channel_name)
         
         if not new_channel:
-            logging.error(f"尝试加入不存在的频道: {new_channel_name}")
+            logging.error("尝试加入不存在的频道: %s", new_channel_name, extra={"user": username})
             return
         
         addr = self.clients[username][0]
+        if not self.channel_manager.can_access(new_channel, user.id):
+            logging.warning("用户 %s 无权加入私有频道: %s", username, new_channel_name,
+                            extra={"user": username, "channel": new_channel_name})
+            self._send_to(self._channel_denied(new_channel_name), addr)
+            return
+        
         old_channel_name = self.clients[username][1]
         
         # 更新用户频道
-        self.clients[username] = (addr, new_channel_name)
+        self._set_client(username, addr, new_channel_name)
+        self.sessions.set_channel(username, new_channel_name, self.id_generator.next_id())
         self.user_manager.update_user_channel(user.id, new_channel_name)
+        self.subscriptions.clear(username, new_channel_name)
         
         try:
             # 获取新频道的历史消息
-            history = self._get_channel_messages(new_channel_name)
-            self.socket.sendto(
-                json.dumps({
+            history = self._get_channel_messages(new_channel_name, user_id=user.id)
+            self._send_to(
+                dumps({
                     "type": "history",
                     "messages": [m.to_dict() for m in history]
-                }).encode(),
+                }),
                 addr
             )
             
-            # 在旧频道广播离开消息
-            self._broadcast_message(
-                "system",
-                f"{username} 离开了频道",
-                old_channel_name
-            )
-            
-            # 在新频道广播加入消息
-            self._broadcast_message(
-                "system",
-                f"{username} 加入了频道",
-                new_channel_name
-            )
+            # 离开旧频道、加入新频道的事件已由 _set_client 记入 presence
             
             # 发送频道信息确认
             channel_info = {
                 "type": "channel_joined",
                 "channel": new_channel.to_dict()
             }
-            self.socket.sendto(json.dumps(channel_info).encode(), addr)
+            self._send_to(dumps(channel_info), addr)
             
-            logging.info(f"用户 {username} 从 {old_channel_name} 切换到 {new_channel_name}")
+            logging.info("用户 %s 从 %s 切换到 %s", username, old_channel_name, new_channel_name,
+                         extra={"sample": "join_channel", "user": username, "channel": new_channel_name})
             
         except Exception as e:
-            logging.error(f"处理加入频道请求时出错: {str(e)}")
+            logging.error("处理加入频道请求时出错: %s", e, extra={"user": username})
             # 出错时回退到原频道
-            self.clients[username] = (addr, old_channel_name)
+            self._set_client(username, addr, old_channel_name)
+            self.sessions.set_channel(username, old_channel_name, self.id_generator.next_id())
             self.user_manager.update_user_channel(user.id, old_channel_name)
+    def _restore_subscriptions(self, username):
+        """登录或恢复会话时载入订阅，把用户加入各订阅频道的成员索引；已无权访问的频道取消订阅"""
+        channels = list(self.subscriptions.load(username))
+        denied = [
+            channel for channel in channels
+            if not self._can_access(username, self.channel_manager.get_channel_by_name(channel))
+        ]
+        self.subscriptions.unsubscribe(username, denied)
+        for channel in channels:
+            if channel not in denied:
+                self._join_index(channel, username)
+
+    def _send_subscriptions(self, username, addr):
+        """发送当前订阅的频道及各自的未读数"""
+        self._send_to(
+            dumps({
+                "type": "subscriptions",
+                "channel": self.clients[username][1],
+                "unread": self.subscriptions.unread(username)
+            }),
+            addr
+        )
+
+    def _handle_subscribe(self, message):
+        """处理订阅请求：一次订阅多个频道，之后这些频道的消息都会发给该用户"""
+        username = message["username"]
+        if username not in self.clients:
+            return
+        
+        channels = [
+            name for name in message.get("channels", [])
+            if self._can_access(username, self.channel_manager.get_channel_by_name(name))
+        ]
+        for channel in self.subscriptions.subscribe(username, channels):
+            self._join_index(channel, username)
+        self._send_subscriptions(username, self.clients[username][0])
+
+    def _handle_unsubscribe(self, message):
+        """处理取消订阅请求，正在查看的频道仍保留在成员索引中"""
+        username = message["username"]
+        if username not in self.clients:
+            return
+        
+        addr, current_channel = self.clients[username]
+        for channel in self.subscriptions.unsubscribe(username, message.get("channels", [])):
+            if channel != current_channel:
+                self._leave_index(channel, username)
+        self._send_subscriptions(username, addr)
+
+    def _handle_view_channel(self, message):
+        """
+        切换正在查看的已订阅频道：客户端已有该频道的消息，不重新加载历史，
+        只更新所在频道并清零未读数
+        """
+        username = message["username"]
+        channel = message.get("channel")
+        if username not in self.clients:
+            return
+        if not self.subscriptions.is_subscribed(username, channel):
+            logging.warning("用户 %s 尝试查看未订阅的频道: %s", username, channel, extra={"user": username})
+            return
+        
+        self._set_client(username, self.clients[username][0], channel)
+        self.sessions.set_channel(username, channel, self.id_generator.next_id())
+        self.subscriptions.clear(username, channel)
+
+    def _can_access(self, username, channel):
+        """频道存在且用户有权访问；私有频道的成员集合在内存中，不增加数据库查询"""
+        if channel is None:
+            return False
+        if not channel.is_private:
+            return True
+        user = self.user_manager.get_user_by_username(username)
+        return user is not None and self.channel_manager.can_access(channel, user.id)
+
+    @staticmethod
+    def _channel_denied(channel_name):
+        return dumps({"type": "channel_denied", "channel": channel_name})
+
+    def _handle_channel_member(self, message, invite):
+        """处理私有频道的邀请 (invite) 和移出 (kick)，只有频道所有者可以操作"""
+        username = message["username"]
+        if username not in self.clients:
+            return
+        
+        addr = self.clients[username][0]
+        user = self.user_manager.get_user_by_username(username)
+        channel = self.channel_manager.get_channel_by_name(message.get("channel", ""))
+        target = self.user_manager.get_user_by_username(message.get("target", ""))
+        ok = bool(
+            channel and target and channel.is_private
+            and channel.owner_id == user.id and target.id != user.id
+        )
+        if ok:
+            if invite:
+                ok = self.channel_manager.add_member(channel.id, target.id)
+            else:
+                ok = self.channel_manager.remove_member(channel.id, target.id)
+        self._send_to(
+            dumps({
+                "type": "channel_member",
+                "action": "invite" if invite else "kick",
+                "channel": message.get("channel"),
+                "target": message.get("target"),
+                "ok": ok
+            }),
+            addr
+        )
+        if not ok:
+            return
+        
+        logging.info("用户 %s %s %s 频道 %s", username, "邀请" if invite else "移出", target.username, channel.name,
+                     extra={"user": username, "channel": channel.name})
+        if target.username not in self.clients:
+            if not invite:
+                # 离线但会话仍可恢复的用户：会话改回默认频道，恢复时不会回到被移出的频道
+                self.sessions.leave_channel(
+                    target.username, channel.name, CHANNEL_CONFIG["default_channel"], self.id_generator.next_id()
+                )
+            return
+        target_addr = self.clients[target.username][0]
+        if invite:
+            self._send_to(dumps({"type": "invited", "channel": channel.name, "by": username}), target_addr)
+        else:
+            self._evict_from_channel(target, channel.name)
+
+    def _evict_from_channel(self, user: User, channel_name):
+        """被移出私有频道的在线用户：取消订阅，正在查看该频道时切回默认频道"""
+        addr, current_channel = self.clients[user.username]
+        if self.subscriptions.unsubscribe(user.username, [channel_name]) and channel_name != current_channel:
+            self._leave_index(channel_name, user.username)
+        if channel_name == current_channel:
+            default_channel = CHANNEL_CONFIG["default_channel"]
+            self._set_client(user.username, addr, default_channel)
+            self.sessions.set_channel(user.username, default_channel, self.id_generator.next_id())
+            self.user_manager.update_user_channel(user.id, default_channel)
+        self._send_to(
+            dumps({"type": "kicked", "channel": channel_name, "current_channel": self.clients[user.username][1]}),
+            addr
+        )
+
+    def _handle_list_conversations(self, message):
+        """处理会话列表请求"""
+        username = message["username"]
+        if username not in self.clients:
+            return
+        
+        user = self.user_manager.get_user_by_username(username)
+        conversations = self.conversation_manager.list_conversations(user.id)
+        self._send_to(
+            dumps({
+                "type": "conversations",
+                "conversations": [c.to_dict() for c in conversations]
+            }),
+            self.clients[username][0]
+        )
+
+    def _handle_channel_history(self, message):
+        """处理频道历史分页请求，before_id 为上一页最后一条消息的 id"""
+        username = message["username"]
+        if username not in self.clients:
+            return
+        
+        addr, current_channel = self.clients[username]
+        channel_name = message.get("channel", current_channel)
+        if not self._can_access(username, self.channel_manager.get_channel_by_name(channel_name)):
+            self._send_to(self._channel_denied(channel_name), addr)
+            return
+        user = self.user_manager.get_user_by_username(username)
+        history = self._get_channel_messages(
+            channel_name,
+            min(int(message.get("limit", MESSAGE_CONFIG["history_limit"])), MESSAGE_CONFIG["history_limit"]),
+            user_id=user.id,
+            before_id=message.get("before_id")
+        )
+        self._send_to(
+            dumps({
+                "type": "history",
+                "channel": channel_name,
+                "messages": [m.to_dict() for m in history]
+            }),
+            addr
+        )
+
+    def _handle_roster(self, message):
+        """
+        处理在线成员列表请求
+        客户端带上已有的 epoch 和 version 时只返回之后的差异，无法计算差异时分包返回完整列表
+        """
+        username = message["username"]
+        if username not in self.clients:
+            return
+        
+        addr, current_channel = self.clients[username]
+        channel = message.get("channel", current_channel)
+        if channel != current_channel and not self._can_access(username, self.channel_manager.get_channel_by_name(channel)):
+            self._send_to(self._channel_denied(channel), addr)
+            return
+        max_names = ROSTER_CONFIG["max_names"]
+        base = {"type": "roster", "channel": channel, "epoch": self.roster.epoch}
+        
+        since = message.get("version")
+        diff = self.roster.diff(channel, since, message.get("epoch")) if since is not None else None
+        if diff and len(diff[1]) + len(diff[2]) <= max_names:
+            version, joined, left = diff
+            self._send_to(dumps({**base, "version": version, "since": since, "joined": joined, "left": left}), addr)
+            return
+        
+        version = self.roster.version(channel)
+        members = sorted(self.channel_members.get(channel, ()))
+        parts = max(1, (len(members) + max_names - 1) // max_names)
+        for part in range(parts):
+            self._send_to(dumps({
+                **base,
+                "version": version,
+                "members": members[part * max_names:(part + 1) * max_names],
+                "part": part,
+                "parts": parts
+            }), addr)
+
+    def _handle_private_history(self, message):
+        """处理私聊历史分页请求，并清零该会话的未读数"""
+        username = message["username"]
+        if username not in self.clients:
+            return
+        
+        user = self.user_manager.get_user_by_username(username)
+        peer = self.user_manager.get_user_by_username(message["peer"])
+        if not peer:
+            logging.warning("私聊对象不存在: %s", message["peer"], extra={"user": username})
+            return
+        
+        history = self.message_manager.get_private_messages(
+            user.id,
+            peer.id,
+            min(int(message.get("limit", MESSAGE_CONFIG["history_limit"])), MESSAGE_CONFIG["history_limit"]),
+            message.get("before_id")
+        )
+        self.conversation_manager.mark_read(user.id, peer.id)
+        self._send_to(
+            dumps({
+                "type": "private_history",
+                "peer": peer.username,
+                "messages": [m.to_dict() for m in history]
+            }),
+            self.clients[username][0]
+        )
+
+    def _build_dispatcher(self):
+        """分发管道：异常、会话、校验、限速，最后调用命令处理函数"""
+        self.dispatcher = Pipeline(fallback=self._unknown_command)
+        self.dispatcher.use("errors", self._catch_errors)
+        self.dispatcher.use("session", self._resolve_session)
+        self.dispatcher.use("validate", self._validate)
+        self.dispatcher.use("rate_limit", self._rate_limit)
+        # 只有 PIPELINE_CONFIG["rate_limits"] 中配置的命令才限速
+        self.rate_limiters = {
+            command: RateLimiter(limit["per_minute"], limit["burst"])
+            for command, limit in PIPELINE_CONFIG["rate_limits"].items()
+        }
+        self._register_handlers()
+
+    def _register_handlers(self):
+        """注册内置命令；其他模块可通过 server.dispatcher.register 添加或替换命令"""
+        register = self.dispatcher.register
+        register("auth", lambda request: self._handle_auth(request.message, request.addr),
+                 public=True, fields=("username", "password"))
+        register("register", self._handle_register, public=True, fields=("username", "password"))
+        register("resume", lambda request: self._handle_resume(request.message, request.addr),
+                 public=True, fields=("username",))
+        register("message", lambda request: self._handle_message(request.message), fields=("content",))
+        register("heartbeat", lambda request: self._handle_heartbeat(request.message))
+        register("join_channel", lambda request: self._handle_join_channel(request.message), fields=("channel",))
+        register("list_conversations", lambda request: self._handle_list_conversations(request.message))
+        register("channel_history", lambda request: self._handle_channel_history(request.message))
+        register("private_history", lambda request: self._handle_private_history(request.message),
+                 fields=("peer",))
+        register("roster", lambda request: self._handle_roster(request.message))
+        register("list_channels", lambda request: self._handle_list_channels(request.message, request.addr))
+        register("subscribe", lambda request: self._handle_subscribe(request.message), fields=("channels",))
+        register("unsubscribe", lambda request: self._handle_unsubscribe(request.message), fields=("channels",))
+        register("view_channel", lambda request: self._handle_view_channel(request.message), fields=("channel",))
+        register("invite", lambda request: self._handle_channel_member(request.message, invite=True),
+                 fields=("channel", "target"))
+        register("kick", lambda request: self._handle_channel_member(request.message, invite=False),
+                 fields=("channel", "target"))
+
+    def _handle_register(self, request):
+        """处理注册请求"""
+        if self._register_user(request.message["username"], request.message["password"]):
+            self.socket.sendto(b"REGISTER_SUCCESS", request.addr)
+        else:
+            self.socket.sendto(b"REGISTER_FAILED", request.addr)
+
+    def _decode(self, request, call_next):
+        """入站阶段：解析数据报，启用可靠传输时消化确认包并为可靠包回复确认"""
+        try:
+            message = loads(request.data)
+        except JSONDecodeError as e:
+            logging.error("JSON解析错误: %s", e, extra={"addr": request.addr})
+            return
+        if self.transport:
+            # 重复的包直接丢弃
+            message = self.transport.receive(request.addr, message)
+            if message is None:
+                return
+        if not isinstance(message, dict):
+            return
+        request.message = message
+        request.command = message.get("command")
+        request.username = message.get("username")
+        call_next(request)
+
+    def _refresh_liveness(self, request, call_next):
+        """
+        入站阶段：刷新存活时间，不受之后排队的影响
+        已登录用户的数据包来自新地址时只提示客户端恢复会话，不执行命令
+        """
+        if request.command not in ADDRESS_FREE_COMMANDS:
+            client = self.clients.get(request.username)
+            if client:
+                if client[0] != request.addr:
+                    self.socket.sendto(RESUME_REQUIRED, request.addr)
+                    return
+                # 任何有效的数据包都视为存活，客户端只在空闲时才需要发送心跳
+                self.heartbeats[request.username] = time.time()
+        call_next(request)
+
+    def _schedule(self, request):
+        """入站管道末端：交给入站调度按优先级处理，未启用时直接分发"""
+        if self.scheduler:
+            self.scheduler.submit(request.message, request.addr)
+        else:
+            self._dispatch(request.message, request.addr)
+
+    def _dispatch(self, message, addr):
+        """按命令分发请求"""
+        self.dispatcher.handle(Request(addr, message=message))
+
+    def _catch_errors(self, request, call_next):
+        """分发阶段：处理函数的异常只记录，不影响后续请求"""
+        try:
+            call_next(request)
+        except Exception:
+            logging.exception("处理消息错误: %s", request.command, extra={"user": request.username})
+
+    def _resolve_session(self, request, call_next):
+        """分发阶段：除 auth/register/resume 等公开命令外，要求用户已登录"""
+        registration = self.dispatcher.registration(request.command)
+        if registration is None or registration.public:
+            call_next(request)
+            return
+        request.client = self.clients.get(request.username)
+        if request.client is None:
+            logging.warning("未认证的用户发送命令: %s %s", request.command, request.username,
+                            extra={"sample": "unauthenticated"})
+            return
+        call_next(request)
+
+    def _validate(self, request, call_next):
+        """分发阶段：检查必需字段；开启 enforce_max_length 时丢弃超过 max_length 的消息"""
+        registration = self.dispatcher.registration(request.command)
+        if registration:
+            missing = [field for field in registration.fields if field not in request.message]
+            if missing:
+                logging.warning("命令 %s 缺少字段: %s", request.command, missing, extra={"user": request.username})
+                return
+        if (PIPELINE_CONFIG["enforce_max_length"] and request.command == "message"
+                and len(str(request.message["content"])) > MESSAGE_CONFIG["max_length"]):
+            logging.warning("消息过长被丢弃: %s", request.username, extra={"user": request.username})
+            return
+        call_next(request)
+
+    def _rate_limit(self, request, call_next):
+        """分发阶段：按命令限速，超出时回复 rate_limited 及需要等待的时间"""
+        limiter = self.rate_limiters.get(request.command)
+        if limiter is not None:
+            # 已登录用户按用户名限速，公开命令（如注册）按来源地址限速
+            source = request.username if request.client else request.addr[0]
+            key = SecurityManager.rate_limit_key(source, request.command)
+            allowed, retry_after = limiter.allow(key)
+            if not allowed:
+                logging.info("限速拒绝: %s %s", request.command, source,
+                             extra={"sample": "rate_limited", "user": request.username})
+                self._send_to(
+                    dumps({"type": "rate_limited", "command": request.command, "retry_after": round(retry_after, 2)}),
+                    request.addr
+                )
+                return
+        call_next(request)
+
+    def _unknown_command(self, request):
+        logging.warning("未知命令: %s", request.command, extra={"addr": request.addr})
+
+    def _reply_busy(self, message, addr, retry_after):
+        """过载时拒绝请求，提示客户端 retry_after 秒后重试"""
+        self._send_to(
+            dumps({"type": "busy", "command": message.get("command"), "retry_after": retry_after}),
+            addr
+        )
+
     def run(self):
-        """运行服务器主循环"""
+        """运行服务器主循环：接收请求交给入站管道，启用入站调度时由处理线程按优先级处理"""
+        if self.scheduler:
+            self.scheduler.start()
+        buf = self.recv_buffer
         while True:
             try:
-                data, addr = self.socket.recvfrom(SERVER_CONFIG['buffer_size'])
-                message = json.loads(data.decode())
-                command = message.get("command")
-                
-                if command == "auth":
-                    self._handle_auth(message, addr)
-                elif command == "register":  # 新增注册处理
-                    username = message["username"]
-                    password = message["password"]
-                    
-                    if self._register_user(username, password):
-                        self.socket.sendto(b"REGISTER_SUCCESS", addr)
-                    else:
-                        self.socket.sendto(b"REGISTER_FAILED", addr)
-                elif command == "message":
-                    self._handle_message(message)
-                elif command == "heartbeat":
-                    self._handle_heartbeat(message)
-                elif command == "join_channel":
-                    self._handle_join_channel(message)
-                else:
-                    logging.warning(f"未知命令: {command}")
-                
-            except json.JSONDecodeError as e:
-                logging.error(f"JSON解析错误: {str(e)}")
+                # 接收到预分配的缓冲区，并直接从缓冲区解析；解码在下一次接收前完成
+                data = buf.recv_from(self.socket)
+                if buf.truncated:
+                    logging.warning("数据报超过 %d 字节，已丢弃", buf.size, extra={"addr": buf.addr})
+                    continue
+                self.ingress.handle(Request(buf.addr, data))
             except Exception as e:
-                logging.error(f"处理消息错误: {str(e)}")
-                continue
+                logging.error("处理消息错误: %s", e)
 
 if __name__ == "__main__":
     try:
@@ -6,7 +6,9 @@
 SERVER_CONFIG = {
     "host": "0.0.0.0",
     "port": 12345,
-    "buffer_size": 8192
+    "buffer_size": 8192,
+    "send_buffer_size": 4 * 1024 * 1024,  # SO_SNDBUF（受内核 wmem_max 限制）
+    "recv_buffer_size": 4 * 1024 * 1024   # SO_RCVBUF（受内核 rmem_max 限制）
 }
 
 # MySQL数据库配置
@@ -31,6 +33,17 @@ DB_CONFIG = {
     "get_warnings": True,      # 获取警告
     "unix_socket": None       # 强制使用TCP/IP连接
 }
+# MySQL只读副本配置，每项只需写出与 DB_CONFIG 不同的字段
+DB_REPLICA_CONFIGS = [
+    # {"host": "replica1", "port": 13307},
+]
+
+# 副本路由配置
+REPLICA_CONFIG = {
+    "health_check_interval": 5,     # 副本健康检查间隔（秒）
+    "read_your_writes_window": 5    # 会话写入后多长时间内读主库（秒）
+}
+
 # Redis配置
 REDIS_CONFIG = {
     "host": "localhost",
@@ -42,6 +55,28 @@ REDIS_CONFIG = {
     "retry_on_timeout": True    # 超时重试
 }
 
+# 异步数据库连接池配置（AsyncDatabaseManager 使用）
+ASYNC_DB_CONFIG = {
+    "minsize": 5,            # 最小连接数
+    "maxsize": 100,          # 最大连接数，不受线程数限制
+    "pool_recycle": 3600,    # 连接回收时间（秒）
+    "acquire_timeout": 10    # 获取连接的最长等待时间（秒）
+}
+
+# 缓存配置（进程内 L1 + Redis L2）
+CACHE_CONFIG = {
+    "local_max_size": 10000,                   # L1 最大条目数
+    "load_timeout": 5,                         # 等待其他线程加载同一键的最长时间（秒）
+    "invalidation_channel": "cache:invalidate",  # 失效消息的 pub/sub 频道
+    # 按查询类型启用缓存，值为 TTL（秒），未列出或为 0 表示不缓存
+    "policies": {
+        "user_by_username": 300,
+        "channel_by_name": 600,
+        "channel_by_id": 600,
+        "public_channels": 600
+    }
+}
+
 # 安全配置
 SECURITY_CONFIG = {
     "password_salt_size": 16,
@@ -58,7 +93,113 @@ MESSAGE_CONFIG = {
     "history_limit": 50,
     "rate_limit": 10,  # 每分钟最大消息数
     "flood_protection": True,
-    "max_attachments": 5
+    "max_attachments": 5,
+    "dedupe_window": 1024,   # 每个会话记住的客户端消息 id 数量上限
+    "dedupe_ttl": 300        # 客户端消息 id 的保留时间（秒），超过后视为新消息
+}
+
+# 命令分发管道配置
+PIPELINE_CONFIG = {
+    # 按命令限速：命令 -> 每分钟次数和令牌桶容量，默认不限速，例如
+    # "message": {"per_minute": MESSAGE_CONFIG["rate_limit"], "burst": MESSAGE_CONFIG["rate_limit"]}
+    # "register": {"per_minute": 5, "burst": 5}
+    "rate_limits": {},
+    # 为 True 时丢弃超过 MESSAGE_CONFIG["max_length"] 的消息
+    "enforce_max_length": False
+}
+
+# 消息 ID 生成配置（snowflake），多节点部署时每个节点的 node_id 必须不同
+SNOWFLAKE_CONFIG = {
+    "node_id": 0,                 # 0 - 1023
+    "epoch_ms": 1704067200000     # 2024-01-01 00:00:00 UTC
+}
+
+# 广播配置
+FANOUT_CONFIG = {
+    "batch_size": 256,         # 每批发送的地址数（sendmmsg 单次调用的消息数）
+    "max_failed": 10000,       # 保留的发送失败记录上限
+    "use_sendmmsg": True,      # Linux 下使用 sendmmsg 批量发送
+    "max_cached_addrs": 100000  # 缓存的 sockaddr 数量上限
+}
+
+# 频道消息批量发送配置：窗口内的多条消息合并成一个数据包（以延迟换吞吐）
+BATCH_CONFIG = {
+    "default_window": 0,      # 默认窗口（秒），0 表示不合并
+    "channels": {},           # 按频道覆盖窗口，例如 {"general": 0.005}
+    "max_size": 1400          # 合并后数据包的最大字节数（低于链路 MTU）
+}
+
+# 入站调度配置：接收线程按命令分优先级排队，处理线程先处理高优先级，过载时拒绝开销大的请求
+INGRESS_CONFIG = {
+    "enabled": True,
+    # 命令 -> 优先级，0 最先处理，2 可在过载时被拒绝，未列出的为 1
+    "priorities": {
+        "heartbeat": 0,
+        "resume": 0,
+        "register": 2,
+        "channel_history": 2,
+        "private_history": 2,
+        "list_conversations": 2
+    },
+    "shed_latency": 0.5,       # 排队延迟超过该值（秒）时拒绝 2 级请求
+    "max_queue": 10000,        # 每个优先级队列的长度上限，超出时拒绝新请求
+    "retry_after": 1.0         # 回复给客户端的最短重试等待时间（秒）
+}
+
+# 客户端发送队列配置（慢客户端背压）
+SEND_QUEUE_CONFIG = {
+    "enabled": False,          # 启用后广播先进入各客户端队列，由发送线程限速发出
+    "max_depth": 256,          # 每个客户端队列的最大长度
+    "policy": "drop_oldest",   # 慢客户端策略: drop_oldest / coalesce / disconnect
+    "max_pps": 200,            # 每个客户端每秒最多发送的数据包数
+    "burst": 50,               # 令牌桶容量
+    "tick": 0.005              # 发送线程轮询间隔（秒）
+}
+
+# 可靠传输配置（序号、确认与重传，见 common/reliability.py）
+RELIABILITY_CONFIG = {
+    "enabled": False,          # 启用后，认证时声明 reliable 的客户端改用可靠传输
+    "window": 64,              # 每个会话最多未确认的包数
+    "backlog": 1024,           # 窗口满时等待发送的队列上限
+    "initial_rto": 1.0,        # 初始重传超时（秒）
+    "min_rto": 0.2,
+    "max_rto": 5.0,
+    "max_retries": 8,          # 超过后放弃该包
+    "max_sack": 32,            # 每个确认包携带的选择确认数量上限
+    "fast_retransmit": 3,      # 被选择确认越过多少次后快速重传
+    "tick": 0.05               # 重传线程轮询间隔（秒）
+}
+
+# 在线状态事件配置：同一频道一个窗口内的加入/离开合并为一个 presence 事件
+PRESENCE_CONFIG = {
+    "window": 0.5,       # 合并窗口（秒）
+    "max_names": 100     # 单个事件最多携带的用户名数量，超出拆分为多个事件
+}
+
+# 在线成员列表配置
+ROSTER_CONFIG = {
+    "max_log": 1000,     # 每个频道保留的成员变化记录数，更早的版本只能获取完整列表
+    "max_names": 200     # 单个 roster 数据包最多携带的用户名数量
+}
+
+# 多频道订阅配置
+SUBSCRIPTION_CONFIG = {
+    "max_channels": 20,          # 每个用户最多订阅的频道数（不含当前所在频道）
+    "ttl": 30 * 24 * 3600        # Redis 中订阅与未读计数的过期时间（秒）
+}
+
+# 会话恢复配置
+RESUME_CONFIG = {
+    "ttl": 120,               # 断开后会话仍可恢复的时间（秒）
+    "channel_buffer": 256,    # 每个频道保留的最近消息数，用于恢复时补发
+    "private_buffer": 64      # 每个会话保留的最近私聊消息数
+}
+
+# 离线私聊消息配置
+OFFLINE_CONFIG = {
+    "max_per_recipient": 200,     # 每个接收者最多保留的离线消息数
+    "ttl": 7 * 24 * 3600,         # Redis 中离线队列的过期时间（秒）
+    "max_datagram_size": 4000     # 批量投递时单个数据包的最大字节数（需小于客户端接收缓冲）
 }
 
 # 频道配置
@@ -67,23 +208,40 @@ CHANNEL_CONFIG = {
     "default_channel": "general",
     "system_channels": ["general", "random", "help"],
     "max_members": 1000,
-    "name_max_length": 50
+    "name_max_length": 50,
+    # 系统频道的消息存储策略，未列出的为 persistent；可选 persistent / ephemeral / none
+    "storage_policies": {}
+}
+
+# 临时频道（storage_policy = ephemeral）配置
+EPHEMERAL_CONFIG = {
+    "max_messages": 500,    # 每个频道在 Redis 中保留的最近消息数
+    "ttl": 24 * 3600        # 频道无新消息多久后整个缓冲区过期（秒）
 }
 
 # 心跳配置
 HEARTBEAT_CONFIG = {
-    "interval": 10,        # 心跳包发送间隔（秒）
-    "timeout": 30,        # 心跳超时时间（秒）
+    "interval": 10,        # 服务器检查心跳超时的间隔（秒）
+    "client_interval": 10, # 客户端空闲多久后发送心跳（秒），认证时下发给客户端
+    "timeout": 30,        # 心跳超时时间（秒），期间收到任何数据包都视为存活
     "max_missed": 3       # 最大允许丢失心跳次数
 }
 
 # 日志配置
 LOG_CONFIG = {
     "level": "INFO",
-    "format": "%(asctime)s - %(levelname)s - %(message)s",
+    "format": "%(asctime)s - %(levelname)s - %(message)s",  # 控制台（及 json 关闭时日志文件）的格式
     "file": "chat_server.log",
     "max_bytes": 10485760,  # 10MB
-    "backup_count": 5
+    "backup_count": 5,
+    "json": True,           # 日志文件每行一条 JSON
+    "console": True,        # 同时输出到标准错误
+    # 高频事件采样：每 N 条记录 1 条；断开、加入频道等审计和排障需要的事件默认不采样
+    "sampling": {
+        "duplicate_message": 10,
+        "unauthenticated": 100,
+        "rate_limited": 100
+    }
 }
 
 # 测试配置
@@ -1,12 +1,17 @@
 """
 数据模型包
 """
-from .user import User, UserManager
-from .message import Message, MessageManager
-from .channel import Channel, ChannelManager
+from .user import User, UserManager, AsyncUserManager
+from .message import Message, MessageManager, AsyncMessageManager
+from .channel import Channel, ChannelManager, AsyncChannelManager
+from .offline_message import OfflineMessageManager
+from .ephemeral_message import EphemeralMessageStore
+from .conversation import Conversation, ConversationManager
 
 __all__ = [
-    'User', 'UserManager',
-    'Message', 'MessageManager',
-    'Channel', 'ChannelManager'
+    'User', 'UserManager', 'AsyncUserManager',
+    'Message', 'MessageManager', 'AsyncMessageManager',
+    'Channel', 'ChannelManager', 'AsyncChannelManager',
+    'OfflineMessageManager', 'EphemeralMessageStore',
+    'Conversation', 'ConversationManager'
 ]
\ No newline at end of file
@@ -1,8 +1,13 @@
+import hashlib
+import threading
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict, FrozenSet
+from common.codec import dumps
 from ..config import CHANNEL_CONFIG
 
+STORAGE_POLICIES = ("persistent", "ephemeral", "none")
+
 @dataclass
 class Channel:
     id: Optional[int]
@@ -11,6 +16,8 @@ class Channel:
     created_at: datetime
     is_private: bool = False
     owner_id: Optional[int] = None
+    # 消息存储策略: persistent 写入 MySQL；ephemeral 只保留在 Redis 的定长缓冲区；none 不保存
+    storage_policy: str = "persistent"
 
     def to_dict(self):
         """转换为字典格式"""
@@ -18,14 +25,120 @@ class Channel:
             "id": self.id,
             "name": self.name,
             "description": self.description,
-            "created_at": self.created_at.isoformat(),
+            "created_at": self.created_at,
             "is_private": self.is_private,
-            "owner_id": self.owner_id
+            "owner_id": self.owner_id,
+            "storage_policy": self.storage_policy
         }
 
+_INSERT_CHANNEL = """
+    INSERT INTO channels (name, description, is_private, owner_id, created_at, storage_policy)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+_SELECT_CHANNEL_ID = "SELECT id FROM channels WHERE name = %s"
+_SELECT_BY_NAME = """
+    SELECT *
+    FROM channels
+    WHERE name = %s
+"""
+_SELECT_BY_ID = """
+    SELECT *
+    FROM channels
+    WHERE id = %s
+"""
+_SELECT_PUBLIC = """
+    SELECT *
+    FROM channels
+    WHERE is_private = FALSE
+    ORDER BY created_at DESC
+"""
+_COUNT_CHANNELS = "SELECT COUNT(*) as count FROM channels"
+_DELETE_CHANNEL = """
+    DELETE FROM channels
+    WHERE id = %s AND owner_id = %s
+"""
+_SELECT_MEMBERS = "SELECT user_id FROM channel_members WHERE channel_id = %s"
+_INSERT_MEMBER = """
+    INSERT IGNORE INTO channel_members (channel_id, user_id, created_at)
+    VALUES (%s, %s, %s)
+"""
+_DELETE_MEMBER = "DELETE FROM channel_members WHERE channel_id = %s AND user_id = %s"
+
+def _insert_params(channel: Channel) -> tuple:
+    return (
+        channel.name,
+        channel.description,
+        channel.is_private,
+        channel.owner_id,
+        channel.created_at,
+        channel.storage_policy
+    )
+
+def _channel_row(row) -> Channel:
+    """channels 表的一行转换为 Channel，同步和异步管理器共用"""
+    return Channel(
+        id=row["id"],
+        name=row["name"],
+        description=row["description"],
+        created_at=row["created_at"],
+        is_private=bool(row["is_private"]),
+        owner_id=row["owner_id"],
+        storage_policy=row.get("storage_policy", "persistent")
+    )
+
 class ChannelManager:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, cache=None):
         self.db = db_manager
+        # 可选的 TwoTierCache，按查询类型启用
+        self.cache = cache
+        # 编码好的公开频道列表及其 ETag，频道增删（包括其他进程）时清除
+        self._channel_list: Optional[Tuple[str, bytes]] = None
+        self._channel_list_epoch = 0
+        self._channel_list_lock = threading.Lock()
+        # 私有频道的成员集合，按需加载，成员变化（包括其他进程）时清除
+        self._members: Dict[int, FrozenSet[int]] = {}
+        self._members_epoch = 0
+        self._members_lock = threading.Lock()
+        if cache:
+            public_key = cache.key("public_channels", "all")
+            cache.add_listener(lambda key: key == public_key and self._reset_channel_list())
+            members_prefix = cache.key("channel_members", "")
+            cache.add_listener(
+                lambda key: key.startswith(members_prefix) and self._drop_members(int(key[len(members_prefix):]))
+            )
+
+    def _cached(self, query_type: str, key, loader):
+        if self.cache:
+            return self.cache.get_or_load(query_type, key, loader)
+        return loader()
+
+    def _reset_channel_list(self):
+        with self._channel_list_lock:
+            self._channel_list = None
+            self._channel_list_epoch += 1
+
+    def _drop_members(self, channel_id: int):
+        with self._members_lock:
+            self._members.pop(channel_id, None)
+            self._members_epoch += 1
+
+    def _invalidate_members(self, channel_id: int):
+        """成员变化后清除本进程的成员集合，并通知其他进程"""
+        if self.cache:
+            # 本地清除由失效回调完成
+            self.cache.invalidate("channel_members", channel_id)
+        else:
+            self._drop_members(channel_id)
+
+    def _invalidate(self, channel: Channel):
+        """频道增删后清除相关缓存"""
+        self._reset_channel_list()
+        if not self.cache:
+            return
+        self.cache.invalidate("channel_by_name", channel.name)
+        if channel.id is not None:
+            self.cache.invalidate("channel_by_id", channel.id)
+        self.cache.invalidate("public_channels", "all")
 
     def create_channel(self, channel: Channel) -> Optional[Channel]:
         """创建新频道"""
@@ -37,24 +150,14 @@ class ChannelManager:
                     raise Exception("已达到最大频道数量限制")
 
             # 先插入频道
-            query = """
-                INSERT INTO channels (name, description, is_private, owner_id, created_at)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            self.db.execute_update(query, (
-                channel.name,
-                channel.description,
-                channel.is_private,
-                channel.owner_id,
-                channel.created_at
-            ))
+            self.db.execute_update(_INSERT_CHANNEL, _insert_params(channel))
             
             # 然后获取插入的ID
-            query = "SELECT id FROM channels WHERE name = %s"
-            result = self.db.execute_query(query, (channel.name,))
+            result = self.db.execute_query(_SELECT_CHANNEL_ID, (channel.name,))
             
             if result:
                 channel.id = result[0]["id"]
+                self._invalidate(channel)
                 return channel
             return None
             
@@ -65,23 +168,13 @@ class ChannelManager:
     def get_channel_by_name(self, name: str) -> Optional[Channel]:
         """通过名称获取频道"""
         try:
-            query = """
-                SELECT *
-                FROM channels
-                WHERE name = %s
-            """
-            result = self.db.execute_query(query, (name,))
+            result = self._cached(
+                "channel_by_name", name,
+                lambda: self.db.execute_query(_SELECT_BY_NAME, (name,), read_only=True) or None
+            )
             
             if result:
-                channel_data = result[0]
-                return Channel(
-                    id=channel_data["id"],
-                    name=channel_data["name"],
-                    description=channel_data["description"],
-                    created_at=channel_data["created_at"],
-                    is_private=channel_data["is_private"],
-                    owner_id=channel_data["owner_id"]
-                )
+                return _channel_row(result[0])
             return None
         except Exception as e:
             print(f"获取频道错误: {str(e)}")
@@ -90,30 +183,37 @@ class ChannelManager:
     def get_public_channels(self) -> List[Channel]:
         """获取所有公开频道"""
         try:
-            query = """
-                SELECT *
-                FROM channels
-                WHERE is_private = FALSE
-                ORDER BY created_at DESC
-            """
-            results = self.db.execute_query(query)
+            results = self._cached(
+                "public_channels", "all",
+                lambda: self.db.execute_query(_SELECT_PUBLIC, read_only=True)
+            )
             
-            return [Channel(
-                id=row["id"],
-                name=row["name"],
-                description=row["description"],
-                created_at=row["created_at"],
-                is_private=False,
-                owner_id=row["owner_id"]
-            ) for row in results]
+            return [_channel_row(row) for row in results]
         except Exception as e:
             print(f"获取公开频道错误: {str(e)}")
             return []
 
+    def get_channel_list(self) -> Tuple[str, bytes]:
+        """
+        返回 (ETag, 编码好的公开频道列表 JSON 数组)
+        结果在频道增删前一直复用，ETag 由内容计算，不同进程对同一列表得到相同的值
+        """
+        cached = self._channel_list
+        if cached is not None:
+            return cached
+        with self._channel_list_lock:
+            epoch = self._channel_list_epoch
+        channels = dumps([c.to_dict() for c in self.get_public_channels()])
+        cached = (hashlib.sha1(channels).hexdigest()[:16], channels)
+        with self._channel_list_lock:
+            # 空列表可能是查询失败，不缓存；构建期间被清除时结果也不缓存
+            if channels != b"[]" and epoch == self._channel_list_epoch:
+                self._channel_list = cached
+        return cached
+
     def get_channel_count(self) -> int:
         """获取频道总数"""
-        query = "SELECT COUNT(*) as count FROM channels"
-        result = self.db.execute_query(query)
+        result = self.db.execute_query(_COUNT_CHANNELS)
         return result[0]["count"]
 
     def delete_channel(self, channel_id: int, user_id: int) -> bool:
@@ -124,11 +224,9 @@ class ChannelManager:
             if channel and channel.name in CHANNEL_CONFIG["system_channels"]:
                 return False
 
-            query = """
-                DELETE FROM channels
-                WHERE id = %s AND owner_id = %s
-            """
-            result = self.db.execute_update(query, (channel_id, user_id))
+            result = self.db.execute_update(_DELETE_CHANNEL, (channel_id, user_id))
+            if result > 0 and channel:
+                self._invalidate(channel)
             return result > 0
         except Exception as e:
             print(f"删除频道错误: {str(e)}")
@@ -137,24 +235,166 @@ class ChannelManager:
     def get_channel_by_id(self, channel_id: int) -> Optional[Channel]:
         """通过ID获取频道"""
         try:
-            query = """
-                SELECT *
-                FROM channels
-                WHERE id = %s
-            """
-            result = self.db.execute_query(query, (channel_id,))
+            result = self._cached(
+                "channel_by_id", channel_id,
+                lambda: self.db.execute_query(_SELECT_BY_ID, (channel_id,), read_only=True) or None
+            )
             
             if result:
-                channel_data = result[0]
-                return Channel(
-                    id=channel_data["id"],
-                    name=channel_data["name"],
-                    description=channel_data["description"],
-                    created_at=channel_data["created_at"],
-                    is_private=channel_data["is_private"],
-                    owner_id=channel_data["owner_id"]
-                )
+                return _channel_row(result[0])
             return None
         except Exception as e:
             print(f"获取频道错误: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    def get_member_ids(self, channel_id: int) -> FrozenSet[int]:
+        """获取私有频道的成员ID集合，首次访问时从数据库加载，之后直接使用内存中的集合"""
+        members = self._members.get(channel_id)
+        if members is not None:
+            return members
+        with self._members_lock:
+            epoch = self._members_epoch
+        try:
+            rows = self.db.execute_query(_SELECT_MEMBERS, (channel_id,), read_only=True)
+        except Exception as e:
+            print(f"获取频道成员错误: {str(e)}")
+            return frozenset()
+        members = frozenset(row["user_id"] for row in rows)
+        with self._members_lock:
+            # 加载期间成员发生变化时结果可能已过期，不缓存
+            if epoch == self._members_epoch:
+                self._members[channel_id] = members
+        return members
+
+    def can_access(self, channel: Channel, user_id: int) -> bool:
+        """公开频道所有人可访问，私有频道只有所有者和成员可访问"""
+        if not channel.is_private or channel.owner_id == user_id:
+            return True
+        return user_id in self.get_member_ids(channel.id)
+
+    def add_member(self, channel_id: int, user_id: int) -> bool:
+        """把用户加入私有频道"""
+        try:
+            self.db.execute_update(_INSERT_MEMBER, (channel_id, user_id, datetime.now()))
+            self._invalidate_members(channel_id)
+            return True
+        except Exception as e:
+            print(f"添加频道成员错误: {str(e)}")
+            return False
+
+    def remove_member(self, channel_id: int, user_id: int) -> bool:
+        """把用户移出私有频道"""
+        try:
+            result = self.db.execute_update(_DELETE_MEMBER, (channel_id, user_id))
+            self._invalidate_members(channel_id)
+            return result > 0
+        except Exception as e:
+            print(f"移除频道成员错误: {str(e)}")
+            return False
+
+
+class AsyncChannelManager:
+    """ChannelManager 的异步版本，配合 AsyncDatabaseManager 使用"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    async def create_channel(self, channel: Channel) -> Optional[Channel]:
+        """创建新频道"""
+        try:
+            if channel.name not in CHANNEL_CONFIG["system_channels"]:
+                count = await self.get_channel_count()
+                if count >= CHANNEL_CONFIG["max_channels"]:
+                    raise Exception("已达到最大频道数量限制")
+
+            await self.db.execute_update(_INSERT_CHANNEL, _insert_params(channel))
+
+            result = await self.db.execute_query(_SELECT_CHANNEL_ID, (channel.name,))
+
+            if result:
+                channel.id = result[0]["id"]
+                return channel
+            return None
+
+        except Exception as e:
+            print(f"创建频道错误: {str(e)}")
+            return None
+
+    async def get_channel_by_name(self, name: str) -> Optional[Channel]:
+        """通过名称获取频道"""
+        try:
+            result = await self.db.execute_query(_SELECT_BY_NAME, (name,))
+
+            if result:
+                return _channel_row(result[0])
+            return None
+        except Exception as e:
+            print(f"获取频道错误: {str(e)}")
+            return None
+
+    async def get_public_channels(self) -> List[Channel]:
+        """获取所有公开频道"""
+        try:
+            results = await self.db.execute_query(_SELECT_PUBLIC)
+
+            return [_channel_row(row) for row in results]
+        except Exception as e:
+            print(f"获取公开频道错误: {str(e)}")
+            return []
+
+    async def get_channel_count(self) -> int:
+        """获取频道总数"""
+        result = await self.db.execute_query(_COUNT_CHANNELS)
+        return result[0]["count"]
+
+    async def delete_channel(self, channel_id: int, user_id: int) -> bool:
+        """删除频道（仅频道所有者可以删除）"""
+        try:
+            channel = await self.get_channel_by_id(channel_id)
+            if channel and channel.name in CHANNEL_CONFIG["system_channels"]:
+                return False
+
+            result = await self.db.execute_update(_DELETE_CHANNEL, (channel_id, user_id))
+            return result > 0
+        except Exception as e:
+            print(f"删除频道错误: {str(e)}")
+            return False
+
+    async def get_channel_by_id(self, channel_id: int) -> Optional[Channel]:
+        """通过ID获取频道"""
+        try:
+            result = await self.db.execute_query(_SELECT_BY_ID, (channel_id,))
+
+            if result:
+                return _channel_row(result[0])
+            return None
+        except Exception as e:
+            print(f"获取频道错误: {str(e)}")
+            return None
+
+    async def get_member_ids(self, channel_id: int) -> FrozenSet[int]:
+        """获取私有频道的成员ID集合"""
+        try:
+            rows = await self.db.execute_query(_SELECT_MEMBERS, (channel_id,))
+            return frozenset(row["user_id"] for row in rows)
+        except Exception as e:
+            print(f"获取频道成员错误: {str(e)}")
+            return frozenset()
+
+    async def add_member(self, channel_id: int, user_id: int) -> bool:
+        """把用户加入私有频道"""
+        try:
+            await self.db.execute_update(_INSERT_MEMBER, (channel_id, user_id, datetime.now()))
+            return True
+        except Exception as e:
+            print(f"添加频道成员错误: {str(e)}")
+            return False
+
+    async def remove_member(self, channel_id: int, user_id: int) -> bool:
+        """把用户移出私有频道"""
+        try:
+            result = await self.db.execute_update(_DELETE_MEMBER, (channel_id, user_id))
+            return result > 0
+        except Exception as e:
+            print(f"移除频道成员错误: {str(e)}")
+            return False
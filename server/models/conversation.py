@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, List, Tuple
+
+@dataclass
+class Conversation:
+    """某个用户视角下的一组私聊会话"""
+    peer_id: int
+    peer_name: str
+    last_message_id: Optional[int]
+    last_message_at: datetime
+    unread_count: int = 0
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            "peer_id": self.peer_id,
+            "peer_name": self.peer_name,
+            "last_message_id": self.last_message_id,
+            "last_message_at": self.last_message_at,
+            "unread_count": self.unread_count
+        }
+
+class ConversationManager:
+    """
+    私聊会话索引
+    conversations 表以有序用户对 (user_low_id, user_high_id) 为主键，
+    记录最后一条消息和双方各自的未读数，写消息时同步维护
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    @staticmethod
+    def pair(user1_id: int, user2_id: int) -> Tuple[int, int]:
+        """返回有序用户对"""
+        return (user1_id, user2_id) if user1_id < user2_id else (user2_id, user1_id)
+
+    @staticmethod
+    def record_query(message) -> Tuple[str, tuple]:
+        """更新会话的最后消息与接收者未读数的语句和参数"""
+        low, high = ConversationManager.pair(message.sender_id, message.recipient_id)
+        unread_low = 1 if message.recipient_id == low else 0
+        query = """
+            INSERT INTO conversations
+            (user_low_id, user_high_id, last_message_id, last_message_at, unread_low, unread_high)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                last_message_id = VALUES(last_message_id),
+                last_message_at = VALUES(last_message_at),
+                unread_low = unread_low + VALUES(unread_low),
+                unread_high = unread_high + VALUES(unread_high)
+        """
+        return query, (low, high, message.id, message.created_at, unread_low, 1 - unread_low)
+
+    @staticmethod
+    def record_message(cursor, message) -> None:
+        """在写消息的同一事务中更新会话索引"""
+        cursor.execute(*ConversationManager.record_query(message))
+
+    def list_conversations(self, user_id: int, limit: int = 50) -> List[Conversation]:
+        """获取用户的会话列表，按最后消息时间倒序"""
+        try:
+            query = """
+                SELECT c.user_high_id AS peer_id, u.username AS peer_name,
+                       c.last_message_id, c.last_message_at, c.unread_low AS unread_count
+                FROM conversations c
+                JOIN users u ON u.id = c.user_high_id
+                WHERE c.user_low_id = %s
+                UNION ALL
+                SELECT c.user_low_id AS peer_id, u.username AS peer_name,
+                       c.last_message_id, c.last_message_at, c.unread_high AS unread_count
+                FROM conversations c
+                JOIN users u ON u.id = c.user_low_id
+                WHERE c.user_high_id = %s
+                ORDER BY last_message_at DESC
+                LIMIT %s
+            """
+            results = self.db.execute_query(
+                query, (user_id, user_id, limit), read_only=True, session=user_id
+            )
+
+            return [Conversation(
+                peer_id=row["peer_id"],
+                peer_name=row["peer_name"],
+                last_message_id=row["last_message_id"],
+                last_message_at=row["last_message_at"],
+                unread_count=row["unread_count"]
+            ) for row in results]
+        except Exception as e:
+            print(f"获取会话列表错误: {str(e)}")
+            return []
+
+    def mark_read(self, user_id: int, peer_id: int) -> None:
+        """清零用户在该会话中的未读数"""
+        try:
+            low, high = self.pair(user_id, peer_id)
+            column = "unread_low" if user_id == low else "unread_high"
+            query = f"""
+                UPDATE conversations
+                SET {column} = 0
+                WHERE user_low_id = %s AND user_high_id = %s AND {column} > 0
+            """
+            self.db.execute_update(query, (low, high), session=user_id)
+        except Exception as e:
+            print(f"更新会话未读数错误: {str(e)}")
@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import List, Optional
+from common.codec import dumps, loads
+from ..config import EPHEMERAL_CONFIG
+from ..utils.security import SecurityManager
+from .message import Message
+
+class EphemeralMessageStore:
+    """
+    临时频道的消息缓冲区
+    每个频道一个 Redis 列表（最新的在前），只保留最近 max_messages 条，不写入 MySQL
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    @staticmethod
+    def _key(channel_id: int) -> str:
+        return f"ephemeral:{channel_id}"
+
+    def append(self, message: Message) -> bool:
+        """写入一条频道消息，超出上限时丢弃最旧的；内容与 MessageManager 写入 MySQL 时一样清理"""
+        data = dumps({
+            "id": message.id,
+            "channel_id": message.channel_id,
+            "sender_id": message.sender_id,
+            "content": SecurityManager.sanitize_input(message.content),
+            "created_at": message.created_at.isoformat()
+        }).decode()
+        try:
+            key = self._key(message.channel_id)
+            pipe = self.db.redis.pipeline()
+            pipe.lpush(key, data)
+            pipe.ltrim(key, 0, EPHEMERAL_CONFIG["max_messages"] - 1)
+            pipe.expire(key, EPHEMERAL_CONFIG["ttl"])
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"临时消息写入Redis错误: {str(e)}")
+            return False
+
+    def get_recent(self, channel_id: int, limit: int = 50,
+                   before_id: Optional[int] = None) -> List[Message]:
+        """按 id 倒序返回最近的消息，before_id 的含义与 MessageManager.get_channel_messages 相同"""
+        try:
+            items = self.db.redis.lrange(self._key(channel_id), 0, -1)
+        except Exception as e:
+            print(f"读取临时消息错误: {str(e)}")
+            return []
+
+        messages = []
+        for item in items:
+            data = loads(item)
+            if before_id is not None and data["id"] >= before_id:
+                continue
+            messages.append(Message(
+                id=data["id"],
+                channel_id=data["channel_id"],
+                sender_id=data["sender_id"],
+                content=data["content"],
+                created_at=datetime.fromisoformat(data["created_at"])
+            ))
+            if len(messages) >= limit:
+                break
+        return messages
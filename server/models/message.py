@@ -1,7 +1,9 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from ..utils.security import SecurityManager
+from ..utils.snowflake import SnowflakeGenerator
+from .conversation import ConversationManager
 
 @dataclass
 class Message:
@@ -20,52 +22,123 @@ class Message:
             "channel_id": self.channel_id,
             "sender_id": self.sender_id,
             "content": self.content,
-            "created_at": self.created_at.isoformat(),
+            "created_at": self.created_at,
             "is_private": self.is_private,
             "recipient_id": self.recipient_id
         }
 
+_INSERT_MESSAGE = """
+    INSERT INTO messages
+    (id, channel_id, sender_id, content, is_private, recipient_id, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _insert_params(message: Message) -> tuple:
+    return (
+        message.id,
+        message.channel_id,
+        message.sender_id,
+        SecurityManager.sanitize_input(message.content),
+        message.is_private,
+        message.recipient_id,
+        message.created_at
+    )
+
+def _channel_messages_query(channel_id: int, limit: int,
+                            before_id: Optional[int]) -> Tuple[str, tuple]:
+    """频道消息按 id 倒序分页的查询，同步和异步管理器共用"""
+    cursor_clause = "AND m.id < %s" if before_id is not None else ""
+    query = f"""
+        SELECT m.*, u.username as sender_name
+        FROM messages m
+        JOIN users u ON m.sender_id = u.id
+        WHERE m.channel_id = %s AND m.is_private = FALSE {cursor_clause}
+        ORDER BY m.id DESC
+        LIMIT %s
+    """
+    params = (channel_id, before_id, limit) if before_id is not None else (channel_id, limit)
+    return query, params
+
+def _private_messages_query(user1_id: int, user2_id: int, limit: int,
+                            before_id: Optional[int]) -> Tuple[str, tuple]:
+    """
+    私聊消息按 id 倒序分页的查询，同步和异步管理器共用
+    两个方向分别走 (sender_id, recipient_id, id) 索引的范围扫描，再合并
+    """
+    cursor_clause = "AND id < %s" if before_id is not None else ""
+    direction = f"""
+        (SELECT *
+         FROM messages
+         WHERE sender_id = %s AND recipient_id = %s
+         AND is_private = TRUE {cursor_clause}
+         ORDER BY id DESC
+         LIMIT %s)
+    """
+    query = f"""
+        SELECT *
+        FROM ({direction} UNION ALL {direction}) AS dm
+        ORDER BY id DESC
+        LIMIT %s
+    """
+    params = []
+    for sender_id, recipient_id in ((user1_id, user2_id), (user2_id, user1_id)):
+        params.extend([sender_id, recipient_id])
+        if before_id is not None:
+            params.append(before_id)
+        params.append(limit)
+    params.append(limit)
+    return query, tuple(params)
+
+def _channel_row(row) -> Message:
+    return Message(
+        id=row["id"],
+        channel_id=row["channel_id"],
+        sender_id=row["sender_id"],
+        content=row["content"],
+        created_at=row["created_at"],
+        is_private=row["is_private"],
+        recipient_id=row["recipient_id"]
+    )
+
+def _private_row(row) -> Message:
+    return Message(
+        id=row["id"],
+        channel_id=row["channel_id"],
+        sender_id=row["sender_id"],
+        content=row["content"],
+        created_at=row["created_at"],
+        is_private=True,
+        recipient_id=row["recipient_id"]
+    )
+
 class MessageManager:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, id_generator: Optional[SnowflakeGenerator] = None):
         self.db = db_manager
+        # messages.id 没有自增，所有写入路径都必须使用 snowflake ID
+        self.id_generator = id_generator or SnowflakeGenerator()
 
     def create_message(self, message: Message) -> Optional[Message]:
-        """创建新消息"""
+        """创建新消息；message.id 已由服务器分配时直接使用，否则在此生成 snowflake ID"""
         try:
+            if message.id is None:
+                message.id = self.id_generator.next_id()
             with self.db.get_connection() as conn:
                 cursor = conn.cursor(dictionary=True)
+                # 私聊消息需要同时更新会话索引，放在同一事务中
+                if message.is_private:
+                    conn.start_transaction()
                 
-                # 清理消息内容
-                cleaned_content = SecurityManager.sanitize_input(message.content)
+                # 插入消息（内容在 _insert_params 中清理）
+                cursor.execute(_INSERT_MESSAGE, _insert_params(message))
                 
-                # 插入消息
-                query = """
-                    INSERT INTO messages 
-                    (channel_id, sender_id, content, is_private, recipient_id, created_at)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """
-                
-                cursor.execute(query, (
-                    message.channel_id,
-                    message.sender_id,
-                    cleaned_content,
-                    message.is_private,
-                    message.recipient_id,
-                    message.created_at
-                ))
-                
-                # 获取插入的消息ID
-                cursor.execute("SELECT LAST_INSERT_ID() as id")
-                result = cursor.fetchone()
+                if message.is_private:
+                    ConversationManager.record_message(cursor, message)
                 
                 # 提交事务
                 conn.commit()
-                
-                if result and result['id']:
-                    message.id = result['id']
-                    return message
-                        
-                return None
+                # 发送者随后的读请求走主库，保证能读到刚发送的消息
+                self.db.mark_write(message.sender_id)
+                return message
                 
         except Exception as e:
             print(f"创建消息错误: {str(e)}")
@@ -74,64 +147,35 @@ class MessageManager:
             traceback.print_exc()
             return None
         
-    def get_channel_messages(self, channel_id: int, limit: int = 50) -> List[Message]:
-        """获取频道消息"""
+    def get_channel_messages(self, channel_id: int, limit: int = 50, session=None,
+                             before_id: Optional[int] = None) -> List[Message]:
+        """
+        获取频道消息，按 id 倒序分页，before_id 为上一页最后一条消息的 id
+        session 为读取者的用户ID，用于读己之写
+        """
         try:
-            query = """
-                SELECT m.*, u.username as sender_name
-                FROM messages m
-                JOIN users u ON m.sender_id = u.id
-                WHERE m.channel_id = %s AND m.is_private = FALSE
-                ORDER BY m.created_at DESC
-                LIMIT %s
-            """
-            results = self.db.execute_query(query, (channel_id, limit))
-            
-            return [Message(
-                id=row["id"],
-                channel_id=row["channel_id"],
-                sender_id=row["sender_id"],
-                content=row["content"],
-                created_at=row["created_at"],
-                is_private=row["is_private"],
-                recipient_id=row["recipient_id"]
-            ) for row in results]
+            query, params = _channel_messages_query(channel_id, limit, before_id)
+            results = self.db.execute_query(
+                query, params, read_only=True, session=session
+            )
+            return [_channel_row(row) for row in results]
         except Exception as e:
             print(f"获取频道消息错误: {str(e)}")
             return []
 
-    def get_private_messages(self, user1_id: int, user2_id: int, limit: int = 50) -> List[Message]:
-        """获取私聊消息"""
+    def get_private_messages(self, user1_id: int, user2_id: int, limit: int = 50,
+                             before_id: Optional[int] = None) -> List[Message]:
+        """
+        获取私聊消息，按 id 倒序分页，before_id 为上一页最后一条消息的 id
+        """
         try:
-            # 确保使用事务保持一致性
-            with self.db.get_connection() as conn:
+            # 确保使用事务保持一致性，user1 为读取者
+            with self.db.get_connection(read_only=True, session=user1_id) as conn:
                 cursor = conn.cursor(dictionary=True)
                 
-                query = """
-                    SELECT m.*, u.username as sender_name
-                    FROM messages m
-                    JOIN users u ON m.sender_id = u.id
-                    WHERE m.is_private = TRUE
-                    AND (
-                        (m.sender_id = %s AND m.recipient_id = %s)
-                        OR (m.sender_id = %s AND m.recipient_id = %s)
-                    )
-                    ORDER BY m.created_at DESC
-                    LIMIT %s
-                """
-                
-                cursor.execute(query, (user1_id, user2_id, user2_id, user1_id, limit))
-                results = cursor.fetchall()
-                
-                return [Message(
-                    id=row["id"],
-                    channel_id=row["channel_id"],
-                    sender_id=row["sender_id"],
-                    content=row["content"],
-                    created_at=row["created_at"],
-                    is_private=True,
-                    recipient_id=row["recipient_id"]
-                ) for row in results]
+                query, params = _private_messages_query(user1_id, user2_id, limit, before_id)
+                cursor.execute(query, params)
+                return [_private_row(row) for row in cursor.fetchall()]
                 
         except Exception as e:
             print(f"获取私聊消息错误: {str(e)}")
@@ -150,4 +194,70 @@ class MessageManager:
             return result > 0
         except Exception as e:
             print(f"删除消息错误: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+
+class AsyncMessageManager:
+    """MessageManager 的异步版本，配合 AsyncDatabaseManager 使用"""
+
+    def __init__(self, db_manager, id_generator: Optional[SnowflakeGenerator] = None):
+        self.db = db_manager
+        self.id_generator = id_generator or SnowflakeGenerator()
+
+    async def create_message(self, message: Message) -> Optional[Message]:
+        """创建新消息，id 的分配方式与 MessageManager.create_message 相同；私聊消息在同一事务中更新会话索引"""
+        try:
+            if message.id is None:
+                message.id = self.id_generator.next_id()
+            async with self.db.get_connection() as conn:
+                if message.is_private:
+                    await conn.begin()
+                try:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute(_INSERT_MESSAGE, _insert_params(message))
+                        if message.is_private:
+                            await cursor.execute(*ConversationManager.record_query(message))
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+                return message
+
+        except Exception as e:
+            print(f"创建消息错误: {str(e)}")
+            return None
+
+    async def get_channel_messages(self, channel_id: int, limit: int = 50,
+                                   before_id: Optional[int] = None) -> List[Message]:
+        """获取频道消息，分页方式与 MessageManager.get_channel_messages 相同"""
+        try:
+            query, params = _channel_messages_query(channel_id, limit, before_id)
+            results = await self.db.execute_query(query, params)
+            return [_channel_row(row) for row in results]
+        except Exception as e:
+            print(f"获取频道消息错误: {str(e)}")
+            return []
+
+    async def get_private_messages(self, user1_id: int, user2_id: int, limit: int = 50,
+                                   before_id: Optional[int] = None) -> List[Message]:
+        """获取私聊消息，分页方式与 MessageManager.get_private_messages 相同"""
+        try:
+            query, params = _private_messages_query(user1_id, user2_id, limit, before_id)
+            results = await self.db.execute_query(query, params)
+            return [_private_row(row) for row in results]
+        except Exception as e:
+            print(f"获取私聊消息错误: {str(e)}")
+            return []
+
+    async def delete_message(self, message_id: int, user_id: int) -> bool:
+        """删除消息（仅消息发送者可以删除）"""
+        try:
+            query = """
+                DELETE FROM messages
+                WHERE id = %s AND sender_id = %s
+            """
+            result = await self.db.execute_update(query, (message_id, user_id))
+            return result > 0
+        except Exception as e:
+            print(f"删除消息错误: {str(e)}")
+            return False
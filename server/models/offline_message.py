@@ -0,0 +1,81 @@
+from datetime import datetime
+from typing import List, Dict, Any
+from common.codec import dumps, loads
+from ..config import OFFLINE_CONFIG
+
+class OfflineMessageManager:
+    """
+    离线私聊消息队列
+    优先存放在 Redis 列表中（每个接收者一个键），Redis 不可用时写入 MySQL 的 offline_messages 表
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    @staticmethod
+    def _key(recipient_id: int) -> str:
+        return f"offline:{recipient_id}"
+
+    def enqueue(self, recipient_id: int, payload: Dict[str, Any]) -> bool:
+        """将一条消息加入接收者的离线队列，超出上限时丢弃最旧的消息"""
+        data = dumps(payload).decode()
+        try:
+            key = self._key(recipient_id)
+            pipe = self.db.redis.pipeline()
+            pipe.rpush(key, data)
+            pipe.ltrim(key, -OFFLINE_CONFIG["max_per_recipient"], -1)
+            pipe.expire(key, OFFLINE_CONFIG["ttl"])
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"离线消息写入Redis错误: {str(e)}，改用MySQL")
+
+        try:
+            query = """
+                INSERT INTO offline_messages (recipient_id, payload, created_at)
+                VALUES (%s, %s, %s)
+            """
+            self.db.execute_update(query, (recipient_id, data, datetime.now()))
+            return True
+        except Exception as e:
+            print(f"离线消息写入MySQL错误: {str(e)}")
+            return False
+
+    def drain(self, recipient_id: int) -> List[Dict[str, Any]]:
+        """取出并清空接收者的离线消息，按时间先后排列"""
+        messages = []
+
+        # MySQL 中的消息是 Redis 故障期间写入的，时间上更早
+        # 按自增 id 读取和删除：id <= 最新一条的行要么已读出，要么超出上限本应丢弃，
+        # 读取之后才写入的行 id 更大，不会被删除
+        try:
+            query = """
+                SELECT id, payload
+                FROM offline_messages
+                WHERE recipient_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+            """
+            rows = self.db.execute_query(
+                query, (recipient_id, OFFLINE_CONFIG["max_per_recipient"])
+            )
+            if rows:
+                self.db.execute_update(
+                    "DELETE FROM offline_messages WHERE recipient_id = %s AND id <= %s",
+                    (recipient_id, rows[0]["id"])
+                )
+                messages.extend(loads(row["payload"]) for row in reversed(rows))
+        except Exception as e:
+            print(f"读取MySQL离线消息错误: {str(e)}")
+
+        try:
+            key = self._key(recipient_id)
+            pipe = self.db.redis.pipeline()
+            pipe.lrange(key, 0, -1)
+            pipe.delete(key)
+            items, _ = pipe.execute()
+            messages.extend(loads(item) for item in items)
+        except Exception as e:
+            print(f"读取Redis离线消息错误: {str(e)}")
+
+        return messages[-OFFLINE_CONFIG["max_per_recipient"]:]
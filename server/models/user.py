@@ -35,15 +35,57 @@ class User:
         return {
             "id": self.id,
             "username": self.username,
-            "created_at": self.created_at.isoformat(),
-            "last_login": self.last_login.isoformat() if self.last_login else None,
+            "created_at": self.created_at,
+            "last_login": self.last_login,
             "current_channel": self.current_channel,
             "is_online": self.is_online
         }
 
+_INSERT_USER = """
+    INSERT INTO users (username, password_hash, salt, created_at)
+    VALUES (%s, %s, %s, %s)
+"""
+_SELECT_USER_ID = "SELECT id FROM users WHERE username = %s"
+_SELECT_USER = """
+    SELECT id, username, password_hash, salt, created_at, last_login
+    FROM users
+    WHERE username = %s
+"""
+_UPDATE_LAST_LOGIN = """
+    UPDATE users
+    SET last_login = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+_UPDATE_CHANNEL = """
+    UPDATE users
+    SET current_channel = %s
+    WHERE id = %s
+"""
+
+def _insert_params(user: User) -> tuple:
+    return (
+        user.username,
+        user.password_hash,
+        user.salt,
+        user.created_at
+    )
+
+def _user_row(row) -> User:
+    """users 表的一行转换为 User，同步和异步管理器共用"""
+    return User(
+        id=row["id"],
+        username=row["username"],
+        password_hash=row["password_hash"],
+        salt=row["salt"],
+        created_at=row["created_at"],
+        last_login=row["last_login"]
+    )
+
 class UserManager:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, cache=None):
         self.db = db_manager
+        # 可选的 TwoTierCache，按查询类型启用
+        self.cache = cache
 
     def create_user(self, username: str, password: str) -> Optional[User]:
         """创建用户"""
@@ -51,20 +93,10 @@ class UserManager:
             user = User.create(username, password)
             
             # 先插入用户
-            query = """
-                INSERT INTO users (username, password_hash, salt, created_at)
-                VALUES (%s, %s, %s, %s)
-            """
-            self.db.execute_update(query, (
-                user.username,
-                user.password_hash,
-                user.salt,
-                user.created_at
-            ))
+            self.db.execute_update(_INSERT_USER, _insert_params(user), session=username)
             
             # 然后获取插入的ID
-            query = "SELECT id FROM users WHERE username = %s"
-            result = self.db.execute_query(query, (username,))
+            result = self.db.execute_query(_SELECT_USER_ID, (username,))
             
             if result:
                 user.id = result[0]["id"]
@@ -75,26 +107,23 @@ class UserManager:
             print(f"创建用户错误: {str(e)}")
             return None
 
+    def _load_user_row(self, username: str) -> Optional[dict]:
+        result = self.db.execute_query(_SELECT_USER, (username,), read_only=True, session=username)
+        return result[0] if result else None
+
     def get_user_by_username(self, username: str) -> Optional[User]:
-        """通过用户名获取用户"""
+        """通过用户名获取用户（启用缓存时 last_login 可能滞后一个 TTL）"""
         try:
-            query = """
-                SELECT id, username, password_hash, salt, created_at, last_login
-                FROM users
-                WHERE username = %s
-            """
-            result = self.db.execute_query(query, (username,))
-            
-            if result:
-                user_data = result[0]
-                return User(
-                    id=user_data["id"],
-                    username=user_data["username"],
-                    password_hash=user_data["password_hash"],
-                    salt=user_data["salt"],
-                    created_at=user_data["created_at"],
-                    last_login=user_data["last_login"]
+            if self.cache:
+                user_data = self.cache.get_or_load(
+                    "user_by_username", username,
+                    lambda: self._load_user_row(username)
                 )
+            else:
+                user_data = self._load_user_row(username)
+            
+            if user_data:
+                return _user_row(user_data)
             return None
             
         except Exception as e:
@@ -104,23 +133,64 @@ class UserManager:
     def update_last_login(self, user_id: int):
         """更新最后登录时间"""
         try:
-            query = """
-                UPDATE users
-                SET last_login = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """
-            self.db.execute_update(query, (user_id,))
+            self.db.execute_update(_UPDATE_LAST_LOGIN, (user_id,))
         except Exception as e:
             print(f"更新登录时间错误: {str(e)}")
 
     def update_user_channel(self, user_id: int, channel: str):
         """更新用户当前频道"""
         try:
-            query = """
-                UPDATE users
-                SET current_channel = %s
-                WHERE id = %s
-            """
-            self.db.execute_update(query, (channel, user_id))
+            self.db.execute_update(_UPDATE_CHANNEL, (channel, user_id))
+        except Exception as e:
+            print(f"更新用户频道错误: {str(e)}")
+
+class AsyncUserManager:
+    """UserManager 的异步版本，配合 AsyncDatabaseManager 使用"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    async def create_user(self, username: str, password: str) -> Optional[User]:
+        """创建用户"""
+        try:
+            user = User.create(username, password)
+
+            await self.db.execute_update(_INSERT_USER, _insert_params(user))
+
+            result = await self.db.execute_query(_SELECT_USER_ID, (username,))
+
+            if result:
+                user.id = result[0]["id"]
+                return user
+            return None
+
+        except Exception as e:
+            print(f"创建用户错误: {str(e)}")
+            return None
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        """通过用户名获取用户"""
+        try:
+            result = await self.db.execute_query(_SELECT_USER, (username,))
+
+            if result:
+                return _user_row(result[0])
+            return None
+
+        except Exception as e:
+            print(f"获取用户错误: {str(e)}")
+            return None
+
+    async def update_last_login(self, user_id: int):
+        """更新最后登录时间"""
+        try:
+            await self.db.execute_update(_UPDATE_LAST_LOGIN, (user_id,))
+        except Exception as e:
+            print(f"更新登录时间错误: {str(e)}")
+
+    async def update_user_channel(self, user_id: int, channel: str):
+        """更新用户当前频道"""
+        try:
+            await self.db.execute_update(_UPDATE_CHANNEL, (channel, user_id))
         except Exception as e:
-            print(f"更新用户频道错误: {str(e)}")
\ No newline at end of file
+            print(f"更新用户频道错误: {str(e)}")
@@ -2,6 +2,31 @@
 工具函数包
 """
 from .database import DatabaseManager
+from .async_database import AsyncDatabaseManager
+from .cache import LocalCache, TwoTierCache
+from .recv_buffer import ReceiveBuffer
+from .fanout import FanoutEngine
+from .send_queue import SendQueueManager
+from .reliable_transport import ReliableTransport
+from .dedupe import DedupeWindow
+from .snowflake import SnowflakeGenerator
+from .session import SessionStore
+from .presence import PresenceAggregator
+from .roster import RosterLog
+from .batcher import ChannelBatcher
+from .subscription import SubscriptionStore
+from .scheduler import IngressScheduler
+from .pipeline import Pipeline, Request, RateLimiter
+from .logger import setup_logging, stop_logging, JsonFormatter, SamplingFilter
 from .security import SecurityManager
 
-__all__ = ['DatabaseManager', 'SecurityManager']
\ No newline at end of file
+__all__ = [
+    'DatabaseManager', 'AsyncDatabaseManager',
+    'LocalCache', 'TwoTierCache',
+    'ReceiveBuffer', 'FanoutEngine', 'SendQueueManager',
+    'ReliableTransport', 'DedupeWindow', 'SnowflakeGenerator', 'SessionStore',
+    'PresenceAggregator', 'RosterLog', 'ChannelBatcher', 'SubscriptionStore',
+    'IngressScheduler', 'Pipeline', 'Request', 'RateLimiter',
+    'setup_logging', 'stop_logging', 'JsonFormatter', 'SamplingFilter',
+    'SecurityManager'
+]
\ No newline at end of file
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Any
+
+# aiomysql 为可选依赖，只有使用异步数据库层时才需要安装
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+import redis.asyncio as aioredis
+
+from common.codec import dumps, loads, JSONDecodeError
+from server.config import ASYNC_DB_CONFIG
+
+
+class PoolStats:
+    """连接池指标：等待时间与占用数量"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, wait: float):
+        self.acquired += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前指标快照"""
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "avg_wait_ms": (self.total_wait / self.acquired * 1000) if self.acquired else 0.0,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+
+class AsyncDatabaseManager:
+    """DatabaseManager 的 asyncio 版本，接口保持一致，方法均为协程"""
+
+    def __init__(self, db_config: Dict[str, Any], redis_config: Dict[str, Any] = None,
+                 pool_config: Dict[str, Any] = None):
+        self.db_config = db_config
+        self.redis_config = redis_config
+        self.pool_config = {**ASYNC_DB_CONFIG, **(pool_config or {})}
+        self.pool = None
+        self.redis = None
+        self.stats = PoolStats(self.pool_config["maxsize"])
+
+    @classmethod
+    async def create(cls, db_config: Dict[str, Any], redis_config: Dict[str, Any] = None,
+                     pool_config: Dict[str, Any] = None) -> "AsyncDatabaseManager":
+        """创建并初始化连接"""
+        manager = cls(db_config, redis_config, pool_config)
+        await manager._setup_connections()
+        return manager
+
+    def _pool_kwargs(self) -> Dict[str, Any]:
+        """将 mysql-connector 风格的配置转换为 aiomysql 参数"""
+        return {
+            "host": self.db_config["host"],
+            "port": self.db_config["port"],
+            "user": self.db_config["user"],
+            "password": self.db_config["password"],
+            "db": self.db_config["database"],
+            "charset": self.db_config.get("charset", "utf8mb4"),
+            "autocommit": self.db_config.get("autocommit", True),
+            "connect_timeout": self.db_config.get("connect_timeout", 30),
+            "minsize": self.pool_config["minsize"],
+            "maxsize": self.pool_config["maxsize"],
+            "pool_recycle": self.pool_config["pool_recycle"]
+        }
+
+    async def _setup_connections(self):
+        """初始化数据库连接池和Redis连接"""
+        if aiomysql is None:
+            raise ImportError("AsyncDatabaseManager 需要安装 aiomysql")
+        try:
+            self.pool = await aiomysql.create_pool(**self._pool_kwargs())
+        except aiomysql.Error as e:
+            print(f"MySQL连接错误: {e}, 配置: {self.db_config}")
+            raise
+
+        if self.redis_config:
+            try:
+                self.redis = aioredis.Redis(**self.redis_config)
+                # 测试Redis连接
+                await self.redis.ping()
+            except aioredis.ConnectionError as e:
+                print(f"Redis连接错误: {e}, 配置: {self.redis_config}")
+                raise
+
+    @asynccontextmanager
+    async def get_connection(self):
+        """获取数据库连接，并记录等待时间与占用数量"""
+        self.stats.waiting += 1
+        start = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(
+                self.pool.acquire(),
+                timeout=self.pool_config["acquire_timeout"]
+            )
+        finally:
+            self.stats.waiting -= 1
+        self.stats.record_wait(time.perf_counter() - start)
+        self.stats.in_use += 1
+        try:
+            yield conn
+        finally:
+            self.stats.in_use -= 1
+            self.pool.release(conn)
+
+    async def execute_query(self, query: str, params: tuple = None) -> List[Dict]:
+        """执行查询并返回结果"""
+        async with self.get_connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params or ())
+                return await cursor.fetchall()
+
+    async def execute_update(self, query: str, params: tuple = None) -> int:
+        """执行更新操作并返回影响的行数"""
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params or ())
+                await conn.commit()
+                return cursor.rowcount
+
+    async def cache_set(self, key: str, value: Any, expire: int = None):
+        """设置缓存"""
+        if isinstance(value, (dict, list)):
+            value = dumps(value)
+        await self.redis.set(key, value, ex=expire)
+
+    async def cache_get(self, key: str) -> Optional[Any]:
+        """获取缓存"""
+        value = await self.redis.get(key)
+        if value:
+            try:
+                return loads(value)
+            except JSONDecodeError:
+                return value
+        return None
+
+    async def cache_delete(self, key: str):
+        """删除缓存"""
+        await self.redis.delete(key)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """连接池指标"""
+        return self.stats.snapshot()
+
+    async def close(self):
+        """关闭所有连接"""
+        if self.pool:
+            self.pool.close()
+            await self.pool.wait_closed()
+        if self.redis:
+            await self.redis.close()
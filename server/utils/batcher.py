@@ -0,0 +1,116 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from server.config import BATCH_CONFIG
+
+_PREFIX = b'{"type":"batch","messages":['
+_SUFFIX = b']}'
+
+
+def pack(payloads: List[bytes]) -> bytes:
+    """把多条已编码的消息拼成一个 batch 数据包，只有一条时原样返回"""
+    if len(payloads) == 1:
+        return payloads[0]
+    return _PREFIX + b",".join(payloads) + _SUFFIX
+
+
+class _PendingBatch:
+    __slots__ = ("deadline", "size", "payloads", "enqueued_at")
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.size = len(_PREFIX) + len(_SUFFIX)
+        self.payloads: List[bytes] = []
+        self.enqueued_at: List[float] = []
+
+
+class ChannelBatcher:
+    """
+    按频道合并出站消息
+    频道的第一条消息开启一个窗口，窗口结束或合并后大小将超过 max_size 时整批发出，
+    每个接收者只收到一个数据包；窗口为 0 的频道不经过这里
+    """
+
+    def __init__(self, emit: Callable[[str, bytes], None], config: Dict[str, Any] = None):
+        self.config = {**BATCH_CONFIG, **(config or {})}
+        self.emit = emit  # emit(channel, payload)
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self.messages = 0
+        self.batches = 0
+        self.total_delay = 0.0
+
+    def window(self, channel: str) -> float:
+        return self.config["channels"].get(channel, self.config["default_window"])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config["default_window"]) or any(self.config["channels"].values())
+
+    def start(self):
+        """启动定时发送线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def add(self, channel: str, payload: bytes, now: float = None):
+        """加入一条已编码的消息"""
+        now = time.monotonic() if now is None else now
+        full = None
+        with self._cond:
+            batch = self._pending.get(channel)
+            if batch is not None and batch.size + len(payload) + 1 > self.config["max_size"]:
+                full = self._pending.pop(channel)
+                batch = None
+            if batch is None:
+                batch = self._pending[channel] = _PendingBatch(now + self.window(channel))
+                self._cond.notify()
+            batch.payloads.append(payload)
+            batch.enqueued_at.append(now)
+            batch.size += len(payload) + 1
+        if full is not None:
+            self._send(channel, full, now)
+
+    def _send(self, channel: str, batch: _PendingBatch, now: float):
+        self.messages += len(batch.payloads)
+        self.batches += 1
+        self.total_delay += sum(now - t for t in batch.enqueued_at)
+        self.emit(channel, pack(batch.payloads))
+
+    def flush(self, now: float = None, force: bool = False):
+        """发出所有已到期（force 时为全部）的批次"""
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            due = [
+                channel for channel, batch in self._pending.items()
+                if force or batch.deadline <= now
+            ]
+            ready = [(channel, self._pending.pop(channel)) for channel in due]
+        for channel, batch in ready:
+            self._send(channel, batch, now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                timeout = min(batch.deadline for batch in self._pending.values()) - time.monotonic()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+            self.flush()
+
+    def report(self) -> Dict[str, float]:
+        """返回并重置统计：消息数、数据包数与平均附加延迟（毫秒）"""
+        with self._cond:
+            snapshot = {
+                "messages": self.messages,
+                "batches": self.batches,
+                "avg_delay_ms": (self.total_delay / self.messages * 1000) if self.messages else 0.0
+            }
+            self.messages = self.batches = 0
+            self.total_delay = 0.0
+        return snapshot
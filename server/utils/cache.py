@@ -0,0 +1,236 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common.codec import dumps, loads
+from server.config import CACHE_CONFIG
+
+
+# L2 中的值需要还原出 datetime 类型，因此使用带类型标记的标准库 json，而不是 common.codec
+def _default(obj):
+    """JSON 序列化时保留 datetime 类型"""
+    if isinstance(obj, datetime):
+        return {"__datetime__": obj.isoformat()}
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+
+def _object_hook(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+class LocalCache:
+    """进程内 L1 缓存：容量有上限（LRU 淘汰），条目带过期时间"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _InflightLoad:
+    """一次正在进行的加载，同一个键的并发请求共享其结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class TwoTierCache:
+    """
+    两级缓存：进程内 L1 + Redis L2
+    - 按查询类型启用，TTL 由 CACHE_CONFIG["policies"] 决定
+    - 同一个冷键的并发加载只会触发一次数据库查询
+    - 失效消息通过 Redis pub/sub 广播给所有服务器进程
+    """
+
+    def __init__(self, redis_client=None, config: Dict[str, Any] = None):
+        self.config = {**CACHE_CONFIG, **(config or {})}
+        self.redis = redis_client
+        self.policies: Dict[str, float] = self.config["policies"]
+        self.local = LocalCache(self.config["local_max_size"])
+        self.node_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _InflightLoad] = {}
+        self._epochs: Dict[str, int] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._pubsub = None
+        self._pubsub_thread = None
+
+    @staticmethod
+    def key(query_type: str, key: Any) -> str:
+        return f"cache:{query_type}:{key}"
+
+    def enabled(self, query_type: str) -> bool:
+        return bool(self.policies.get(query_type))
+
+    def get_or_load(self, query_type: str, key: Any, loader: Callable[[], Any]) -> Any:
+        """读取缓存，未命中时调用 loader 加载；loader 返回 None 时不缓存"""
+        ttl = self.policies.get(query_type)
+        if not ttl:
+            return loader()
+
+        full_key = self.key(query_type, key)
+        hit, value = self.local.get(full_key)
+        if hit:
+            return value
+
+        with self._lock:
+            call = self._inflight.get(full_key)
+            is_leader = call is None
+            if is_leader:
+                call = _InflightLoad()
+                self._inflight[full_key] = call
+                epoch = self._epochs.get(full_key, 0)
+
+        if not is_leader:
+            if not call.event.wait(self.config["load_timeout"]):
+                # 加载者迟迟没有返回（例如数据库很慢），自行加载而不是当作不存在
+                return loader()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            value = self._l2_get(full_key)
+            if value is None:
+                value = loader()
+                if value is not None:
+                    self._l2_set(full_key, value, ttl)
+            # 加载期间若收到失效通知，结果可能已过期：只返回，不写入 L1，并撤销写入 L2 的值
+            with self._lock:
+                stale = self._epochs.get(full_key, 0) != epoch
+                if value is not None and not stale:
+                    self.local.set(full_key, value, ttl)
+            if stale:
+                self._l2_delete(full_key)
+            call.value = value
+            return value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(full_key, None)
+                self._epochs.pop(full_key, None)
+            call.event.set()
+
+    def invalidate(self, query_type: str, *keys: Any):
+        """删除本地与 Redis 中的条目，并通知其他进程"""
+        full_keys = [self.key(query_type, k) for k in keys]
+        self._drop_local(full_keys)
+        if not self.redis:
+            return
+        try:
+            self.redis.delete(*full_keys)
+            self.redis.publish(
+                self.config["invalidation_channel"],
+                dumps({"node": self.node_id, "keys": full_keys})
+            )
+        except Exception as e:
+            logging.error(f"缓存失效广播错误: {str(e)}")
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """注册失效回调，本地或远程失效某个键时调用"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """启动失效消息订阅线程"""
+        if not self.redis or self._pubsub_thread:
+            return
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.config["invalidation_channel"]: self._on_invalidation})
+        self._pubsub_thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def close(self):
+        if self._pubsub_thread:
+            self._pubsub_thread.stop()
+            self._pubsub_thread = None
+        if self._pubsub:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def _on_invalidation(self, message):
+        try:
+            payload = loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if payload.get("node") != self.node_id:
+            self._drop_local(payload.get("keys", []))
+
+    def _drop_local(self, full_keys: List[str]):
+        with self._lock:
+            for full_key in full_keys:
+                self.local.delete(full_key)
+                # 纪元只用于判断正在进行的加载是否过期，没有加载时不需要记录
+                if full_key in self._inflight:
+                    self._epochs[full_key] = self._epochs.get(full_key, 0) + 1
+        for full_key in full_keys:
+            for callback in self._listeners:
+                callback(full_key)
+
+    def _l2_get(self, full_key: str) -> Any:
+        if not self.redis:
+            return None
+        try:
+            raw = self.redis.get(full_key)
+        except Exception as e:
+            logging.error(f"读取Redis缓存错误: {str(e)}")
+            return None
+        if raw is None:
+            return None
+        return json.loads(raw, object_hook=_object_hook)
+
+    def _l2_set(self, full_key: str, value: Any, ttl: float):
+        if not self.redis:
+            return
+        try:
+            self.redis.set(full_key, json.dumps(value, default=_default), ex=int(ttl))
+        except Exception as e:
+            logging.error(f"写入Redis缓存错误: {str(e)}")
+
+    def _l2_delete(self, full_key: str):
+        if not self.redis:
+            return
+        try:
+            self.redis.delete(full_key)
+        except Exception as e:
+            logging.error(f"删除Redis缓存错误: {str(e)}")
@@ -1,27 +1,42 @@
 import mysql.connector
 import redis
+import itertools
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Dict, List, Any
-import json
 
-from server.config import DB_CONFIG, REDIS_CONFIG
+from common.codec import dumps, loads, JSONDecodeError
+from server.config import DB_CONFIG, REDIS_CONFIG, REPLICA_CONFIG
 
 class DatabaseManager:
-    def __init__(self, db_config: Dict[str, Any], redis_config: Dict[str, Any] = None):
+    def __init__(self, db_config: Dict[str, Any], redis_config: Dict[str, Any] = None,
+                 replica_configs: List[Dict[str, Any]] = None):
         self.db_config = db_config
         
         # 如果传入了 Redis 配置，则初始化 Redis 连接
         if redis_config:
             self.redis_config = redis_config
+        
+        # 只读副本：每项只需写出与主库不同的字段（如 host/port）
+        self.replica_configs = replica_configs or []
+        self.replicas = []  # [{"name", "config", "pool", "healthy"}]
+        self._replica_cursor = itertools.count()
+        # 会话最近一次写入时间，用于保证读己之写；按写入时间排序，过期项在写入时清除
+        self._last_writes = OrderedDict()  # session -> timestamp
+        self._last_writes_lock = threading.Lock()
         self._setup_connections()
 
     def _setup_connections(self):
         """初始化数据库连接池和Redis连接"""
         try:
-            self.cnx_pool = mysql.connector.pooling.MySQLConnectionPool(**self.db_config)
+            self.cnx_pool = self._create_pool(self.db_config)
         except mysql.connector.Error as e:
             print(f"MySQL连接错误: {e}, 配置: {self.db_config}")
             raise
 
+        self._setup_replicas()
+
         try:
             self.redis = redis.Redis(**self.redis_config)
             # 测试Redis连接
@@ -30,26 +45,132 @@ class DatabaseManager:
             print(f"Redis连接错误: {e}, 配置: {self.redis_config}")
             raise
 
-    def get_connection(self):
-        """获取数据库连接"""
-        return self.cnx_pool.get_connection()
+    def _setup_replicas(self):
+        """初始化只读副本连接池，副本不可用时不影响启动"""
+        for index, replica_config in enumerate(self.replica_configs):
+            config = {
+                **self.db_config,
+                "pool_name": f"{self.db_config['pool_name']}_replica{index}",
+                **replica_config
+            }
+            replica = {"name": config["pool_name"], "config": config, "pool": None, "healthy": False}
+            try:
+                replica["pool"] = self._create_pool(config)
+                replica["healthy"] = True
+            except mysql.connector.Error as e:
+                print(f"MySQL副本连接错误: {e}, 副本: {replica['name']}")
+            self.replicas.append(replica)
+
+        if self.replicas:
+            self._start_monitor()
+
+    @staticmethod
+    def _create_pool(config: Dict[str, Any]):
+        return mysql.connector.pooling.MySQLConnectionPool(**config)
+
+    def _start_monitor(self):
+        threading.Thread(target=self._monitor_replicas, daemon=True).start()
+
+    def _monitor_replicas(self):
+        """定期检查副本健康状态"""
+        while True:
+            time.sleep(REPLICA_CONFIG["health_check_interval"])
+            self.check_replicas()
+
+    def check_replicas(self):
+        """检查一遍所有副本：失效的副本停止使用，恢复的副本重新加入"""
+        for replica in self.replicas:
+            replica["healthy"] = self._check_replica(replica)
+
+    def _check_replica(self, replica) -> bool:
+        conn = None
+        try:
+            if replica["pool"] is None:
+                replica["pool"] = self._create_pool(replica["config"])
+            conn = replica["pool"].get_connection()
+            conn.ping(reconnect=True)
+            return True
+        except mysql.connector.Error:
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def _pick_replica(self):
+        """轮询选择一个健康的副本"""
+        healthy = [r for r in self.replicas if r["healthy"]]
+        if not healthy:
+            return None
+        return healthy[next(self._replica_cursor) % len(healthy)]
 
-    def execute_query(self, query: str, params: tuple = None) -> List[Dict]:
-        """执行查询并返回结果"""
+    def mark_write(self, session):
+        """记录会话的写入时间，之后一段时间内该会话的读请求走主库"""
+        if session is None:
+            return
+        now = time.monotonic()
+        expired_before = now - REPLICA_CONFIG["read_your_writes_window"]
+        with self._last_writes_lock:
+            self._last_writes[session] = now
+            self._last_writes.move_to_end(session)
+            # 写入后断开的会话不会再读，过期项在这里从最旧的一端清除
+            while True:
+                oldest, last_write = next(iter(self._last_writes.items()))
+                if last_write >= expired_before:
+                    break
+                del self._last_writes[oldest]
+
+    def _needs_primary(self, session) -> bool:
+        if session is None:
+            return False
+        last_write = self._last_writes.get(session)
+        if last_write is None:
+            return False
+        return time.monotonic() - last_write < REPLICA_CONFIG["read_your_writes_window"]
+
+    def _acquire(self, read_only: bool, session):
+        """返回 (连接, 所属副本)，使用主库时副本为 None"""
+        if read_only and not self._needs_primary(session):
+            replica = self._pick_replica()
+            if replica:
+                try:
+                    return replica["pool"].get_connection(), replica
+                except mysql.connector.Error as e:
+                    replica["healthy"] = False
+                    print(f"MySQL副本不可用，切换到主库: {e}, 副本: {replica['name']}")
+        return self.cnx_pool.get_connection(), None
+
+    def get_connection(self, read_only: bool = False, session=None):
+        """
+        获取数据库连接
+        read_only 为 True 时优先使用健康的副本；副本不可用或会话刚写入过则使用主库
+        """
+        conn, _ = self._acquire(read_only, session)
+        return conn
+
+    def execute_query(self, query: str, params: tuple = None,
+                      read_only: bool = False, session=None) -> List[Dict]:
+        """执行查询并返回结果；只读查询在副本上执行失败时回退到主库"""
         conn = None
         cursor = None
+        replica = None
         try:
-            conn = self.get_connection()
+            conn, replica = self._acquire(read_only, session)
             cursor = conn.cursor(dictionary=True)
             cursor.execute(query, params or ())
             return cursor.fetchall()
+        except (mysql.connector.InterfaceError, mysql.connector.OperationalError):
+            if replica is None:
+                raise
+            replica["healthy"] = False
         finally:
             if cursor:
                 cursor.close()
             if conn:
                 conn.close()
+        # 副本在查询过程中失效，改用主库重试
+        return self.execute_query(query, params)
 
-    def execute_update(self, query: str, params: tuple = None) -> int:
+    def execute_update(self, query: str, params: tuple = None, session=None) -> int:
         """执行更新操作并返回影响的行数"""
         conn = None
         cursor = None
@@ -58,6 +179,7 @@ class DatabaseManager:
             cursor = conn.cursor()
             cursor.execute(query, params or ())
             conn.commit()
+            self.mark_write(session)
             return cursor.rowcount
         finally:
             if cursor:
@@ -68,7 +190,7 @@ class DatabaseManager:
     def cache_set(self, key: str, value: Any, expire: int = None):
         """设置缓存"""
         if isinstance(value, (dict, list)):
-            value = json.dumps(value)
+            value = dumps(value)
         self.redis.set(key, value, ex=expire)
 
     def cache_get(self, key: str) -> Optional[Any]:
@@ -76,9 +198,9 @@ class DatabaseManager:
         value = self.redis.get(key)
         if value:
             try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value.decode()
+                return loads(value)
+            except JSONDecodeError:
+                return value
         return None
 
     def cache_delete(self, key: str):
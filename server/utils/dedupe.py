@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+from server.config import MESSAGE_CONFIG
+
+
+class DedupeWindow:
+    """
+    按会话划分的去重窗口
+    每个会话记住最近的客户端消息 id，数量超过 max_size 或超过 ttl 的 id 被淘汰
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None):
+        self.max_size = max_size or MESSAGE_CONFIG["dedupe_window"]
+        self.ttl = ttl or MESSAGE_CONFIG["dedupe_ttl"]
+        self._sessions: Dict[Hashable, "OrderedDict[Any, float]"] = {}
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def seen(self, session: Hashable, msg_id: Any, now: float = None) -> bool:
+        """id 在窗口内已出现过返回 True；否则记录下来并返回 False"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            window = self._sessions.get(session)
+            if window is None:
+                window = self._sessions[session] = OrderedDict()
+            self._evict(window, now)
+            if msg_id in window:
+                self.duplicates += 1
+                return True
+            window[msg_id] = now
+            if len(window) > self.max_size:
+                window.popitem(last=False)
+            return False
+
+    def _evict(self, window: "OrderedDict[Any, float]", now: float):
+        # 按插入顺序即时间顺序，从最旧的开始淘汰
+        expire_before = now - self.ttl
+        while window:
+            msg_id, seen_at = next(iter(window.items()))
+            if seen_at > expire_before:
+                break
+            window.popitem(last=False)
+
+    def prune(self, now: float = None):
+        """淘汰所有会话中过期的 id，并移除空会话"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for session, window in list(self._sessions.items()):
+                self._evict(window, now)
+                if not window:
+                    del self._sessions[session]
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,248 @@
+import ctypes
+import ctypes.util
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from server.config import FANOUT_CONFIG
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int)
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+class _SendmmsgBatcher:
+    """
+    Linux sendmmsg(2) 批量发送：一次系统调用发出一批目的地址不同、内容相同的数据报
+    仅支持 IPv4 数值地址；不可用时由 FanoutEngine 回退到逐个 sendto
+    """
+
+    def __init__(self, sock, batch_size: int):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._sendmmsg = libc.sendmmsg
+        self._sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+        self._sendmmsg.restype = ctypes.c_int
+        self._fd = sock.fileno()
+        self._batch_size = batch_size
+        self._msgs = (_MMsgHdr * batch_size)()
+        self._iovs = (_IOVec * batch_size)()
+        for msg, iov in zip(self._msgs, self._iovs):
+            msg.msg_hdr.msg_iov = ctypes.pointer(iov)
+            msg.msg_hdr.msg_iovlen = 1
+        # 地址 -> sockaddr_in，避免每次重新打包
+        self._sockaddrs: Dict[Tuple[str, int], ctypes.Array] = {}
+        self._lock = threading.Lock()
+
+    def _sockaddr(self, addr) -> ctypes.Array:
+        sockaddr = self._sockaddrs.get(addr)
+        if sockaddr is None:
+            if len(self._sockaddrs) > FANOUT_CONFIG["max_cached_addrs"]:
+                self._sockaddrs.clear()
+            packed = (
+                socket.AF_INET.to_bytes(2, sys.byteorder)
+                + addr[1].to_bytes(2, "big")
+                + socket.inet_aton(addr[0])
+                + bytes(8)
+            )
+            sockaddr = ctypes.create_string_buffer(packed, 16)
+            self._sockaddrs[addr] = sockaddr
+        return sockaddr
+
+    def send(self, payload: bytes, addrs: Sequence[Tuple[str, int]], failed: deque) -> int:
+        """同一负载发给多个地址"""
+        buf = ctypes.create_string_buffer(payload, len(payload))
+        return self.send_each(((buf, addr) for addr in addrs), failed)
+
+    def send_each(self, packets, failed: deque) -> int:
+        """逐个指定负载和地址发送 [(负载, 地址)]，负载可以是 bytes 或已创建的 ctypes 缓冲区"""
+        failures = 0
+        # 本批引用的负载缓冲区和 sockaddr，发送前不能释放（sockaddr 缓存可能在批内被清空）
+        buffers = {}
+        sockaddrs = []
+        with self._lock:
+            pending = []
+            for payload, addr in packets:
+                try:
+                    sockaddr = self._sockaddr(addr)
+                except (OSError, ValueError, TypeError, IndexError) as e:
+                    failed.append((addr, time.time(), e))
+                    failures += 1
+                    continue
+                sockaddrs.append(sockaddr)
+                buf = buffers.get(id(payload))
+                if buf is None:
+                    buf = payload if isinstance(payload, ctypes.Array) \
+                        else ctypes.create_string_buffer(payload, len(payload))
+                    buffers[id(payload)] = buf
+                index = len(pending)
+                self._iovs[index].iov_base = ctypes.addressof(buf)
+                self._iovs[index].iov_len = len(buf)
+                hdr = self._msgs[index].msg_hdr
+                hdr.msg_name = ctypes.addressof(sockaddr)
+                hdr.msg_namelen = 16
+                pending.append(addr)
+                if len(pending) == self._batch_size:
+                    failures += self._flush(pending, failed)
+                    pending = []
+                    buffers.clear()
+                    sockaddrs.clear()
+            if pending:
+                failures += self._flush(pending, failed)
+        return failures
+
+    def _flush(self, pending, failed: deque) -> int:
+        """
+        发送已填好的一批消息
+        sendmmsg 部分成功时返回已发送的条数，从下一条继续；
+        返回 -1 说明剩余的第一条发送失败，记录该地址后跳过
+        """
+        failures = 0
+        index, total = 0, len(pending)
+        while index < total:
+            msgs = ctypes.cast(ctypes.byref(self._msgs, index * ctypes.sizeof(_MMsgHdr)),
+                               ctypes.POINTER(_MMsgHdr))
+            sent = self._sendmmsg(self._fd, msgs, total - index, 0)
+            if sent > 0:
+                index += sent
+                continue
+            err = ctypes.get_errno()
+            failed.append((pending[index], time.time(), OSError(err, os.strerror(err))))
+            failures += 1
+            index += 1
+        return failures
+
+
+class FanoutStats:
+    """广播耗时统计"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.messages = 0
+        self.datagrams = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+
+    def record(self, elapsed: float, datagrams: int):
+        self.messages += 1
+        self.datagrams += datagrams
+        self.total_time += elapsed
+        self.last_time = elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前统计快照（毫秒）"""
+        return {
+            "messages": self.messages,
+            "datagrams": self.datagrams,
+            "avg_ms": (self.total_time / self.messages * 1000) if self.messages else 0.0,
+            "max_ms": self.max_time * 1000,
+            "last_ms": self.last_time * 1000
+        }
+
+
+class FanoutEngine:
+    """
+    广播引擎
+    调用方把消息编码一次得到不可变的 bytes，引擎按批次把同一份负载发给所有地址；
+    发送失败的地址不在发送循环里处理，而是记录下来由调用方稍后统一处理
+    """
+
+    def __init__(self, sock, batch_size: int = None, max_failed: int = None,
+                 use_sendmmsg: bool = None):
+        self.socket = sock
+        self.batch_size = batch_size or FANOUT_CONFIG["batch_size"]
+        self.stats = FanoutStats()
+        self._failed: deque = deque(maxlen=max_failed or FANOUT_CONFIG["max_failed"])
+        self._lock = threading.Lock()
+        self._batcher: Optional[_SendmmsgBatcher] = None
+        if use_sendmmsg is None:
+            use_sendmmsg = FANOUT_CONFIG["use_sendmmsg"]
+        if use_sendmmsg and sys.platform.startswith("linux") and sock.family == socket.AF_INET:
+            try:
+                self._batcher = _SendmmsgBatcher(sock, self.batch_size)
+            except (OSError, AttributeError):
+                self._batcher = None
+
+    @property
+    def backend(self) -> str:
+        return "sendmmsg" if self._batcher else "sendto"
+
+    def send(self, payload: bytes, addrs: Sequence[Tuple[str, int]]) -> int:
+        """发送给所有地址，返回失败数量"""
+        start = time.perf_counter()
+        if self._batcher:
+            failures = self._batcher.send(payload, addrs, self._failed)
+            self.stats.record(time.perf_counter() - start, len(addrs))
+            return failures
+        sendto = self.socket.sendto
+        failed = self._failed
+        failures = 0
+        index = 0
+        total = len(addrs)
+        while index < total:
+            batch_end = min(index + self.batch_size, total)
+            try:
+                for index in range(index, batch_end):
+                    sendto(payload, addrs[index])
+            except OSError as e:
+                # 记录失败地址后从下一个地址继续
+                failed.append((addrs[index], time.time(), e))
+                failures += 1
+            index += 1
+        self.stats.record(time.perf_counter() - start, total)
+        return failures
+
+    def send_each(self, packets: Sequence[Tuple[bytes, Tuple[str, int]]]) -> int:
+        """发送各不相同的负载 [(负载, 地址)]，返回失败数量"""
+        start = time.perf_counter()
+        failures = 0
+        if self._batcher:
+            failures = self._batcher.send_each(packets, self._failed)
+        else:
+            sendto = self.socket.sendto
+            for payload, addr in packets:
+                try:
+                    sendto(payload, addr)
+                except OSError as e:
+                    self._failed.append((addr, time.time(), e))
+                    failures += 1
+        self.stats.record(time.perf_counter() - start, len(packets))
+        return failures
+
+    def drain_failed(self) -> List[Tuple[Tuple[str, int], float, Exception]]:
+        """取出并清空失败记录 [(地址, 时间, 异常)]"""
+        with self._lock:
+            failed = list(self._failed)
+            self._failed.clear()
+        return failed
+
+    def report(self) -> Dict[str, Any]:
+        """返回并重置统计"""
+        with self._lock:
+            snapshot = self.stats.snapshot()
+            self.stats.reset()
+        return snapshot
@@ -0,0 +1,135 @@
+import atexit
+import logging
+import queue
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from common.codec import dumps
+from server.config import LOG_CONFIG
+
+# LogRecord 自带的属性，其余的属性来自 extra，作为结构化字段输出
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listeners: Dict[str, QueueListener] = {}
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON，extra 中的字段原样并入"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    高频日志采样：带 extra={"sample": 键} 的日志按 rates[键] 每 N 条保留 1 条，
+    保留的记录带上 sampled=N，便于统计时还原数量；未配置的键全部保留
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample", None)
+        rate = self.rates.get(key, 1) if key else 1
+        if rate <= 1:
+            return True
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % rate:
+            return False
+        record.sampled = rate
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    只把日志记录放入队列，格式化（包括 msg % args 和异常堆栈）全部留给后台线程；
+    标准 QueueHandler 会在调用线程中先格式化
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(config: Dict[str, Any] = None, logger: Optional[logging.Logger] = None) -> QueueListener:
+    """
+    按 LOG_CONFIG 配置日志：调用方只把记录放入内存队列，由后台线程写入按大小轮转的文件和控制台；
+    同一个 logger 重复调用时返回已有的 listener
+    """
+    config = {**LOG_CONFIG, **(config or {})}
+    logger = logger or logging.getLogger()
+    with _setup_lock:
+        listener = _listeners.get(logger.name)
+        if listener is not None:
+            return listener
+
+        handlers = []
+        text_formatter = logging.Formatter(config["format"])
+        if config["file"]:
+            file_handler = RotatingFileHandler(
+                config["file"],
+                maxBytes=config["max_bytes"],
+                backupCount=config["backup_count"],
+                encoding="utf-8",
+                delay=True
+            )
+            file_handler.setFormatter(JsonFormatter() if config["json"] else text_formatter)
+            handlers.append(file_handler)
+        if config["console"]:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(text_formatter)
+            handlers.append(console_handler)
+
+        # 无界队列：写日志的线程永远不会因为磁盘 I/O 阻塞
+        log_queue = queue.SimpleQueue()
+        queue_handler = DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(config["sampling"]))
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+        logger.setLevel(config["level"])
+
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        if not _listeners:
+            atexit.register(shutdown_logging)
+        _listeners[logger.name] = listener
+        return listener
+
+
+def stop_logging(logger: Optional[logging.Logger] = None):
+    """写出队列中剩余的日志并停止后台线程"""
+    logger = logger or logging.getLogger()
+    with _setup_lock:
+        listener = _listeners.pop(logger.name, None)
+    if listener is not None:
+        listener.stop()
+
+
+def shutdown_logging():
+    """进程退出时停止所有后台日志线程"""
+    with _setup_lock:
+        listeners = list(_listeners.values())
+        _listeners.clear()
+    for listener in listeners:
+        listener.stop()
@@ -0,0 +1,162 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class Request:
+    """一个入站请求，在中间件和处理函数之间传递"""
+    __slots__ = ("addr", "data", "message", "command", "username", "client")
+
+    def __init__(self, addr, data=None, message: Dict[str, Any] = None):
+        self.addr = addr
+        self.data = data          # 原始数据报，解码后不再使用
+        self.message = message
+        self.command = message.get("command") if message else None
+        self.username = message.get("username") if message else None
+        self.client = None        # 会话解析后为 (地址, 所在频道)
+
+
+Middleware = Callable[[Request, Callable[[Request], None]], None]
+Handler = Callable[[Request], None]
+
+
+class _Registration:
+    __slots__ = ("handler", "public", "fields")
+
+    def __init__(self, handler: Handler, public: bool, fields: Tuple[str, ...]):
+        self.handler = handler
+        self.public = public      # 未登录也可调用（auth、register 等）
+        self.fields = fields      # 消息中必须包含的字段
+
+
+class Pipeline:
+    """
+    命令分发管道
+    - 中间件按 use 的顺序组成调用链 middleware(request, call_next)，不调用 call_next 即结束该请求
+    - 链的末端按命令查找 register 注册的处理函数，未注册的命令交给 fallback
+    - 每个中间件和每个命令的处理函数分别计时，中间件的耗时不含其后各阶段
+    """
+
+    def __init__(self, fallback: Optional[Handler] = None):
+        self.fallback = fallback
+        self._middleware: List[Tuple[str, Middleware]] = []
+        self._handlers: Dict[str, _Registration] = {}
+        self._chain: Optional[Callable[[Request], None]] = None
+        self._stats: Dict[str, List[float]] = {}  # 阶段 -> [次数, 总耗时, 最大耗时]
+        self._lock = threading.Lock()
+
+    def use(self, name: str, middleware: Middleware):
+        """在链尾追加一个中间件"""
+        self._middleware.append((name, middleware))
+        self._chain = None
+
+    def register(self, command: str, handler: Handler = None, public: bool = False,
+                 fields: Tuple[str, ...] = ()):
+        """注册命令的处理函数，也可作为装饰器使用；同名命令后注册的覆盖先注册的"""
+        if handler is None:
+            return lambda func: self.register(command, func, public, fields) or func
+        self._handlers[command] = _Registration(handler, public, tuple(fields))
+
+    def registration(self, command: str) -> Optional[_Registration]:
+        return self._handlers.get(command)
+
+    @property
+    def commands(self) -> List[str]:
+        return sorted(self._handlers)
+
+    def handle(self, request: Request):
+        """让请求依次经过各中间件，最后交给处理函数"""
+        chain = self._chain
+        if chain is None:
+            chain = self._chain = self._build()
+        chain(request)
+
+    def _build(self) -> Callable[[Request], None]:
+        chain = self._terminal
+        for name, middleware in reversed(self._middleware):
+            chain = self._timed(name, middleware, chain)
+        return chain
+
+    def _terminal(self, request: Request):
+        registration = self._handlers.get(request.command)
+        handler = registration.handler if registration else self.fallback
+        if handler is None:
+            return
+        start = time.perf_counter()
+        try:
+            handler(request)
+        finally:
+            self._record(f"command:{request.command}", time.perf_counter() - start)
+
+    def _timed(self, name: str, middleware: Middleware, following: Callable[[Request], None]):
+        def stage(request: Request):
+            inner = 0.0
+
+            def call_next(req: Request):
+                nonlocal inner
+                start = time.perf_counter()
+                try:
+                    following(req)
+                finally:
+                    inner += time.perf_counter() - start
+
+            start = time.perf_counter()
+            try:
+                middleware(request, call_next)
+            finally:
+                self._record(name, time.perf_counter() - start - inner)
+        return stage
+
+    def _record(self, name: str, elapsed: float):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += elapsed
+            if elapsed > stats[2]:
+                stats[2] = elapsed
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """返回并重置各阶段统计（毫秒）"""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        return {
+            name: {"count": count, "avg_ms": total / count * 1000, "max_ms": max_time * 1000}
+            for name, (count, total, max_time) in stats.items()
+        }
+
+
+class RateLimiter:
+    """按键的令牌桶限速"""
+
+    def __init__(self, per_minute: float, burst: float):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self._buckets: Dict[Any, List[float]] = {}  # 键 -> [令牌数, 上次补充时间]
+        self._lock = threading.Lock()
+
+    def allow(self, key: Any, now: float = None) -> Tuple[bool, float]:
+        """消耗一个令牌，返回 (是否允许, 不允许时需要等待的秒数)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0.0
+            return False, (1 - bucket[0]) / self.rate
+
+    def prune(self, now: float = None):
+        """移除已经补满的令牌桶"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for key, (tokens, last) in list(self._buckets.items()):
+                if tokens + (now - last) * self.rate >= self.burst:
+                    del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from common.codec import dumps
+from server.config import PRESENCE_CONFIG
+
+
+class PresenceAggregator:
+    """
+    在线状态合并
+    每个频道在一个窗口内的加入/离开汇总成 presence 事件再广播；
+    窗口内先离开又加入（或先加入又离开）的用户互相抵消，重连风暴时不产生多余事件
+    """
+
+    def __init__(self, emit: Callable[[str, bytes], None], config: Dict[str, Any] = None):
+        self.config = {**PRESENCE_CONFIG, **(config or {})}
+        self.emit = emit  # emit(channel, payload)
+        self._pending: Dict[str, Tuple[Set[str], Set[str]]] = {}  # channel -> (joined, left)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.events = 0
+
+    def start(self):
+        """启动定时发送线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _changes(self, channel: str) -> Tuple[Set[str], Set[str]]:
+        changes = self._pending.get(channel)
+        if changes is None:
+            changes = self._pending[channel] = (set(), set())
+        return changes
+
+    def joined(self, channel: str, username: str):
+        with self._lock:
+            joined, left = self._changes(channel)
+            if username in left:
+                left.discard(username)
+            else:
+                joined.add(username)
+
+    def left(self, channel: str, username: str):
+        with self._lock:
+            joined, left = self._changes(channel)
+            if username in joined:
+                joined.discard(username)
+            else:
+                left.add(username)
+
+    def _run(self):
+        window = self.config["window"]
+        while True:
+            time.sleep(window)
+            self.flush()
+
+    def flush(self):
+        """发送所有频道累积的变化"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for channel, (joined, left) in pending.items():
+            for payload in self.build_events(channel, joined, left):
+                self.events += 1
+                self.emit(channel, payload)
+
+    def build_events(self, channel: str, joined, left) -> List[bytes]:
+        """按 max_names 拆分成若干个事件"""
+        names = [("joined", name) for name in sorted(joined)] + [("left", name) for name in sorted(left)]
+        max_names = self.config["max_names"]
+        events = []
+        for start in range(0, len(names), max_names):
+            event = {"type": "presence", "channel": channel, "joined": [], "left": []}
+            for kind, name in names[start:start + max_names]:
+                event[kind].append(name)
+            events.append(dumps(event))
+        return events
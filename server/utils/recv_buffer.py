@@ -0,0 +1,28 @@
+class ReceiveBuffer:
+    """
+    预分配的接收缓冲区，接收循环只有一个线程，整个进程复用同一块
+    recv_from 返回的视图在下一次接收前有效，解码阶段在此之前同步完成
+    多分配 1 字节，收到的数据超过 size 说明数据报被截断
+    """
+    __slots__ = ("size", "buffer", "view", "nbytes", "addr")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buffer = bytearray(size + 1)
+        self.view = memoryview(self.buffer)
+        self.nbytes = 0
+        self.addr = None
+
+    def recv_from(self, sock) -> memoryview:
+        """用 recvfrom_into 接收一个数据报，返回有效数据的视图"""
+        self.nbytes, self.addr = sock.recvfrom_into(self.view)
+        return self.view[:self.nbytes]
+
+    @property
+    def data(self) -> memoryview:
+        return self.view[:self.nbytes]
+
+    @property
+    def truncated(self) -> bool:
+        """最近一次收到的数据报是否超过 size（超出部分已被内核丢弃）"""
+        return self.nbytes > self.size
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from common.codec import dumps
+from common.reliability import ReliableSession, unwrap
+from server.config import RELIABILITY_CONFIG
+
+
+class ReliableTransport:
+    """
+    服务器端可靠传输
+    - 按客户端地址维护可靠会话，发送接口与 FanoutEngine 相同，可直接替换广播引擎
+    - 有会话的地址逐个加序号发送并等待确认，其余地址仍走普通广播
+    - 重传线程按各会话的超时重发未确认的包
+    - 没有会话的地址发来可靠包时，只有 authorize(地址, 负载) 认可的地址才自动建立会话，
+      避免任意地址占用服务器状态
+    """
+
+    def __init__(self, fanout, config: Dict[str, Any] = None,
+                 authorize: Optional[Callable[[Tuple[str, int], Any], bool]] = None):
+        self.config = {**RELIABILITY_CONFIG, **(config or {})}
+        self.fanout = fanout
+        self.authorize = authorize
+        self._sessions: Dict[Tuple[str, int], ReliableSession] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        # 已关闭会话的累计计数
+        self._closed = {"retransmits": 0, "lost": 0, "dropped": 0, "duplicates": 0}
+
+    def start(self):
+        """启动重传线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def open(self, addr: Tuple[str, int], first_seq: int = None) -> ReliableSession:
+        """为地址建立新的可靠会话，已有会话会被重置"""
+        session = ReliableSession(self.config, first_seq)
+        with self._lock:
+            self._retire(self._sessions.get(addr))
+            self._sessions[addr] = session
+        return session
+
+    def close(self, addr: Tuple[str, int]):
+        """客户端断开时丢弃其会话"""
+        with self._lock:
+            self._retire(self._sessions.pop(addr, None))
+
+    def move(self, old: Tuple[str, int], new: Tuple[str, int]) -> bool:
+        """客户端地址变化时把会话转移到新地址，旧地址没有会话时返回 False"""
+        with self._lock:
+            session = self._sessions.pop(old, None)
+            if session is None:
+                return False
+            if new in self._sessions:
+                self._retire(self._sessions[new])
+            self._sessions[new] = session
+            return True
+
+    def _retire(self, session: Optional[ReliableSession]):
+        if session:
+            self._closed["retransmits"] += session.sender.retransmits
+            self._closed["lost"] += session.sender.lost
+            self._closed["dropped"] += session.sender.dropped
+            self._closed["duplicates"] += session.receiver.duplicates
+
+    def __contains__(self, addr) -> bool:
+        return addr in self._sessions
+
+    def send(self, payload: bytes, addrs: Sequence[Tuple[str, int]]) -> int:
+        """发送给所有地址，返回失败数量"""
+        now = time.monotonic()
+        plain, packets = [], []
+        with self._lock:
+            for addr in addrs:
+                session = self._sessions.get(addr)
+                if session is None:
+                    plain.append(addr)
+                else:
+                    packets.extend((packet, addr) for packet in session.sender.send(payload, now))
+        failures = 0
+        if plain:
+            failures += self.fanout.send(payload, plain)
+        if packets:
+            failures += self.fanout.send_each(packets)
+        return failures
+
+    def receive(self, addr: Tuple[str, int], message: Any) -> Any:
+        """
+        处理收到的数据包
+        确认包在此消化并返回 None；可靠包回复确认后返回其负载，重复的包返回 None；普通包原样返回
+        """
+        if not isinstance(message, dict):
+            return message
+        if message.get("command") == "ack":
+            self._on_ack(addr, message.get("ack", 0), message.get("sack", ()))
+            return None
+        seq, body = unwrap(message)
+        if seq is None:
+            return message
+        with self._lock:
+            session = self._sessions.get(addr)
+        if session is None:
+            if not (self.authorize and self.authorize(addr, body)):
+                # 未认可的地址不建立会话、不回复确认，负载按普通包交给上层
+                return body
+            # 已登录的客户端在服务器建立会话之前已开始编号，从当前序号接续
+            session = self.open(addr, seq)
+        with self._lock:
+            is_new = session.receiver.on_packet(seq)
+            ack = dumps({"type": "ack", **session.receiver.ack_fields()})
+        try:
+            self.fanout.socket.sendto(ack, addr)
+        except OSError as e:
+            logging.warning(f"发送确认失败 {addr}: {str(e)}")
+        return body if is_new else None
+
+    def _on_ack(self, addr, ack: int, sack):
+        with self._lock:
+            session = self._sessions.get(addr)
+            if session is None:
+                return
+            packets = session.sender.on_ack(ack, sack)
+        if packets:
+            self.fanout.send_each([(packet, addr) for packet in packets])
+
+    def _run(self):
+        tick = self.config["tick"]
+        while True:
+            time.sleep(tick)
+            now = time.monotonic()
+            packets = []
+            with self._lock:
+                for addr, session in self._sessions.items():
+                    if session.sender.in_flight:
+                        packets.extend((packet, addr) for packet in session.sender.poll(now))
+            if packets:
+                self.fanout.send_each(packets)
+
+    def summary(self) -> Dict[str, int]:
+        """汇总指标"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            totals = dict(self._closed)
+        for session in sessions:
+            totals["retransmits"] += session.sender.retransmits
+            totals["lost"] += session.sender.lost
+            totals["dropped"] += session.sender.dropped
+            totals["duplicates"] += session.receiver.duplicates
+        totals["sessions"] = len(sessions)
+        totals["in_flight"] = sum(len(s.sender.in_flight) for s in sessions)
+        return totals
@@ -0,0 +1,72 @@
+import threading
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.config import ROSTER_CONFIG
+
+JOIN = 1
+LEAVE = 0
+
+
+class _ChannelLog:
+    __slots__ = ("version", "changes")
+
+    def __init__(self, max_log: int):
+        self.version = 0
+        self.changes = deque(maxlen=max_log)  # (版本, JOIN/LEAVE, 用户名)
+
+
+class RosterLog:
+    """
+    频道成员列表的版本与变化记录
+    成员本身由服务器的频道成员索引维护，这里只记录每次变化对应的版本，
+    用于向持有旧版本的客户端返回差异；epoch 在每次启动时重新生成，重启前的版本一律视为过期
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**ROSTER_CONFIG, **(config or {})}
+        self.epoch = uuid.uuid4().hex[:8]
+        self._channels: Dict[str, _ChannelLog] = {}
+        self._lock = threading.Lock()
+
+    def _log(self, channel: str) -> _ChannelLog:
+        log = self._channels.get(channel)
+        if log is None:
+            log = self._channels[channel] = _ChannelLog(self.config["max_log"])
+        return log
+
+    def record(self, channel: str, username: str, joined: bool):
+        with self._lock:
+            log = self._log(channel)
+            log.version += 1
+            log.changes.append((log.version, JOIN if joined else LEAVE, username))
+
+    def version(self, channel: str) -> int:
+        log = self._channels.get(channel)
+        return log.version if log else 0
+
+    def diff(self, channel: str, since: int, epoch: str = None) -> Optional[Tuple[int, List[str], List[str]]]:
+        """
+        返回 (当前版本, 加入的用户, 离开的用户)
+        since 不在变化记录范围内或 epoch 不符时返回 None，调用方应发送完整列表
+        """
+        if epoch != self.epoch:
+            return None
+        with self._lock:
+            log = self._channels.get(channel)
+            version = log.version if log else 0
+            if since == version:
+                return version, [], []
+            if not log or since > version or not log.changes or log.changes[0][0] > since + 1:
+                return None
+            # 同一用户多次变化只看首尾：首次为加入说明旧版本中不在，最终为加入说明现在在
+            first, last = {}, {}
+            for change_version, op, username in log.changes:
+                if change_version <= since:
+                    continue
+                first.setdefault(username, op)
+                last[username] = op
+        joined = sorted(u for u, op in last.items() if op == JOIN and first[u] == JOIN)
+        left = sorted(u for u, op in last.items() if op == LEAVE and first[u] == LEAVE)
+        return version, joined, left
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from server.config import INGRESS_CONFIG
+
+
+class IngressScheduler:
+    """
+    入站请求的优先级调度
+    接收线程把解析好的请求按命令放入不同优先级的队列，处理线程总是先处理高优先级的队列：
+    - 0 级（心跳、会话恢复）开销很小，排在最前面，避免过载时心跳超时被误判断线
+    - 1 级为普通命令
+    - 2 级为开销大的命令（注册、历史查询等），排队延迟超过 shed_latency 或队列已满时
+      不再处理，由 on_shed 回复客户端稍后重试
+    """
+
+    LEVELS = 3
+    SHEDDABLE = 2
+
+    def __init__(self, handler: Callable[[Dict[str, Any], Any], None],
+                 on_shed: Callable[[Dict[str, Any], Any, float], None],
+                 config: Dict[str, Any] = None):
+        self.config = {**INGRESS_CONFIG, **(config or {})}
+        self.handler = handler    # handler(message, addr)
+        self.on_shed = on_shed    # on_shed(message, addr, retry_after)
+        self._queues = [deque() for _ in range(self.LEVELS)]  # (入队时间, 消息, 地址)
+        self._cond = threading.Condition()
+        self._thread = None
+        self.processed = [0] * self.LEVELS
+        self.shed = 0
+        self.max_wait = 0.0
+
+    def priority(self, command: Optional[str]) -> int:
+        return self.config["priorities"].get(command, 1)
+
+    def start(self):
+        """启动处理线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def latency(self, now: float = None) -> float:
+        """当前排队延迟：普通和低优先级队列中最早的请求已等待的时间"""
+        now = time.monotonic() if now is None else now
+        heads = [queue[0][0] for queue in self._queues[1:] if queue]
+        return now - min(heads) if heads else 0.0
+
+    def retry_after(self, latency: float) -> float:
+        return round(max(self.config["retry_after"], latency * 2), 2)
+
+    def submit(self, message: Dict[str, Any], addr, now: float = None) -> bool:
+        """加入一个请求；过载时直接拒绝开销大的请求，返回是否已入队"""
+        now = time.monotonic() if now is None else now
+        level = self.priority(message.get("command"))
+        with self._cond:
+            queue = self._queues[level]
+            latency = self.latency(now)
+            overloaded = len(queue) >= self.config["max_queue"]
+            if level == self.SHEDDABLE and latency > self.config["shed_latency"]:
+                overloaded = True
+            if not overloaded:
+                queue.append((now, message, addr))
+                self._cond.notify()
+                return True
+            self.shed += 1
+        self.on_shed(message, addr, self.retry_after(latency))
+        return False
+
+    def next(self, timeout: float = None):
+        """按优先级取出下一个请求 (等待时间, 消息, 地址, 优先级)，超时返回 None"""
+        with self._cond:
+            while True:
+                for level, queue in enumerate(self._queues):
+                    if queue:
+                        enqueued_at, message, addr = queue.popleft()
+                        return time.monotonic() - enqueued_at, message, addr, level
+                if not self._cond.wait(timeout):
+                    return None
+
+    def process(self, timeout: float = None) -> bool:
+        """处理一个请求，排队过久的低优先级请求改为回复稍后重试；没有请求时返回 False"""
+        item = self.next(timeout)
+        if item is None:
+            return False
+        wait, message, addr, level = item
+        if wait > self.max_wait:
+            self.max_wait = wait
+        if level == self.SHEDDABLE and wait > self.config["shed_latency"]:
+            self.shed += 1
+            self.on_shed(message, addr, self.retry_after(wait))
+            return True
+        self.processed[level] += 1
+        self.handler(message, addr)
+        return True
+
+    def _run(self):
+        while True:
+            self.process()
+
+    def report(self) -> Dict[str, Any]:
+        """返回并重置统计：各优先级处理数、拒绝数和最大排队延迟（毫秒）"""
+        with self._cond:
+            snapshot = {
+                "processed": list(self.processed),
+                "shed": self.shed,
+                "queued": sum(len(queue) for queue in self._queues),
+                "max_wait_ms": self.max_wait * 1000
+            }
+            self.processed = [0] * self.LEVELS
+            self.shed = 0
+            self.max_wait = 0.0
+        return snapshot
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from server.config import SEND_QUEUE_CONFIG
+
+
+class ClientQueue:
+    """单个客户端的发送队列，带令牌桶限速"""
+    __slots__ = ("items", "tokens", "last_refill", "drops", "coalesced", "sent")
+
+    def __init__(self, burst: float):
+        self.items = deque()  # (payload, key)
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.drops = 0
+        self.coalesced = 0
+        self.sent = 0
+
+    def refill(self, now: float, rate: float, burst: float):
+        self.tokens = min(burst, self.tokens + (now - self.last_refill) * rate)
+        self.last_refill = now
+
+
+class SendQueueManager:
+    """
+    按客户端划分的发送队列
+    - 每个客户端按 max_pps 限速发送，发送线程每个 tick 把队首相同的负载合并后交给广播引擎批量发送
+    - 队列超过 max_depth 时按策略处理慢客户端：
+      drop_oldest 丢弃最旧的；coalesce 用新负载替换队列中相同 key 的旧负载，没有则丢弃最旧的；
+      disconnect 清空队列并通过 on_disconnect 回调断开客户端
+    """
+
+    POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+    def __init__(self, fanout, config: Dict[str, Any] = None,
+                 on_disconnect: Optional[Callable[[Tuple[str, int]], None]] = None):
+        self.config = {**SEND_QUEUE_CONFIG, **(config or {})}
+        if self.config["policy"] not in self.POLICIES:
+            raise ValueError(f"未知的慢客户端策略: {self.config['policy']}")
+        self.fanout = fanout
+        self.on_disconnect = on_disconnect
+        self._queues: Dict[Tuple[str, int], ClientQueue] = {}
+        self._active = set()  # 有待发送数据的地址
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.disconnects = 0
+        self._thread = None
+
+    def start(self):
+        """启动发送线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def enqueue(self, payload: bytes, addrs: Sequence[Tuple[str, int]], key: str = None):
+        """把同一份负载放入多个客户端的队列；key 相同的负载可被合并"""
+        max_depth = self.config["max_depth"]
+        policy = self.config["policy"]
+        burst = self.config["burst"]
+        slow = []
+        with self._lock:
+            for addr in addrs:
+                queue = self._queues.get(addr)
+                if queue is None:
+                    queue = self._queues[addr] = ClientQueue(burst)
+                items = queue.items
+                if len(items) >= max_depth:
+                    if policy == "disconnect":
+                        queue.drops += len(items)
+                        items.clear()
+                        slow.append(addr)
+                        continue
+                    if policy == "coalesce" and key is not None and self._coalesce(queue, payload, key):
+                        continue
+                    items.popleft()
+                    queue.drops += 1
+                items.append((payload, key))
+                self._active.add(addr)
+        self._wakeup.set()
+        for addr in slow:
+            self.disconnects += 1
+            if self.on_disconnect:
+                self.on_disconnect(addr)
+
+    @staticmethod
+    def _coalesce(queue: ClientQueue, payload: bytes, key: str) -> bool:
+        items = queue.items
+        for index in range(len(items) - 1, -1, -1):
+            if items[index][1] == key:
+                del items[index]
+                items.append((payload, key))
+                queue.coalesced += 1
+                return True
+        return False
+
+    def remove(self, addr: Tuple[str, int]):
+        """客户端断开时丢弃其队列"""
+        with self._lock:
+            self._queues.pop(addr, None)
+            self._active.discard(addr)
+
+    def _run(self):
+        tick = self.config["tick"]
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self._drain()
+            # 每个 tick 最多发送一轮，令牌桶据此限速
+            time.sleep(tick)
+
+    def _drain(self):
+        """按令牌取出各队列的数据，相同负载合并为一次批量发送"""
+        rate, burst = self.config["max_pps"], self.config["burst"]
+        now = time.monotonic()
+        groups: Dict[int, Tuple[bytes, list]] = {}
+        with self._lock:
+            for addr in list(self._active):
+                queue = self._queues.get(addr)
+                if queue is None:
+                    self._active.discard(addr)
+                    continue
+                queue.refill(now, rate, burst)
+                items = queue.items
+                while items and queue.tokens >= 1:
+                    payload, _ = items.popleft()
+                    queue.tokens -= 1
+                    queue.sent += 1
+                    group = groups.get(id(payload))
+                    if group is None:
+                        group = groups[id(payload)] = (payload, [])
+                    group[1].append(addr)
+                if not items:
+                    self._active.discard(addr)
+        for payload, addrs in groups.values():
+            self.fanout.send(payload, addrs)
+        if self._active:
+            self._wakeup.set()
+
+    def metrics(self) -> Dict[Tuple[str, int], Dict[str, int]]:
+        """每个客户端的队列深度与丢弃数"""
+        with self._lock:
+            return {
+                addr: {
+                    "depth": len(queue.items),
+                    "drops": queue.drops,
+                    "coalesced": queue.coalesced,
+                    "sent": queue.sent
+                }
+                for addr, queue in self._queues.items()
+            }
+
+    def summary(self) -> Dict[str, int]:
+        """汇总指标"""
+        with self._lock:
+            queues = list(self._queues.values())
+            return {
+                "clients": len(queues),
+                "queued": sum(len(q.items) for q in queues),
+                "max_depth": max((len(q.items) for q in queues), default=0),
+                "drops": sum(q.drops for q in queues),
+                "coalesced": sum(q.coalesced for q in queues),
+                "disconnects": self.disconnects
+            }
@@ -0,0 +1,115 @@
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.config import RESUME_CONFIG
+from .security import SecurityManager
+
+
+class ResumableSession:
+    """一个已认证的会话，凭令牌可在地址变化或短暂断开后恢复"""
+    __slots__ = ("username", "token", "channel", "joined_id", "private", "detached_at")
+
+    def __init__(self, username: str, token: str, channel: str, joined_id: int, private_buffer: int):
+        self.username = username
+        self.token = token
+        self.channel = channel
+        self.joined_id = joined_id   # 加入当前频道时的消息 id，补发不早于此
+        self.private = deque(maxlen=private_buffer)  # (消息 id, 负载)
+        self.detached_at: Optional[float] = None
+
+
+class SessionStore:
+    """
+    会话恢复
+    - 频道消息保存在每个频道共享的环形缓冲区中，广播时只记录一次
+    - 私聊消息保存在各会话自己的缓冲区中
+    - 恢复时按消息 id 补发客户端最后收到的消息之后的内容
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**RESUME_CONFIG, **(config or {})}
+        self._sessions: Dict[str, ResumableSession] = {}
+        self._channels: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.config["channel_buffer"]))
+        self._lock = threading.Lock()
+
+    def create(self, username: str, channel: str, joined_id: int) -> str:
+        """认证成功后建立新会话，返回令牌；同一用户的旧会话失效"""
+        token = SecurityManager.generate_token()
+        with self._lock:
+            self._sessions[username] = ResumableSession(
+                username, token, channel, joined_id, self.config["private_buffer"]
+            )
+        return token
+
+    def resume(self, username: str, token: str, now: float = None) -> Optional[ResumableSession]:
+        """校验令牌，成功返回会话并标记为已连接"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            session = self._sessions.get(username)
+            if session is None or not secrets.compare_digest(session.token, str(token)):
+                return None
+            if session.detached_at is not None and now - session.detached_at > self.config["ttl"]:
+                del self._sessions[username]
+                return None
+            session.detached_at = None
+            return session
+
+    def detach(self, username: str, now: float = None):
+        """客户端断开时保留会话一段时间以便恢复"""
+        with self._lock:
+            session = self._sessions.get(username)
+            if session:
+                session.detached_at = time.monotonic() if now is None else now
+
+    def set_channel(self, username: str, channel: str, joined_id: int):
+        with self._lock:
+            session = self._sessions.get(username)
+            if session:
+                session.channel = channel
+                session.joined_id = joined_id
+
+    def leave_channel(self, username: str, channel: str, fallback: str, joined_id: int) -> bool:
+        """会话所在频道为 channel 时改为 fallback（例如用户被移出私有频道），返回是否修改"""
+        with self._lock:
+            session = self._sessions.get(username)
+            if session is None or session.channel != channel:
+                return False
+            session.channel = fallback
+            session.joined_id = joined_id
+            return True
+
+    def record_channel(self, channel: str, message_id: int, payload: bytes):
+        self._channels[channel].append((message_id, payload))
+
+    def record_private(self, usernames, message_id: int, payload: bytes):
+        with self._lock:
+            for username in usernames:
+                session = self._sessions.get(username)
+                if session:
+                    session.private.append((message_id, payload))
+
+    def replay(self, session: ResumableSession, last_id: int) -> List[bytes]:
+        """返回 id 大于 last_id 的频道消息和私聊消息，按 id 排序"""
+        after = max(last_id or 0, session.joined_id)
+        with self._lock:
+            entries: List[Tuple[int, bytes]] = [
+                entry for entry in tuple(self._channels.get(session.channel, ())) if entry[0] > after
+            ]
+            entries.extend(entry for entry in session.private if entry[0] > (last_id or 0))
+        entries.sort(key=lambda entry: entry[0])
+        return [payload for _, payload in entries]
+
+    def prune(self, now: float = None):
+        """移除断开超过 ttl 的会话"""
+        now = time.monotonic() if now is None else now
+        ttl = self.config["ttl"]
+        with self._lock:
+            for username, session in list(self._sessions.items()):
+                if session.detached_at is not None and now - session.detached_at > ttl:
+                    del self._sessions[username]
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from server.config import SNOWFLAKE_CONFIG
+
+
+class SnowflakeGenerator:
+    """
+    64 位按时间递增的 ID 生成器（snowflake）
+    | 1 位符号 | 41 位毫秒时间戳（相对 epoch） | 10 位节点 ID | 12 位序号 |
+    同一节点每毫秒最多生成 4096 个 ID，不同节点的 ID 不会冲突，无需访问数据库
+    """
+
+    NODE_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_NODE_ID = (1 << NODE_BITS) - 1
+    MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+    def __init__(self, node_id: int = None, epoch_ms: int = None):
+        self.node_id = SNOWFLAKE_CONFIG["node_id"] if node_id is None else node_id
+        if not 0 <= self.node_id <= self.MAX_NODE_ID:
+            raise ValueError(f"节点 ID 超出范围: {self.node_id}")
+        self.epoch_ms = SNOWFLAKE_CONFIG["epoch_ms"] if epoch_ms is None else epoch_ms
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _now_ms(self) -> int:
+        return time.time_ns() // 1_000_000 - self.epoch_ms
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = self._now_ms()
+            # 时钟回拨时沿用上次的时间戳，保证 ID 仍然递增
+            if now <= self._last_ms:
+                now = self._last_ms
+                self._sequence = (self._sequence + 1) & self.MAX_SEQUENCE
+                if self._sequence == 0:
+                    # 本毫秒序号用完，借用下一毫秒
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (self.NODE_BITS + self.SEQUENCE_BITS)) \
+                | (self.node_id << self.SEQUENCE_BITS) | self._sequence
+
+    def timestamp_of(self, snowflake_id: int) -> float:
+        """返回 ID 中的 Unix 时间戳（秒）"""
+        return ((snowflake_id >> (self.NODE_BITS + self.SEQUENCE_BITS)) + self.epoch_ms) / 1000
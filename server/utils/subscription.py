@@ -0,0 +1,131 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Set
+
+from server.config import SUBSCRIPTION_CONFIG
+
+
+class SubscriptionStore:
+    """
+    多频道订阅与未读计数
+    - 每个在线用户的 {频道: 未读数} 保存在内存中，订阅的频道集合就是其中的键
+    - 广播时只在内存中累加，变化过的用户由 flush 批量写入 Redis 哈希 unread:<用户名>
+    - 登录时从 Redis 载入，断开时写回并从内存移除
+    """
+
+    def __init__(self, redis_client=None, config: Dict[str, Any] = None):
+        self.config = {**SUBSCRIPTION_CONFIG, **(config or {})}
+        self.redis = redis_client
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(username: str) -> str:
+        return f"unread:{username}"
+
+    def load(self, username: str) -> Dict[str, int]:
+        """载入用户的订阅和未读数，已在内存中时直接返回"""
+        with self._lock:
+            counts = self._counts.get(username)
+            if counts is not None:
+                return dict(counts)
+        counts = {}
+        if self.redis:
+            try:
+                counts = {channel: int(count) for channel, count in self.redis.hgetall(self._key(username)).items()}
+            except Exception as e:
+                logging.error(f"读取未读计数错误: {str(e)}")
+        with self._lock:
+            counts = self._counts.setdefault(username, counts)
+            return dict(counts)
+
+    def subscribe(self, username: str, channels: Iterable[str]) -> List[str]:
+        """订阅频道，超过 max_channels 的部分被忽略，返回新订阅的频道"""
+        added = []
+        with self._lock:
+            counts = self._counts.setdefault(username, {})
+            for channel in channels:
+                if channel in counts:
+                    continue
+                if len(counts) >= self.config["max_channels"]:
+                    break
+                counts[channel] = 0
+                added.append(channel)
+            if added:
+                self._dirty.add(username)
+        return added
+
+    def unsubscribe(self, username: str, channels: Iterable[str]) -> List[str]:
+        """取消订阅，返回实际移除的频道"""
+        removed = []
+        with self._lock:
+            counts = self._counts.get(username)
+            if counts is None:
+                return removed
+            for channel in channels:
+                if counts.pop(channel, None) is not None:
+                    removed.append(channel)
+            if removed:
+                self._dirty.add(username)
+        return removed
+
+    def is_subscribed(self, username: str, channel: str) -> bool:
+        with self._lock:
+            return channel in self._counts.get(username, ())
+
+    def channels(self, username: str) -> Set[str]:
+        with self._lock:
+            return set(self._counts.get(username, ()))
+
+    def unread(self, username: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts.get(username, {}))
+
+    def increment(self, usernames: Iterable[str], channel: str):
+        """频道收到新消息，给订阅了该频道但没有在查看的用户加一"""
+        with self._lock:
+            for username in usernames:
+                counts = self._counts.get(username)
+                if counts is not None and channel in counts:
+                    counts[channel] += 1
+                    self._dirty.add(username)
+
+    def clear(self, username: str, channel: str):
+        """用户开始查看频道，未读数清零"""
+        with self._lock:
+            counts = self._counts.get(username)
+            if counts and counts.get(channel):
+                counts[channel] = 0
+                self._dirty.add(username)
+
+    def unload(self, username: str):
+        """用户断开：写回 Redis 后从内存移除"""
+        self.flush((username,))
+        with self._lock:
+            self._counts.pop(username, None)
+
+    def flush(self, usernames: Iterable[str] = None):
+        """把变化过的计数写入 Redis，一个 pipeline 完成"""
+        with self._lock:
+            dirty = self._dirty if usernames is None else self._dirty.intersection(usernames)
+            snapshot = {username: dict(self._counts.get(username, {})) for username in dirty}
+            self._dirty.difference_update(snapshot)
+        if not snapshot or not self.redis:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for username, counts in snapshot.items():
+                key = self._key(username)
+                pipe.delete(key)
+                if counts:
+                    pipe.hset(key, mapping=counts)
+                    pipe.expire(key, self.config["ttl"])
+            pipe.execute()
+        except Exception as e:
+            logging.error(f"写入未读计数错误: {str(e)}")
+            with self._lock:
+                self._dirty.update(username for username in snapshot if username in self._counts)
+
+    def __len__(self):
+        return len(self._counts)
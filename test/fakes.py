@@ -0,0 +1,166 @@
+"""
+测试共用的假 Redis 和数据库连接
+只实现被测代码用到的接口，各测试文件直接导入，不要再复制一份
+"""
+
+class FakeRedis:
+    """
+    内存中的 Redis：字符串、列表和哈希，并记录过期时间
+    与 decode_responses=True 时一样原样返回写入的值
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lists = {}
+        self.hashes = {}
+        self.expires = {}
+        self.published = []
+        self.executed = 0  # 已执行的 pipeline 数
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        if ex is not None:
+            self.expires[key] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            for store in (self.data, self.lists, self.hashes):
+                store.pop(key, None)
+
+    def expire(self, key, ttl):
+        self.expires[key] = ttl
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    @staticmethod
+    def _range(items, start, end):
+        """Redis 列表的闭区间下标，负数从末尾算起"""
+        start = max(len(items) + start, 0) if start < 0 else start
+        end = len(items) + end if end < 0 else end
+        return items[start:end + 1]
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+
+    def lrange(self, key, start, end):
+        return self._range(self.lists.get(key, []), start, end)
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self._range(self.lists.get(key, []), start, end)
+
+    def hgetall(self, key):
+        return {field: str(value) for field, value in self.hashes.get(key, {}).items()}
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+class FakePipeline:
+    """记录调用，execute 时按顺序在 FakeRedis 上执行"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        self.redis.executed += 1
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+class FakeConnection:
+    """
+    记录执行的语句和事务操作的 mysql.connector 连接
+    fail_on 为语句片段，执行包含它的语句时抛出 error；down 为 True 时 ping 失败
+    """
+
+    def __init__(self, rows=None, error=None):
+        self.executed = []  # (空白压缩后的语句, 参数)
+        self.ops = []
+        self.rows = rows if rows is not None else []
+        self.fail_on = None
+        self.error = error or RuntimeError("执行失败")
+        self.down = False
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def run(self, query, params):
+        self.executed.append((" ".join(query.split()), params))
+        if self.fail_on is not None and self.fail_on in query:
+            raise self.error
+
+    def start_transaction(self):
+        self.ops.append("begin")
+
+    def commit(self):
+        self.ops.append("commit")
+
+    def rollback(self):
+        self.ops.append("rollback")
+
+    def ping(self, reconnect=False):
+        if self.down:
+            raise self.error
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        self.conn.run(query, params)
+        self.rowcount = 1
+
+    def fetchall(self):
+        return self.conn.rows
+
+    def close(self):
+        pass
+
+class FakeAsyncConnection(FakeConnection):
+    """aiomysql 连接：事务操作和游标都是协程"""
+
+    def cursor(self, cursor_class=None):
+        return FakeAsyncCursor(self)
+
+    async def begin(self):
+        self.ops.append("begin")
+
+    async def commit(self):
+        self.ops.append("commit")
+
+    async def rollback(self):
+        self.ops.append("rollback")
+
+class FakeAsyncCursor(FakeCursor):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=()):
+        FakeCursor.execute(self, query, params)
+
+    async def fetchall(self):
+        return self.conn.rows
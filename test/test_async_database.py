@@ -0,0 +1,216 @@
+import unittest
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from fakes import FakeAsyncConnection
+from server.utils import async_database
+from server.utils.async_database import AsyncDatabaseManager, PoolStats
+from server.models.message import Message, AsyncMessageManager
+from server.models.user import UserManager, AsyncUserManager
+from server.models.channel import ChannelManager, AsyncChannelManager
+
+class FakePool:
+    """单连接的连接池，acquire 可以人为延迟"""
+
+    def __init__(self, delay=0.0):
+        self.conn = FakeAsyncConnection()
+        self.delay = delay
+        self.released = 0
+        self.closed = False
+
+    async def acquire(self):
+        await asyncio.sleep(self.delay)
+        return self.conn
+
+    def release(self, conn):
+        self.released += 1
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+def make_manager(delay=0.0, acquire_timeout=10):
+    manager = AsyncDatabaseManager({}, pool_config={"maxsize": 4, "acquire_timeout": acquire_timeout})
+    manager.pool = FakePool(delay)
+    return manager
+
+def run(coro):
+    return asyncio.run(coro)
+
+class TestPoolStats(unittest.TestCase):
+    def test_snapshot(self):
+        """测试等待时间的平均值和最大值"""
+        stats = PoolStats(4)
+        self.assertEqual(stats.snapshot()["avg_wait_ms"], 0.0)
+        stats.record_wait(0.002)
+        stats.record_wait(0.004)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["size"], 4)
+        self.assertEqual(snapshot["acquired"], 2)
+        self.assertAlmostEqual(snapshot["avg_wait_ms"], 3.0)
+        self.assertAlmostEqual(snapshot["max_wait_ms"], 4.0)
+
+class TestAsyncDatabaseManager(unittest.TestCase):
+    def test_connection_accounting(self):
+        """测试占用数在连接使用期间增加、归还后恢复"""
+        manager = make_manager()
+
+        async def scenario():
+            async with manager.get_connection():
+                self.assertEqual(manager.stats.in_use, 1)
+            return manager.pool_stats()
+
+        snapshot = run(scenario())
+        self.assertEqual(snapshot["in_use"], 0)
+        self.assertEqual(snapshot["waiting"], 0)
+        self.assertEqual(snapshot["acquired"], 1)
+        self.assertEqual(manager.pool.released, 1)
+
+    def test_acquire_timeout(self):
+        """测试获取连接超时抛出 TimeoutError，等待数恢复为 0"""
+        manager = make_manager(delay=0.5, acquire_timeout=0.01)
+
+        async def scenario():
+            async with manager.get_connection():
+                pass
+
+        with self.assertRaises(asyncio.TimeoutError):
+            run(scenario())
+        self.assertEqual(manager.stats.waiting, 0)
+        self.assertEqual(manager.stats.acquired, 0)
+
+    @unittest.skipIf(async_database.aiomysql is None, "未安装 aiomysql")
+    def test_query_and_update(self):
+        """测试查询返回结果行，更新提交并返回影响行数"""
+        manager = make_manager()
+        manager.pool.conn.rows = [{"id": 1}]
+        self.assertEqual(run(manager.execute_query("SELECT 1")), [{"id": 1}])
+        self.assertEqual(run(manager.execute_update("UPDATE t SET a = 1")), 1)
+        self.assertEqual(manager.pool.conn.ops, ["commit"])
+
+    def test_close(self):
+        manager = make_manager()
+        run(manager.close())
+        self.assertTrue(manager.pool.closed)
+
+class TestAsyncMessageManager(unittest.TestCase):
+    def setUp(self):
+        self.db = make_manager()
+        self.conn = self.db.pool.conn
+        self.manager = AsyncMessageManager(self.db)
+
+    def test_private_message_updates_conversation(self):
+        """测试私聊消息与会话索引在同一事务中写入"""
+        message = Message(id=1001, channel_id=1, sender_id=7, content="hi",
+                          created_at=datetime(2024, 1, 1), is_private=True, recipient_id=3)
+        self.assertIs(run(self.manager.create_message(message)), message)
+        self.assertEqual(self.conn.ops, ["begin", "commit"])
+        self.assertIn("INSERT INTO messages", self.conn.executed[0][0])
+        query, params = self.conn.executed[1]
+        self.assertIn("INSERT INTO conversations", query)
+        self.assertEqual(params, (3, 7, 1001, datetime(2024, 1, 1), 1, 0))
+
+    def test_channel_message_skips_conversation(self):
+        message = Message(id=1002, channel_id=1, sender_id=7, content="hi",
+                          created_at=datetime(2024, 1, 1))
+        run(self.manager.create_message(message))
+        self.assertEqual(len(self.conn.executed), 1)
+        self.assertEqual(self.conn.ops, ["commit"])
+
+    def test_missing_id_uses_snowflake(self):
+        """测试未分配 id 的消息写入前取得 snowflake ID"""
+        message = Message(id=None, channel_id=1, sender_id=7, content="hi",
+                          created_at=datetime(2024, 1, 1))
+        saved = run(self.manager.create_message(message))
+        self.assertIsNotNone(saved.id)
+        self.assertEqual(self.conn.executed[0][1][0], saved.id)
+
+    def test_failed_index_update_rolls_back(self):
+        """测试会话索引写入失败时整个事务回滚"""
+        self.conn.fail_on = "conversations"
+        message = Message(id=1003, channel_id=1, sender_id=7, content="hi",
+                          created_at=datetime(2024, 1, 1), is_private=True, recipient_id=3)
+        self.assertIsNone(run(self.manager.create_message(message)))
+        self.assertEqual(self.conn.ops, ["begin", "rollback"])
+
+    @unittest.skipIf(async_database.aiomysql is None, "未安装 aiomysql")
+    def test_private_messages_query_matches_sync(self):
+        """测试私聊查询与同步版本一致：两个方向 UNION ALL，按 id 分页"""
+        self.conn.rows = [{"id": 5, "channel_id": 1, "sender_id": 3, "content": "b",
+                           "created_at": datetime(2024, 1, 1), "recipient_id": 7}]
+        messages = run(self.manager.get_private_messages(7, 3, limit=20, before_id=10))
+        self.assertEqual([m.id for m in messages], [5])
+        self.assertTrue(messages[0].is_private)
+        query, params = self.conn.executed[0]
+        self.assertIn("UNION ALL", query)
+        self.assertIn("ORDER BY id DESC", query)
+        self.assertEqual(params, (7, 3, 10, 20, 3, 7, 10, 20, 20))
+
+class FakeUserDB:
+    """只实现 AsyncUserManager 用到的协程接口"""
+
+    def __init__(self):
+        self.rows = {}
+
+    async def execute_update(self, query, params=None):
+        self.rows[params[0]] = {"id": len(self.rows) + 1}
+        return 1
+
+    async def execute_query(self, query, params=None):
+        row = self.rows.get(params[0])
+        return [row] if row else []
+
+class TestAsyncUserManager(unittest.TestCase):
+    def test_create_user(self):
+        manager = AsyncUserManager(FakeUserDB())
+        user = run(manager.create_user("alice", "Secret123!"))
+        self.assertEqual((user.id, user.username), (1, "alice"))
+
+class RecordingDB:
+    """返回固定结果行并记录语句，同时提供同步和异步接口"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute_query(self, query, params=None, read_only=False, session=None):
+        self.executed.append((query, params))
+        return self.rows
+
+    async def execute_query_async(self, query, params=None):
+        return self.execute_query(query, params)
+
+class AsyncView:
+    def __init__(self, db):
+        self.execute_query = db.execute_query_async
+
+class TestSyncAsyncParity(unittest.TestCase):
+    """同步和异步管理器使用相同的语句，并把结果行转换为相同的对象"""
+
+    def test_channel_manager(self):
+        rows = [{"id": 10, "name": "secret", "description": "", "created_at": datetime(2024, 1, 1),
+                 "is_private": 1, "owner_id": 1, "storage_policy": "ephemeral"}]
+        sync_db, async_db = RecordingDB(rows), RecordingDB(rows)
+        sync_manager, async_manager = ChannelManager(sync_db), AsyncChannelManager(AsyncView(async_db))
+        for method, arg in (("get_channel_by_id", 10), ("get_channel_by_name", "secret")):
+            expected = getattr(sync_manager, method)(arg)
+            self.assertEqual(run(getattr(async_manager, method)(arg)), expected)
+            self.assertIs(expected.is_private, True)
+        self.assertEqual(run(async_manager.get_public_channels()), sync_manager.get_public_channels())
+        self.assertEqual(async_db.executed, sync_db.executed)
+
+    def test_user_manager(self):
+        rows = [{"id": 2, "username": "alice", "password_hash": "h", "salt": "s",
+                 "created_at": datetime(2024, 1, 1), "last_login": None}]
+        sync_db, async_db = RecordingDB(rows), RecordingDB(rows)
+        expected = UserManager(sync_db).get_user_by_username("alice")
+        self.assertEqual(run(AsyncUserManager(AsyncView(async_db)).get_user_by_username("alice")), expected)
+        self.assertEqual(async_db.executed, sync_db.executed)
+
+if __name__ == '__main__':
+    unittest.main()
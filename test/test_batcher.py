@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import socket
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import dumps, loads
+from server.utils.batcher import ChannelBatcher, pack
+from client.network import NetworkManager
+
+class TestChannelBatcher(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+        self.batcher = ChannelBatcher(
+            lambda channel, payload: self.emitted.append((channel, payload)),
+            {"default_window": 0, "channels": {"general": 0.01}, "max_size": 150}
+        )
+
+    def test_window(self):
+        """测试窗口内的消息合并为一个数据包，到期后才发送"""
+        self.batcher.add("general", b'{"n":1}', now=0.0)
+        self.batcher.add("general", b'{"n":2}', now=0.005)
+        self.batcher.flush(now=0.009)
+        self.assertEqual(self.emitted, [])
+        self.batcher.flush(now=0.01)
+        channel, payload = self.emitted[0]
+        self.assertEqual(loads(payload), {"type": "batch", "messages": [{"n": 1}, {"n": 2}]})
+        self.assertAlmostEqual(self.batcher.report()["avg_delay_ms"], 7.5)
+
+    def test_size_cap(self):
+        """测试合并后超过 max_size 时先发出已有的批次"""
+        message = dumps({"content": "x" * 40})
+        for _ in range(3):
+            self.batcher.add("general", message, now=0.0)
+        self.assertEqual(len(self.emitted), 1)
+        self.assertEqual(len(loads(self.emitted[0][1])["messages"]), 2)
+        self.batcher.flush(force=True)
+        # 只剩一条时原样发送
+        self.assertEqual(self.emitted[1][1], message)
+
+    def test_client_unpacks_batch(self):
+        """测试客户端把 batch 数据包拆开逐条返回"""
+        manager = NetworkManager()
+        manager.socket.bind(("127.0.0.1", 0))
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender.sendto(pack([
+            dumps({"type": "message", "id": 1, "content": "a"}),
+            dumps({"type": "message", "id": 2, "content": "b"})
+        ]), manager.socket.getsockname())
+        self.assertEqual(manager.receive()["content"], "a")
+        self.assertEqual(manager.receive()["content"], "b")
+        self.assertEqual(manager.last_message_id, 2)
+        sender.close()
+        manager.socket.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from server.utils.cache import LocalCache, TwoTierCache
+from server.models.channel import Channel, ChannelManager
+from fakes import FakeRedis
+
+class FakeChannelDB:
+    """只实现 ChannelManager 用到的查询，记录查询次数"""
+
+    def __init__(self):
+        self.rows = [{"id": 1, "name": "general", "description": "", "created_at": datetime(2024, 1, 1),
+                      "is_private": False, "owner_id": None}]
+        self.queries = 0
+
+    def execute_query(self, query, params=None, read_only=False, session=None):
+        self.queries += 1
+        if "COUNT(*)" in query:
+            return [{"count": len(self.rows)}]
+        if "WHERE name" in query:
+            return [row for row in self.rows if row["name"] == params[0]]
+        return list(self.rows)
+
+    def execute_update(self, query, params=None, session=None):
+        self.rows.append({"id": len(self.rows) + 1, "name": params[0], "description": params[1],
+                          "created_at": params[4], "is_private": params[2], "owner_id": params[3]})
+        return 1
+
+class TestCache(unittest.TestCase):
+    def test_local_cache_lru_and_ttl(self):
+        """测试本地缓存的容量淘汰与过期"""
+        cache = LocalCache(max_size=2)
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        cache.get("a")
+        cache.set("c", 3, ttl=60)
+
+        # b 最久未使用，被淘汰
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+
+        cache.set("d", 4, ttl=0.01)
+        time.sleep(0.02)
+        self.assertEqual(cache.get("d"), (False, None))
+
+    def test_single_flight(self):
+        """测试冷键并发加载只触发一次查询"""
+        cache = TwoTierCache(config={"policies": {"user_by_username": 60}})
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"id": 1}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                cache.get_or_load("user_by_username", "alice", loader)
+            ))
+            for _ in range(10)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"id": 1}] * 10)
+
+    def test_policy_and_invalidation(self):
+        """测试按查询类型启用与失效通知"""
+        cache = TwoTierCache(config={"policies": {"channel_by_name": 60}})
+        invalidated = []
+        cache.add_listener(invalidated.append)
+
+        # 未启用的查询类型每次都直接加载
+        self.assertEqual(cache.get_or_load("public_channels", "all", lambda: [1]), [1])
+        self.assertEqual(cache.get_or_load("public_channels", "all", lambda: [2]), [2])
+
+        self.assertEqual(cache.get_or_load("channel_by_name", "general", lambda: 1), 1)
+        self.assertEqual(cache.get_or_load("channel_by_name", "general", lambda: 2), 1)
+
+        cache.invalidate("channel_by_name", "general")
+        self.assertEqual(invalidated, ["cache:channel_by_name:general"])
+        self.assertEqual(cache.get_or_load("channel_by_name", "general", lambda: 3), 3)
+
+    def test_follower_timeout_loads_itself(self):
+        """测试等待超时的并发请求自行加载，而不是返回 None"""
+        cache = TwoTierCache(config={"policies": {"user_by_username": 60}, "load_timeout": 0.01})
+        release = threading.Event()
+
+        def slow_loader():
+            release.wait(1)
+            return {"id": 1}
+
+        leader = threading.Thread(target=cache.get_or_load, args=("user_by_username", "alice", slow_loader))
+        leader.start()
+        time.sleep(0.02)
+        self.assertEqual(cache.get_or_load("user_by_username", "alice", lambda: {"id": 1}), {"id": 1})
+        release.set()
+        leader.join()
+
+    def test_invalidation_during_load_undoes_l2_write(self):
+        """测试加载期间失效时，过期的值不会留在 L1 和 Redis 中"""
+        redis = FakeRedis()
+        cache = TwoTierCache(redis, config={"policies": {"user_by_username": 60}})
+
+        def loader():
+            # 加载过程中另一个线程更新了数据并使缓存失效
+            cache.invalidate("user_by_username", "alice")
+            return {"id": 1, "name": "old"}
+
+        self.assertEqual(cache.get_or_load("user_by_username", "alice", loader), {"id": 1, "name": "old"})
+        self.assertEqual(redis.data, {})
+        self.assertEqual(cache.get_or_load("user_by_username", "alice", lambda: {"id": 1, "name": "new"}),
+                         {"id": 1, "name": "new"})
+        self.assertIn("cache:user_by_username:alice", redis.data)
+
+    def test_epochs_are_pruned(self):
+        """测试失效纪元只在加载期间保留"""
+        cache = TwoTierCache(config={"policies": {"user_by_username": 60}})
+        for i in range(100):
+            cache.invalidate("user_by_username", f"user{i}")
+        self.assertEqual(cache._epochs, {})
+        cache.get_or_load("user_by_username", "alice",
+                          lambda: cache.invalidate("user_by_username", "alice") or {"id": 1})
+        self.assertEqual(cache._epochs, {})
+
+    def test_channel_list_etag(self):
+        """测试频道列表负载被复用，频道增删后 ETag 变化"""
+        db = FakeChannelDB()
+        manager = ChannelManager(db, TwoTierCache(config={"policies": {}}))
+        etag, payload = manager.get_channel_list()
+        self.assertEqual(manager.get_channel_list(), (etag, payload))
+        self.assertEqual(db.queries, 1)
+
+        manager.create_channel(Channel(None, "random", "", datetime(2024, 1, 2)))
+        new_etag, new_payload = manager.get_channel_list()
+        self.assertNotEqual(new_etag, etag)
+        self.assertIn(b'"random"', new_payload)
+
+if __name__ == '__main__':
+    unittest.main()
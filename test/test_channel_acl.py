@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from common.codec import dumps
+from server.utils.cache import TwoTierCache
+from server.models.channel import Channel, ChannelManager
+
+class FakeMemberDB:
+    """只实现 channel_members 的查询和增删，记录查询次数"""
+
+    def __init__(self):
+        self.members = {(10, 2)}
+        self.queries = 0
+
+    def execute_query(self, query, params=None, read_only=False, session=None):
+        self.queries += 1
+        return [{"user_id": user_id} for channel_id, user_id in self.members if channel_id == params[0]]
+
+    def execute_update(self, query, params=None, session=None):
+        if query.strip().startswith("DELETE"):
+            before = len(self.members)
+            self.members.discard((params[0], params[1]))
+            return before - len(self.members)
+        self.members.add((params[0], params[1]))
+        return 1
+
+def make_channel(is_private=True):
+    return Channel(id=10, name="secret", description="", created_at=datetime(2024, 1, 1),
+                   is_private=is_private, owner_id=1)
+
+class TestChannelAcl(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeMemberDB()
+        self.cache = TwoTierCache(None)
+        self.manager = ChannelManager(self.db, self.cache)
+
+    def test_public_and_owner_skip_lookup(self):
+        """测试公开频道和所有者不需要查询成员"""
+        self.assertTrue(self.manager.can_access(make_channel(is_private=False), 99))
+        self.assertTrue(self.manager.can_access(make_channel(), 1))
+        self.assertEqual(self.db.queries, 0)
+
+    def test_members_loaded_once(self):
+        """测试成员集合按需加载一次，之后的检查不查询数据库"""
+        channel = make_channel()
+        for _ in range(100):
+            self.assertTrue(self.manager.can_access(channel, 2))
+            self.assertFalse(self.manager.can_access(channel, 3))
+        self.assertEqual(self.db.queries, 1)
+
+    def test_invite_and_kick_invalidate(self):
+        """测试邀请和移出后成员集合重新加载"""
+        channel = make_channel()
+        self.assertFalse(self.manager.can_access(channel, 3))
+        self.assertTrue(self.manager.add_member(10, 3))
+        self.assertTrue(self.manager.can_access(channel, 3))
+        self.assertTrue(self.manager.remove_member(10, 2))
+        self.assertFalse(self.manager.can_access(channel, 2))
+        self.assertEqual(self.db.queries, 3)
+
+    def test_remote_invalidation(self):
+        """测试其他进程的成员变化通过失效通知清除本地集合"""
+        channel = make_channel()
+        self.assertFalse(self.manager.can_access(channel, 3))
+        self.db.members.add((10, 3))
+        self.assertFalse(self.manager.can_access(channel, 3))
+        self.cache._on_invalidation({"data": dumps({
+            "node": "other", "keys": [self.cache.key("channel_members", 10)]
+        })})
+        self.assertTrue(self.manager.can_access(channel, 3))
+
+if __name__ == '__main__':
+    unittest.main()
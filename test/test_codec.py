@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+import json
+import importlib.util
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from common import codec
+
+def load_fallback_codec():
+    """在 orjson 不可导入的情况下重新加载 common.codec，得到标准库后端"""
+    saved = sys.modules.get("orjson")
+    sys.modules["orjson"] = None
+    try:
+        spec = importlib.util.spec_from_file_location("codec_fallback", codec.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        if saved is None:
+            sys.modules.pop("orjson", None)
+        else:
+            sys.modules["orjson"] = saved
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        """测试编码结果为紧凑的 UTF-8 字节串并可还原"""
+        message = {"type": "message", "sender": "张三", "content": "你好", "id": 2 ** 62}
+        encoded = codec.dumps(message)
+        self.assertIsInstance(encoded, bytes)
+        self.assertNotIn(b" ", encoded)
+        self.assertIn("张三".encode(), encoded)
+        self.assertEqual(codec.loads(encoded), message)
+
+    def test_datetime_native(self):
+        """测试 datetime 直接序列化为 ISO 8601"""
+        created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+        decoded = codec.loads(codec.dumps({"created_at": created_at}))
+        self.assertEqual(decoded["created_at"], created_at.isoformat())
+
+    def test_loads_buffer_types(self):
+        """测试可直接从 bytearray/memoryview 解码"""
+        buffer = bytearray(64)
+        data = b'{"command":"heartbeat","username":"alice"}'
+        buffer[:len(data)] = data
+        view = memoryview(buffer)[:len(data)]
+        self.assertEqual(codec.loads(view)["username"], "alice")
+        self.assertEqual(codec.loads(data.decode())["command"], "heartbeat")
+
+        with self.assertRaises(json.JSONDecodeError):
+            codec.loads(b"AUTH_FAILED")
+
+class TestFallbackCodec(unittest.TestCase):
+    def setUp(self):
+        self.fallback = load_fallback_codec()
+
+    def test_backend_selected(self):
+        self.assertEqual(self.fallback.BACKEND, "json")
+        self.assertIs(self.fallback.JSONDecodeError, json.JSONDecodeError)
+
+    def test_same_output_as_primary(self):
+        """测试两种后端的编码结果逐字节一致，且可互相解码"""
+        samples = [
+            {"type": "message", "sender": "张三", "content": "你好 \"引号\"\n", "id": 2 ** 62},
+            {"created_at": datetime(2024, 5, 1, 12, 30, 15, 123456), "ok": True, "none": None},
+            [1, -2, 1.5, "", [], {}]
+        ]
+        for sample in samples:
+            encoded = self.fallback.dumps(sample)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(encoded, codec.dumps(sample))
+            self.assertEqual(self.fallback.loads(encoded), codec.loads(codec.dumps(sample)))
+
+    def test_loads_buffer_types(self):
+        """测试标准库后端同样接受 bytes/bytearray/memoryview/str"""
+        data = b'{"command":"heartbeat","username":"\xe5\xbc\xa0\xe4\xb8\x89"}'
+        expected = {"command": "heartbeat", "username": "张三"}
+        for value in (data, bytearray(data), memoryview(bytearray(data) + b"xx")[:len(data)], data.decode()):
+            self.assertEqual(self.fallback.loads(value), expected)
+
+        with self.assertRaises(json.JSONDecodeError):
+            self.fallback.loads(b"AUTH_FAILED")
+
+    def test_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            self.fallback.dumps({"value": object()})
+
+if __name__ == '__main__':
+    unittest.main()
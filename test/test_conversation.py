@@ -0,0 +1,127 @@
+import unittest
+import sqlite3
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contextlib import contextmanager
+from datetime import datetime
+from server.models.message import Message, MessageManager
+from server.models.conversation import ConversationManager
+from server.utils.snowflake import SnowflakeGenerator
+from fakes import FakeConnection
+
+class FakeDB:
+    def __init__(self):
+        self.conn = FakeConnection()
+        self.writes = []
+
+    @contextmanager
+    def get_connection(self, read_only=False, session=None):
+        yield self.conn
+
+    def mark_write(self, session):
+        self.writes.append(session)
+
+    def tables(self):
+        """按顺序返回写入的表名"""
+        return [query.split()[2] for query, _ in self.conn.executed]
+
+    def conversation_params(self):
+        return [params for query, params in self.conn.executed if "INTO conversations" in query]
+
+def private_message(message_id, sender_id, recipient_id, second=0):
+    return Message(id=message_id, channel_id=1, sender_id=sender_id, content="hi",
+                   created_at=datetime(2024, 1, 1, 12, 0, second), is_private=True,
+                   recipient_id=recipient_id)
+
+class TestRecordMessage(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB()
+        self.manager = MessageManager(self.db)
+
+    def test_index_updated_in_transaction(self):
+        """测试私聊消息与会话索引在同一事务中写入，未读数只加在接收者一侧"""
+        self.manager.create_message(private_message(100, sender_id=7, recipient_id=3))
+        self.manager.create_message(private_message(102, sender_id=3, recipient_id=7, second=2))
+        self.assertEqual(self.db.conn.ops, ["begin", "commit"] * 2)
+        self.assertEqual(self.db.tables(), ["messages", "conversations"] * 2)
+        self.assertEqual(self.db.conversation_params(), [
+            (3, 7, 100, datetime(2024, 1, 1, 12, 0, 0), 1, 0),
+            (3, 7, 102, datetime(2024, 1, 1, 12, 0, 2), 0, 1),
+        ])
+        self.assertEqual(self.db.writes, [7, 3])
+
+    def test_index_upsert_accumulates_unread(self):
+        query, _ = ConversationManager.record_query(private_message(100, 7, 3))
+        self.assertIn("ON DUPLICATE KEY UPDATE", query)
+        self.assertIn("unread_low = unread_low + VALUES(unread_low)", " ".join(query.split()))
+
+    def test_index_failure_rolls_back(self):
+        """测试会话索引写入失败时消息不提交"""
+        self.db.conn.fail_on = "conversations"
+        self.assertIsNone(self.manager.create_message(private_message(100, 7, 3)))
+        self.assertEqual(self.db.tables(), ["messages", "conversations"])
+        self.assertNotIn("commit", self.db.conn.ops)
+        self.assertEqual(self.db.writes, [])
+
+    def test_missing_id_uses_snowflake(self):
+        """测试未分配 id 的消息在写入前取得 snowflake ID，而不是依赖数据库自增"""
+        manager = MessageManager(self.db, SnowflakeGenerator(node_id=3))
+        saved = manager.create_message(private_message(None, 7, 3))
+        self.assertGreater(saved.id, 1 << 22)
+        self.assertEqual((saved.id >> 12) & SnowflakeGenerator.MAX_NODE_ID, 3)
+        self.assertEqual(self.db.conversation_params()[0][2], saved.id)
+
+    def test_channel_message_skips_index(self):
+        message = Message(id=200, channel_id=1, sender_id=7, content="hi",
+                          created_at=datetime(2024, 1, 1))
+        self.manager.create_message(message)
+        self.assertEqual(self.db.tables(), ["messages"])
+        self.assertEqual(self.db.conn.ops, ["commit"])
+
+class SqliteDB:
+    """用 SQLite 执行 list_conversations 的 UNION 查询"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT);
+            CREATE TABLE conversations (
+                user_low_id INTEGER, user_high_id INTEGER, last_message_id INTEGER,
+                last_message_at TEXT, unread_low INTEGER, unread_high INTEGER,
+                PRIMARY KEY (user_low_id, user_high_id)
+            );
+        """)
+
+    def execute_query(self, query, params=None, read_only=False, session=None):
+        rows = self.conn.execute(query.replace("%s", "?"), params or ()).fetchall()
+        return [dict(row) for row in rows]
+
+class TestListConversations(unittest.TestCase):
+    def setUp(self):
+        self.db = SqliteDB()
+        self.db.conn.executemany("INSERT INTO users VALUES (?, ?)",
+                                 [(1, "bob"), (2, "alice"), (3, "carol"), (4, "dave")])
+        # alice (id=2) 在与 bob 的会话中是较大 id，与 carol、dave 的会话中是较小 id
+        self.db.conn.executemany("INSERT INTO conversations VALUES (?, ?, ?, ?, ?, ?)", [
+            (1, 2, 20, "2024-01-01 12:00:02", 9, 1),
+            (2, 3, 30, "2024-01-01 12:00:03", 2, 0),
+            (2, 4, 10, "2024-01-01 12:00:01", 0, 5),
+            (3, 4, 40, "2024-01-01 12:00:04", 1, 1),
+        ])
+        self.manager = ConversationManager(self.db)
+
+    def test_order_and_unread_side(self):
+        """测试两个方向的会话合并后按最后消息时间倒序，未读数取自己一侧"""
+        conversations = self.manager.list_conversations(2)
+        self.assertEqual([(c.peer_name, c.last_message_id, c.unread_count) for c in conversations],
+                         [("carol", 30, 2), ("bob", 20, 1), ("dave", 10, 0)])
+
+    def test_limit_applies_after_merge(self):
+        conversations = self.manager.list_conversations(2, limit=2)
+        self.assertEqual([c.peer_id for c in conversations], [3, 1])
+
+if __name__ == '__main__':
+    unittest.main()
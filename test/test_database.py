@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+from server.config import REPLICA_CONFIG
+from server.utils.database import DatabaseManager
+from fakes import FakeConnection
+
+class FakePool:
+    """每个连接池只有一个连接；结果行标明由哪个池执行"""
+
+    def __init__(self, name):
+        self.name = name
+        self.conn = FakeConnection(rows=[{"pool": name}], error=mysql.connector.OperationalError("连接中断"))
+        self.down = False
+
+    @property
+    def queries(self):
+        return [query for query, _ in self.conn.executed]
+
+    def break_queries(self):
+        self.conn.fail_on = ""
+
+    def get_connection(self):
+        if self.down:
+            raise mysql.connector.InterfaceError("无法连接")
+        return self.conn
+
+class FakeDatabaseManager(DatabaseManager):
+    """连接池替换为 FakePool，不连接 Redis，不启动健康检查线程"""
+
+    def __init__(self, replicas=2):
+        self.pools = {}
+        super().__init__({"pool_name": "primary"},
+                         replica_configs=[{"host": f"replica{i}"} for i in range(replicas)])
+
+    def _create_pool(self, config):
+        pool = self.pools[config["pool_name"]] = FakePool(config["pool_name"])
+        return pool
+
+    def _start_monitor(self):
+        pass
+
+    def _setup_connections(self):
+        self.cnx_pool = self._create_pool(self.db_config)
+        self._setup_replicas()
+
+def served_by(db, **kwargs):
+    return db.execute_query("SELECT 1", read_only=True, **kwargs)[0]["pool"]
+
+class TestReplicaRouting(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDatabaseManager()
+
+    def test_reads_round_robin_over_replicas(self):
+        """测试只读查询轮流使用副本，写入和非只读查询使用主库"""
+        served = {served_by(self.db) for _ in range(4)}
+        self.assertEqual(served, {"primary_replica0", "primary_replica1"})
+        self.assertEqual(self.db.execute_query("SELECT 1")[0]["pool"], "primary")
+        self.db.execute_update("UPDATE t SET a = 1")
+        self.assertEqual(self.db.pools["primary"].queries, ["SELECT 1", "UPDATE t SET a = 1"])
+
+    def test_read_your_writes_window(self):
+        """测试会话写入后窗口内的读请求走主库，其他会话不受影响，窗口过后回到副本"""
+        self.db.execute_update("UPDATE t SET a = 1", session=7)
+        self.assertEqual(served_by(self.db, session=7), "primary")
+        self.assertNotEqual(served_by(self.db, session=8), "primary")
+
+        self.db._last_writes[7] -= REPLICA_CONFIG["read_your_writes_window"] + 1
+        self.assertNotEqual(served_by(self.db, session=7), "primary")
+
+    def test_expired_writes_pruned(self):
+        """测试写入后不再读的会话在之后任意会话写入时被清除"""
+        for session in range(100):
+            self.db.mark_write(session)
+        for session in range(50):
+            self.db._last_writes[session] -= REPLICA_CONFIG["read_your_writes_window"] + 1
+        self.db.mark_write(7)
+        self.assertEqual(len(self.db._last_writes), 51)
+        self.assertEqual(list(self.db._last_writes)[-1], 7)
+        self.assertEqual(served_by(self.db, session=7), "primary")
+
+    def test_mark_write_without_session(self):
+        self.db.mark_write(None)
+        self.assertEqual(self.db._last_writes, {})
+
+    def test_failover_when_replica_unreachable(self):
+        """测试获取副本连接失败时回退到主库并把副本标记为不健康"""
+        for pool in self.db.pools.values():
+            if pool.name != "primary":
+                pool.down = True
+        self.assertEqual(served_by(self.db), "primary")
+        self.assertEqual(served_by(self.db), "primary")
+        self.assertFalse(any(r["healthy"] for r in self.db.replicas))
+
+    def test_failover_when_query_fails(self):
+        """测试副本在查询过程中断开时改用主库重试"""
+        self.db.pools["primary_replica0"].break_queries()
+        self.db.pools["primary_replica1"].break_queries()
+        self.assertEqual(served_by(self.db), "primary")
+        self.assertEqual(sum(r["healthy"] for r in self.db.replicas), 1)
+
+    def test_primary_errors_are_raised(self):
+        self.db.pools["primary"].break_queries()
+        with self.assertRaises(mysql.connector.OperationalError):
+            self.db.execute_query("SELECT 1")
+
+    def test_health_check_ejects_and_readmits(self):
+        """测试健康检查移除失效的副本，恢复后重新加入"""
+        replica0 = self.db.pools["primary_replica0"]
+        replica0.down = True
+        self.db.check_replicas()
+        self.assertEqual({served_by(self.db) for _ in range(4)}, {"primary_replica1"})
+
+        replica0.down = False
+        self.db.check_replicas()
+        self.assertEqual({served_by(self.db) for _ in range(4)}, {"primary_replica0", "primary_replica1"})
+
+    def test_no_replicas(self):
+        db = FakeDatabaseManager(replicas=0)
+        self.assertEqual(served_by(db), "primary")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.dedupe import DedupeWindow
+
+class TestDedupeWindow(unittest.TestCase):
+    def test_duplicate_per_session(self):
+        """测试同一会话内重复的 id 被识别，不同会话互不影响"""
+        window = DedupeWindow(max_size=10, ttl=60)
+        self.assertFalse(window.seen("alice", "m1", now=0))
+        self.assertTrue(window.seen("alice", "m1", now=1))
+        self.assertFalse(window.seen("bob", "m1", now=1))
+        self.assertEqual(window.duplicates, 1)
+
+    def test_size_and_time_eviction(self):
+        """测试超出窗口大小或过期的 id 被淘汰"""
+        window = DedupeWindow(max_size=2, ttl=60)
+        for msg_id in ("m1", "m2", "m3"):
+            window.seen("alice", msg_id, now=0)
+        self.assertFalse(window.seen("alice", "m1", now=1))
+        self.assertTrue(window.seen("alice", "m3", now=1))
+        self.assertFalse(window.seen("alice", "m3", now=100))
+
+        window.prune(now=1000)
+        self.assertEqual(len(window), 0)
+
+if __name__ == '__main__':
+    unittest.main()
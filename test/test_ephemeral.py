@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from server.config import EPHEMERAL_CONFIG
+from server.models.message import Message, _insert_params
+from server.models.ephemeral_message import EphemeralMessageStore
+from fakes import FakeRedis
+
+class FakeDB:
+    def __init__(self):
+        self.redis = FakeRedis()
+
+def make_message(message_id, channel_id=1):
+    return Message(id=message_id, channel_id=channel_id, sender_id=7,
+                   content=f"msg {message_id}", created_at=datetime(2024, 1, 1, 12, 0, message_id % 60))
+
+class TestEphemeralMessageStore(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB()
+        self.store = EphemeralMessageStore(self.db)
+
+    def test_recent_messages_newest_first(self):
+        """测试按 id 倒序读取，内容与时间原样还原"""
+        for message_id in range(1, 6):
+            self.assertTrue(self.store.append(make_message(message_id)))
+        messages = self.store.get_recent(1, limit=3)
+        self.assertEqual([m.id for m in messages], [5, 4, 3])
+        self.assertEqual(messages[0].content, "msg 5")
+        self.assertEqual(messages[0].created_at, datetime(2024, 1, 1, 12, 0, 5))
+        self.assertEqual(self.db.redis.expires["ephemeral:1"], EPHEMERAL_CONFIG["ttl"])
+
+    def test_before_id_cursor(self):
+        """测试 before_id 分页"""
+        for message_id in range(1, 6):
+            self.store.append(make_message(message_id))
+        self.assertEqual([m.id for m in self.store.get_recent(1, limit=2, before_id=4)], [3, 2])
+        self.assertEqual(self.store.get_recent(1, before_id=1), [])
+
+    def test_buffer_is_capped_and_per_channel(self):
+        """测试每个频道只保留最近 max_messages 条"""
+        cap = EPHEMERAL_CONFIG["max_messages"]
+        for message_id in range(1, cap + 11):
+            self.store.append(make_message(message_id))
+        self.store.append(make_message(1000, channel_id=2))
+        messages = self.store.get_recent(1, limit=cap + 100)
+        self.assertEqual(len(messages), cap)
+        self.assertEqual(messages[-1].id, 11)
+        self.assertEqual([m.id for m in self.store.get_recent(2)], [1000])
+
+    def test_content_sanitized_like_persistent(self):
+        """测试临时频道与持久化频道保存的内容经过相同的清理"""
+        message = make_message(1)
+        message.content = '<b>x</b> & "y"'
+        persisted = _insert_params(message)[3]
+        self.store.append(message)
+        self.assertEqual(self.store.get_recent(1)[0].content, persisted)
+        self.assertEqual(persisted, "x &amp; &quot;y&quot;")
+
+    def test_redis_unavailable(self):
+        """测试 Redis 不可用时写入失败、读取为空"""
+        self.db.redis = None
+        self.assertFalse(self.store.append(make_message(1)))
+        self.assertEqual(self.store.get_recent(1), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import ctypes
+import errno
+import socket
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.config import FANOUT_CONFIG
+from server.utils import fanout
+from server.utils.fanout import FanoutEngine
+
+HAS_SENDMMSG = sys.platform.startswith("linux")
+
+def make_receivers(count):
+    receivers = []
+    for _ in range(count):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(1)
+        receivers.append(receiver)
+    return receivers
+
+def receive_all(receiver):
+    """读出接收端已到达的全部数据报"""
+    packets = [receiver.recv(2048)]
+    receiver.setblocking(False)
+    try:
+        while True:
+            packets.append(receiver.recv(2048))
+    except BlockingIOError:
+        pass
+    finally:
+        receiver.settimeout(1)
+    return packets
+
+class FanoutCases:
+    """两种发送方式共用的用例，子类设置 use_sendmmsg"""
+    use_sendmmsg = None
+    backend = None
+
+    def setUp(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receivers = make_receivers(7)
+        self.addrs = [r.getsockname() for r in self.receivers]
+        # 批大小 3，7 个地址分三批发送
+        self.engine = FanoutEngine(self.sock, batch_size=3, use_sendmmsg=self.use_sendmmsg)
+        self.assertEqual(self.engine.backend, self.backend)
+
+    def tearDown(self):
+        self.sock.close()
+        for receiver in self.receivers:
+            receiver.close()
+
+    def test_batches_reach_every_address_once(self):
+        """测试地址数不是批大小的整数倍时每个地址都恰好收到一次"""
+        self.assertEqual(self.engine.send(b"hello", self.addrs), 0)
+        for receiver in self.receivers:
+            self.assertEqual(receive_all(receiver), [b"hello"])
+        self.assertEqual(self.engine.report()["datagrams"], 7)
+        self.assertEqual(self.engine.drain_failed(), [])
+
+    def test_failed_addresses_skipped(self):
+        """测试批内失败的地址被记录，其前后的地址照常发送"""
+        addrs = list(self.addrs)
+        addrs.insert(1, ("127.0.0.1", 0))   # 内核拒绝
+        addrs.insert(4, ("256.0.0.1", 80))  # 无法解析
+        self.assertEqual(self.engine.send(b"hello", addrs), 2)
+        for receiver in self.receivers:
+            self.assertEqual(receive_all(receiver), [b"hello"])
+        failed = self.engine.drain_failed()
+        self.assertEqual(sorted(addr for addr, _, _ in failed), [("127.0.0.1", 0), ("256.0.0.1", 80)])
+        self.assertTrue(all(isinstance(error, OSError) for _, _, error in failed))
+        # 错误来自失败的那次调用，而不是之前部分成功的调用留下的 errno
+        rejected = next(error for addr, _, error in failed if addr[1] == 0)
+        self.assertEqual(rejected.errno, errno.EINVAL)
+        self.assertEqual(self.engine.drain_failed(), [])
+
+    def test_send_each(self):
+        """测试每个地址发送不同的负载"""
+        packets = [(f"m{i}".encode(), addr) for i, addr in enumerate(self.addrs)]
+        packets.append((b"again", self.addrs[0]))
+        self.assertEqual(self.engine.send_each(packets), 0)
+        self.assertEqual(receive_all(self.receivers[0]), [b"m0", b"again"])
+        for i, receiver in enumerate(self.receivers[1:], 1):
+            self.assertEqual(receive_all(receiver), [f"m{i}".encode()])
+
+class TestSendto(FanoutCases, unittest.TestCase):
+    use_sendmmsg = False
+    backend = "sendto"
+
+@unittest.skipUnless(HAS_SENDMMSG, "sendmmsg 仅在 Linux 上可用")
+class TestSendmmsg(FanoutCases, unittest.TestCase):
+    use_sendmmsg = True
+    backend = "sendmmsg"
+
+    def test_sockaddr_cache(self):
+        """测试同一地址复用打包好的 sockaddr，超过上限时清空缓存但当前批次照常发送"""
+        batcher = self.engine._batcher
+        self.engine.send(b"a", self.addrs[:2])
+        cached = batcher._sockaddrs[self.addrs[0]]
+        self.engine.send(b"b", self.addrs[:2])
+        self.assertIs(batcher._sockaddrs[self.addrs[0]], cached)
+
+        limit = FANOUT_CONFIG["max_cached_addrs"]
+        FANOUT_CONFIG["max_cached_addrs"] = 2
+        try:
+            self.assertEqual(self.engine.send(b"c", self.addrs), 0)
+        finally:
+            FANOUT_CONFIG["max_cached_addrs"] = limit
+        self.assertLessEqual(len(batcher._sockaddrs), 3)
+        self.assertEqual(receive_all(self.receivers[0]), [b"a", b"b", b"c"])
+        for receiver in self.receivers[2:]:
+            self.assertEqual(receive_all(receiver), [b"c"])
+
+class TestBackendSelection(unittest.TestCase):
+    def setUp(self):
+        self.cdll = ctypes.CDLL
+        self.sockets = []
+
+    def tearDown(self):
+        fanout.ctypes.CDLL = self.cdll
+        for sock in self.sockets:
+            sock.close()
+
+    def make_socket(self, family=socket.AF_INET):
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sockets.append(sock)
+        return sock
+
+    def test_libc_unavailable(self):
+        """测试无法加载 libc 或 libc 没有 sendmmsg 时回退到 sendto"""
+        def missing(*args, **kwargs):
+            raise OSError("libc not found")
+        fanout.ctypes.CDLL = missing
+        self.assertEqual(FanoutEngine(self.make_socket(), use_sendmmsg=True).backend, "sendto")
+
+        fanout.ctypes.CDLL = lambda *args, **kwargs: object()
+        engine = FanoutEngine(self.make_socket(), use_sendmmsg=True)
+        self.assertEqual(engine.backend, "sendto")
+        receiver, = make_receivers(1)
+        self.sockets.append(receiver)
+        self.assertEqual(engine.send(b"x", [receiver.getsockname()]), 0)
+        self.assertEqual(receiver.recv(16), b"x")
+
+    def test_disabled_or_ipv6(self):
+        self.assertEqual(FanoutEngine(self.make_socket(), use_sendmmsg=False).backend, "sendto")
+        if socket.has_ipv6:
+            self.assertEqual(FanoutEngine(self.make_socket(socket.AF_INET6), use_sendmmsg=True).backend,
+                             "sendto")
+
+if __name__ == '__main__':
+    unittest.main()
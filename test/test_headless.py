@@ -0,0 +1,188 @@
+import unittest
+import sys
+import os
+import socket
+import subprocess
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import dumps, loads
+from client.headless import HeadlessClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class FakeServer(threading.Thread):
+    """回应认证并把收到的消息广播回去的最小服务器"""
+
+    # 与 ChatServer._handle_auth 相同的登录回复顺序（频道列表之后）
+    LOGIN_ORDER = ("history", "offline_messages", "subscriptions")
+    HISTORY = [{"id": 42, "sender": "bob", "content": "早", "channel": "general"}]
+
+    def __init__(self, heartbeat_interval=10, reliable=False, login_order=LOGIN_ORDER):
+        super().__init__(daemon=True)
+        self.heartbeat_interval = heartbeat_interval
+        # 是否在认证回复中声明支持可靠传输（只声明，不处理可靠包）
+        self.reliable = reliable
+        self.login_order = login_order
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.socket.settimeout(5)
+        self.received = []
+
+    def run(self):
+        try:
+            while True:
+                data, addr = self.socket.recvfrom(4096)
+                message = loads(data)
+                self.received.append(message)
+                command = message.get("command")
+                if command == "auth":
+                    reply = {
+                        "type": "channel_list", "channels": [{"name": "general"}],
+                        "heartbeat_interval": self.heartbeat_interval
+                    }
+                    if self.reliable and message.get("reliable"):
+                        reply["reliable"] = True
+                    self.socket.sendto(dumps(reply), addr)
+                    for packet_type in self.login_order:
+                        self.socket.sendto(dumps(self.login_packet(packet_type)), addr)
+                elif command == "subscribe":
+                    self.socket.sendto(dumps({
+                        "type": "subscriptions", "channel": "general",
+                        "unread": {channel: 0 for channel in message["channels"]}
+                    }), addr)
+                elif command == "message":
+                    self.socket.sendto(dumps({
+                        "type": "message", "sender": message["username"],
+                        "content": message["content"], "channel": message["channel"]
+                    }), addr)
+        except OSError:
+            pass
+
+    def login_packet(self, packet_type):
+        if packet_type == "history":
+            return {"type": "history", "messages": self.HISTORY}
+        if packet_type == "offline_messages":
+            return {"type": "offline_messages", "messages": [
+                {"id": 7, "sender": "carol", "content": "离线", "channel": "general"}
+            ]}
+        return {"type": "subscriptions", "channel": "general", "unread": {"general": 0, "random": 3}}
+
+def chat_messages(client, count, duration=2):
+    """只取聊天消息，跳过登录后随之到达的离线消息和订阅"""
+    messages = (m for m in client.messages(duration=duration) if m.get("type") == "message")
+    return [message for _, message in zip(range(count), messages)]
+
+def drain_login(client):
+    list(client.messages(duration=0.5, count=len(FakeServer.LOGIN_ORDER) - 1))
+
+class TestHeadlessClient(unittest.TestCase):
+    def test_no_textual_import(self):
+        """测试导入无界面客户端不会加载 Textual"""
+        code = "import sys, client.headless; print('textual' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_login_send_listen(self):
+        """测试登录、发送并接收回显"""
+        server = FakeServer()
+        server.start()
+        with HeadlessClient(*server.socket.getsockname()) as client:
+            self.assertTrue(client.login("alice", "secret123"))
+            self.assertEqual(client.channels, [{"name": "general"}])
+            client_msg_id = client.send("你好")
+            message, = chat_messages(client, 1)
+            self.assertEqual(message["content"], "你好")
+            sent = [m for m in server.received if m["command"] == "message"]
+            self.assertEqual(sent[0]["client_msg_id"], client_msg_id)
+        server.socket.close()
+
+    def assert_login_packets(self, server):
+        with HeadlessClient(*server.socket.getsockname()) as client:
+            self.assertTrue(client.login("alice", "secret123"))
+            self.assertEqual(client.history, FakeServer.HISTORY)
+            self.assertEqual(client.network.last_message_id, 42)
+            rest = list(client.messages(duration=0.5, count=2))
+            self.assertEqual(sorted(m["type"] for m in rest), ["offline_messages", "subscriptions"])
+            self.assertEqual(client.network.unread, {"general": 0, "random": 3})
+        server.socket.close()
+
+    def test_login_packet_order(self):
+        """测试按服务器实际顺序回复时历史消息由登录取得，离线消息和订阅随后收到"""
+        server = FakeServer()
+        server.start()
+        self.assert_login_packets(server)
+
+    def test_login_packets_reordered(self):
+        """测试订阅和离线消息先于历史到达时历史仍由登录取得，其余消息不丢失"""
+        server = FakeServer(login_order=("subscriptions", "offline_messages", "history"))
+        server.start()
+        self.assert_login_packets(server)
+
+    def test_subscribe_counts_unread(self):
+        """测试订阅后其他频道的消息计入未读，切换查看后清零"""
+        server = FakeServer()
+        server.start()
+        with HeadlessClient(*server.socket.getsockname()) as client:
+            self.assertTrue(client.login("alice", "secret123"))
+            drain_login(client)
+            self.assertEqual(client.subscribe(["random"]), {"random": 0})
+            client.network.current_channel = "random"
+            client.send("一")
+            client.send("二")
+            client.network.current_channel = "general"
+            chat_messages(client, 2, duration=1)
+            self.assertEqual(client.network.unread["random"], 2)
+            client.network.view_channel("random")
+            self.assertEqual(client.network.unread["random"], 0)
+            self.assertEqual(client.network.current_channel, "random")
+        server.socket.close()
+
+    def test_reliable_falls_back_without_server_support(self):
+        """测试服务器未启用可靠传输时客户端放弃可靠会话，命令以普通数据包发送"""
+        server = FakeServer()
+        server.start()
+        with HeadlessClient(*server.socket.getsockname(), reliable=True) as client:
+            self.assertTrue(client.login("alice", "secret123"))
+            self.assertTrue(server.received[0]["reliable"])
+            self.assertIsNone(client.network.session)
+            client.send("你好")
+            message, = chat_messages(client, 1)
+            self.assertEqual(message["content"], "你好")
+            self.assertEqual(server.received[-1]["command"], "message")
+        server.socket.close()
+
+    def test_reliable_kept_when_server_agrees(self):
+        """测试服务器在认证回复中声明 reliable 时客户端保留可靠会话，命令带序号发送"""
+        server = FakeServer(reliable=True)
+        server.start()
+        with HeadlessClient(*server.socket.getsockname(), reliable=True) as client:
+            self.assertTrue(client.login("alice", "secret123"))
+            self.assertIsNotNone(client.network.session)
+            client.send("你好")
+            deadline = time.time() + 2
+            while len(server.received) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertIn("rel", server.received[1])
+        server.socket.close()
+
+    def test_heartbeat_only_when_idle(self):
+        """测试使用服务器下发的心跳间隔，且有其他流量时不发送心跳"""
+        server = FakeServer(heartbeat_interval=0.3)
+        server.start()
+        with HeadlessClient(*server.socket.getsockname()) as client:
+            self.assertTrue(client.login("alice", "secret123"))
+            self.assertEqual(client.network.heartbeat_interval, 0.3)
+            for _ in range(6):
+                client.send("ping")
+                time.sleep(0.1)
+            heartbeats = [m for m in server.received if m["command"] == "heartbeat"]
+            self.assertEqual(heartbeats, [])
+            time.sleep(0.8)
+            heartbeats = [m for m in server.received if m["command"] == "heartbeat"]
+            self.assertGreaterEqual(len(heartbeats), 1)
+        server.socket.close()
+
+if __name__ == '__main__':
+    unittest.main()
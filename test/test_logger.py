@@ -0,0 +1,118 @@
+import unittest
+import sys
+import os
+import json
+import logging
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.config import LOG_CONFIG
+from server.utils.logger import setup_logging, stop_logging, JsonFormatter, SamplingFilter
+
+class Lazy:
+    """记录 __str__ 被调用的线程"""
+
+    def __init__(self):
+        self.formatted_in = []
+
+    def __str__(self):
+        import threading
+        self.formatted_in.append(threading.current_thread().name)
+        return "lazy"
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "server.log")
+        self.logger = logging.getLogger(f"test_logger.{self.id()}")
+        self.logger.propagate = False
+        self.listener = setup_logging({
+            "file": self.path,
+            "max_bytes": 2000,
+            "backup_count": 2,
+            "console": False,
+            "level": "INFO",
+            "sampling": {"noisy": 5}
+        }, self.logger)
+
+    def tearDown(self):
+        stop_logging(self.logger)
+        for handler in self.listener.handlers:
+            handler.close()
+        self.tmpdir.cleanup()
+
+    def read_entries(self):
+        stop_logging(self.logger)
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_json_with_extra_fields(self):
+        """测试日志文件每行一条 JSON，extra 字段并入"""
+        self.logger.info("用户 %s 加入 %s", "alice", "general", extra={"user": "alice"})
+        self.logger.debug("不会输出")
+        entries = self.read_entries()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]["msg"], "用户 alice 加入 general")
+        self.assertEqual(entries[0]["user"], "alice")
+        self.assertEqual(entries[0]["level"], "INFO")
+
+    def test_formatting_off_caller_thread(self):
+        """测试消息在后台线程中格式化，调用线程只入队"""
+        import threading
+        lazy = Lazy()
+        self.logger.info("值 %s", lazy)
+        entries = self.read_entries()
+        self.assertEqual(entries[0]["msg"], "值 lazy")
+        self.assertNotIn(threading.current_thread().name, lazy.formatted_in)
+
+    def test_sampling(self):
+        """测试高频事件每 N 条保留 1 条并标记采样率"""
+        for i in range(20):
+            self.logger.info("心跳超时 %d", i, extra={"sample": "noisy"})
+        self.logger.info("其他", extra={"sample": "other"})
+        entries = self.read_entries()
+        noisy = [e for e in entries if e.get("sample") == "noisy"]
+        self.assertEqual([e["msg"] for e in noisy], ["心跳超时 0", "心跳超时 5", "心跳超时 10", "心跳超时 15"])
+        self.assertTrue(all(e["sampled"] == 5 for e in noisy))
+        self.assertEqual(entries[-1]["msg"], "其他")
+
+    def test_rotation(self):
+        """测试超过 max_bytes 后轮转，最多保留 backup_count 个旧文件"""
+        for i in range(200):
+            self.logger.info("填充日志 %d %s", i, "x" * 50)
+        stop_logging(self.logger)
+        files = sorted(os.listdir(self.tmpdir.name))
+        self.assertEqual(files, ["server.log", "server.log.1", "server.log.2"])
+        self.assertLessEqual(os.path.getsize(self.path), 2000)
+
+    def test_setup_is_idempotent(self):
+        """测试同一个 logger 重复配置时复用已有的 listener"""
+        self.assertIs(setup_logging({"file": self.path, "console": False}, self.logger), self.listener)
+        self.assertEqual(len(self.logger.handlers), 1)
+
+class TestJsonFormatter(unittest.TestCase):
+    def test_exception(self):
+        """测试异常堆栈写入 exc 字段"""
+        try:
+            raise ValueError("坏数据")
+        except ValueError:
+            record = logging.getLogger("x").makeRecord("x", logging.ERROR, __file__, 1, "失败", (), sys.exc_info())
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertIn("ValueError: 坏数据", entry["exc"])
+
+    def test_sampling_filter_defaults(self):
+        """测试未配置采样率的记录全部保留"""
+        sampling = SamplingFilter({})
+        record = logging.makeLogRecord({"msg": "m", "sample": "anything"})
+        self.assertTrue(all(sampling.filter(record) for _ in range(10)))
+
+    def test_audit_events_not_sampled_by_default(self):
+        """测试默认配置下断开和加入频道等审计事件全部保留，只采样高频事件"""
+        sampling = SamplingFilter(LOG_CONFIG["sampling"])
+        for key in ("disconnect", "join_channel"):
+            record = logging.makeLogRecord({"msg": "m", "sample": key})
+            self.assertTrue(all(sampling.filter(record) for _ in range(20)))
+        self.assertLessEqual(set(LOG_CONFIG["sampling"]), {"unauthenticated", "rate_limited", "duplicate_message"})
+
+if __name__ == '__main__':
+    unittest.main()
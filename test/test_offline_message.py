@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from server.config import OFFLINE_CONFIG
+from server.models.offline_message import OfflineMessageManager
+from fakes import FakeRedis
+
+class FakeDB:
+    """offline_messages 表：自增 id，按查询中的 ORDER BY 列排序"""
+
+    def __init__(self):
+        self.redis = FakeRedis()
+        self.rows = []
+        self.next_id = 1
+
+    def insert(self, recipient_id, payload, created_at):
+        self.rows.append({"id": self.next_id, "recipient_id": recipient_id,
+                          "payload": payload, "created_at": created_at})
+        self.next_id += 1
+
+    def execute_update(self, query, params=None, session=None):
+        if query.strip().startswith("INSERT"):
+            self.insert(*params)
+            return 1
+        recipient_id, max_id = params
+        before = len(self.rows)
+        self.rows = [row for row in self.rows
+                     if not (row["recipient_id"] == recipient_id and row["id"] <= max_id)]
+        return before - len(self.rows)
+
+    def execute_query(self, query, params=None, read_only=False, session=None):
+        recipient_id, limit = params
+        column = "id" if "ORDER BY id" in query else "created_at"
+        rows = [row for row in self.rows if row["recipient_id"] == recipient_id]
+        return sorted(rows, key=lambda row: row[column], reverse=True)[:limit]
+
+class TestOfflineMessageManager(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB()
+        self.manager = OfflineMessageManager(self.db)
+
+    def test_redis_queue_is_capped(self):
+        """测试 Redis 队列只保留最近的 max_per_recipient 条并设置过期时间"""
+        cap = OFFLINE_CONFIG["max_per_recipient"]
+        for i in range(cap + 5):
+            self.assertTrue(self.manager.enqueue(3, {"n": i}))
+        self.assertEqual(len(self.db.redis.lists["offline:3"]), cap)
+        self.assertEqual(self.db.redis.expires["offline:3"], OFFLINE_CONFIG["ttl"])
+
+        messages = self.manager.drain(3)
+        self.assertEqual([m["n"] for m in messages], list(range(5, cap + 5)))
+        self.assertEqual(self.manager.drain(3), [])
+        self.assertEqual(self.db.rows, [])
+
+    def test_mysql_fallback(self):
+        """测试 Redis 不可用时写入 MySQL，并能取出"""
+        self.db.redis = None
+        self.assertTrue(self.manager.enqueue(3, {"n": 1}))
+        self.assertTrue(self.manager.enqueue(4, {"n": 2}))
+        self.assertEqual(len(self.db.rows), 2)
+        self.assertEqual(self.manager.drain(3), [{"n": 1}])
+        self.assertEqual([row["recipient_id"] for row in self.db.rows], [4])
+
+    def test_mysql_messages_come_first(self):
+        """测试 Redis 故障期间写入 MySQL 的消息排在 Redis 中的消息之前"""
+        redis = self.db.redis
+        self.db.redis = None
+        self.manager.enqueue(3, {"n": 1})
+        self.db.redis = redis
+        self.manager.enqueue(3, {"n": 2})
+        self.assertEqual(self.manager.drain(3), [{"n": 1}, {"n": 2}])
+
+    def test_drain_orders_by_id(self):
+        """测试时间戳与 id 顺序不一致时（如时钟回拨）不会删除未读出的消息"""
+        self.db.insert(3, '{"n":1}', datetime(2024, 1, 1, 12, 0, 5))
+        self.db.insert(3, '{"n":2}', datetime(2024, 1, 1, 12, 0, 1))
+        self.db.insert(3, '{"n":3}', datetime(2024, 1, 1, 12, 0, 3))
+        self.assertEqual(self.manager.drain(3), [{"n": 1}, {"n": 2}, {"n": 3}])
+        self.assertEqual(self.db.rows, [])
+
+    def test_drain_drops_rows_beyond_cap(self):
+        """测试超出上限的旧消息被丢弃，之后写入的消息在下次取出"""
+        cap = OFFLINE_CONFIG["max_per_recipient"]
+        for i in range(cap + 3):
+            self.db.insert(3, f'{{"n":{i}}}', datetime(2024, 1, 1))
+        messages = self.manager.drain(3)
+        self.assertEqual(len(messages), cap)
+        self.assertEqual(messages[0], {"n": 3})
+        self.assertEqual(self.db.rows, [])
+
+        self.db.insert(3, '{"n":999}', datetime(2024, 1, 2))
+        self.assertEqual(self.manager.drain(3), [{"n": 999}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.pipeline import Pipeline, Request, RateLimiter
+
+class TestPipeline(unittest.TestCase):
+    def test_middleware_order_and_registry(self):
+        """测试中间件按注册顺序执行，命令交给注册的处理函数，未注册的交给 fallback"""
+        calls = []
+        pipeline = Pipeline(fallback=lambda request: calls.append(("fallback", request.command)))
+
+        def outer(request, call_next):
+            calls.append("outer")
+            call_next(request)
+
+        def inner(request, call_next):
+            calls.append("inner")
+            call_next(request)
+
+        pipeline.use("outer", outer)
+        pipeline.use("inner", inner)
+
+        @pipeline.register("ping", public=True)
+        def ping(request):
+            calls.append(("ping", request.username))
+
+        pipeline.handle(Request(("127.0.0.1", 1), message={"command": "ping", "username": "alice"}))
+        pipeline.handle(Request(("127.0.0.1", 1), message={"command": "nope"}))
+        self.assertEqual(calls, ["outer", "inner", ("ping", "alice"), "outer", "inner", ("fallback", "nope")])
+        self.assertTrue(pipeline.registration("ping").public)
+        self.assertEqual(pipeline.commands, ["ping"])
+
+    def test_middleware_can_stop(self):
+        """测试中间件不调用 call_next 时请求结束，之后注册的中间件也生效"""
+        handled = []
+        pipeline = Pipeline()
+        pipeline.register("message", lambda request: handled.append(request.message["content"]))
+        pipeline.handle(Request(None, message={"command": "message", "content": "a"}))
+        pipeline.use("block", lambda request, call_next: request.message["content"] != "b" and call_next(request))
+        pipeline.handle(Request(None, message={"command": "message", "content": "b"}))
+        pipeline.handle(Request(None, message={"command": "message", "content": "c"}))
+        self.assertEqual(handled, ["a", "c"])
+
+    def test_stage_timing_excludes_inner(self):
+        """测试每个阶段单独计时，中间件的耗时不含后续阶段"""
+        pipeline = Pipeline()
+
+        def slow_stage(request, call_next):
+            time.sleep(0.02)
+            call_next(request)
+
+        pipeline.use("slow", slow_stage)
+        pipeline.use("fast", lambda request, call_next: call_next(request))
+        pipeline.register("work", lambda request: time.sleep(0.03))
+        pipeline.handle(Request(None, message={"command": "work"}))
+        report = pipeline.report()
+        self.assertEqual(set(report), {"slow", "fast", "command:work"})
+        self.assertGreaterEqual(report["slow"]["avg_ms"], 15)
+        self.assertLess(report["slow"]["avg_ms"], 29)
+        self.assertLess(report["fast"]["avg_ms"], 10)
+        self.assertGreaterEqual(report["command:work"]["max_ms"], 25)
+        self.assertEqual(pipeline.report(), {})
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket(self):
+        """测试突发上限、等待时间和令牌补充"""
+        limiter = RateLimiter(per_minute=60, burst=2)
+        now = 100.0
+        self.assertTrue(limiter.allow("alice", now)[0])
+        self.assertTrue(limiter.allow("alice", now)[0])
+        allowed, retry_after = limiter.allow("alice", now)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.0)
+        self.assertTrue(limiter.allow("bob", now)[0])
+        self.assertTrue(limiter.allow("alice", now + 1)[0])
+        limiter.prune(now + 10)
+        self.assertEqual(len(limiter), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import loads
+from server.utils.presence import PresenceAggregator
+
+class TestPresenceAggregator(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+        self.presence = PresenceAggregator(
+            lambda channel, payload: self.emitted.append((channel, loads(payload))),
+            {"max_names": 2}
+        )
+
+    def test_coalesce_per_channel(self):
+        """测试一个窗口内的变化按频道合并，重连的用户互相抵消"""
+        self.presence.joined("general", "alice")
+        self.presence.left("general", "bob")
+        self.presence.joined("general", "bob")   # bob 重连
+        self.presence.joined("random", "carol")
+        self.presence.left("random", "carol")    # carol 加入后立即离开
+        self.presence.flush()
+        self.assertEqual(self.emitted, [
+            ("general", {"type": "presence", "channel": "general", "joined": ["alice"], "left": []})
+        ])
+        self.presence.flush()
+        self.assertEqual(len(self.emitted), 1)
+
+    def test_size_cap(self):
+        """测试超过 max_names 时拆分为多个事件"""
+        for name in ("a", "b", "c"):
+            self.presence.joined("general", name)
+        self.presence.left("general", "d")
+        self.presence.flush()
+        events = [event for _, event in self.emitted]
+        self.assertEqual(events[0]["joined"], ["a", "b"])
+        self.assertEqual(events[1]["joined"], ["c"])
+        self.assertEqual(events[1]["left"], ["d"])
+
+if __name__ == '__main__':
+    unittest.main()
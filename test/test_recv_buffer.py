@@ -0,0 +1,62 @@
+import unittest
+import socket
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import loads
+from server.utils.recv_buffer import ReceiveBuffer
+
+class TestReceiveBuffer(unittest.TestCase):
+    def setUp(self):
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(("127.0.0.1", 0))
+        self.receiver.settimeout(1)
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.target = self.receiver.getsockname()
+        self.buf = ReceiveBuffer(16)
+
+    def tearDown(self):
+        self.receiver.close()
+        self.sender.close()
+
+    def send(self, data):
+        self.sender.sendto(data, self.target)
+
+    def test_view_into_buffer(self):
+        """测试返回的视图直接指向预分配的缓冲区，长度为数据报长度"""
+        self.send(b'{"a":1}')
+        data = self.buf.recv_from(self.receiver)
+        self.assertIsInstance(data, memoryview)
+        self.assertIs(data.obj, self.buf.buffer)
+        self.assertEqual(bytes(data), b'{"a":1}')
+        self.assertEqual(self.buf.addr[1], self.sender.getsockname()[1])
+        self.assertEqual(loads(data), {"a": 1})
+        self.assertFalse(self.buf.truncated)
+
+    def test_buffer_is_reused(self):
+        """测试下一次接收覆盖同一块缓冲区，上一次的视图随之失效"""
+        self.send(b"first packet")
+        first = self.buf.recv_from(self.receiver)
+        self.send(b"second")
+        second = self.buf.recv_from(self.receiver)
+        self.assertEqual(bytes(second), b"second")
+        self.assertEqual(bytes(self.buf.data), b"second")
+        self.assertEqual(bytes(first), b"secondpacket")
+
+    def test_exact_size_not_truncated(self):
+        self.send(b"x" * 16)
+        self.assertEqual(len(self.buf.recv_from(self.receiver)), 16)
+        self.assertFalse(self.buf.truncated)
+
+    def test_oversized_datagram_truncated(self):
+        """测试超过 size 的数据报被标记为截断，剩余部分不会出现在下一次接收中"""
+        self.send(b"y" * 100)
+        self.send(b"next")
+        self.buf.recv_from(self.receiver)
+        self.assertTrue(self.buf.truncated)
+        self.assertEqual(bytes(self.buf.recv_from(self.receiver)), b"next")
+        self.assertFalse(self.buf.truncated)
+
+if __name__ == '__main__':
+    unittest.main()
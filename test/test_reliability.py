@@ -0,0 +1,119 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import dumps, loads
+from common.reliability import ReliableSender, ReliableReceiver, unwrap
+from server.utils.reliable_transport import ReliableTransport
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((loads(data), addr))
+
+class FakeFanout:
+    def __init__(self):
+        self.socket = FakeSocket()
+
+    def send(self, payload, addrs):
+        return 0
+
+    def send_each(self, packets):
+        return 0
+
+class TestReliability(unittest.TestCase):
+    def test_wrap_unwrap(self):
+        """测试可靠包携带序号且负载不被重新编码"""
+        sender = ReliableSender()
+        payload = dumps({"type": "message", "content": "你好"})
+        packet, = sender.send(payload, now=0.0)
+        seq, body = unwrap(loads(packet))
+        self.assertEqual(seq, 1)
+        self.assertEqual(body, loads(payload))
+        self.assertEqual(unwrap({"type": "ack"}), (None, {"type": "ack"}))
+
+    def test_window_and_retransmit(self):
+        """测试窗口满时排队、超时重传以及确认后补发"""
+        sender = ReliableSender({"window": 2, "initial_rto": 1.0})
+        self.assertEqual(len(sender.send(b"1", now=0.0)), 1)
+        self.assertEqual(len(sender.send(b"2", now=0.0)), 1)
+        self.assertEqual(sender.send(b"3", now=0.0), [])
+        self.assertEqual(sender.pending, 3)
+
+        self.assertEqual(sender.poll(now=0.5), [])
+        retransmitted = sender.poll(now=1.5)
+        self.assertEqual(len(retransmitted), 2)
+        self.assertEqual(sender.retransmits, 2)
+
+        # 确认 1 后窗口腾出，第 3 个包发出；重传过的包不参与 RTT 采样
+        packets = sender.on_ack(1, now=1.6)
+        self.assertEqual([unwrap(loads(p))[0] for p in packets], [3])
+        self.assertIsNone(sender.rtt.srtt)
+        sender.on_ack(3, now=1.7)
+        self.assertEqual(sender.pending, 0)
+
+    def test_fast_retransmit_and_give_up(self):
+        """测试被选择确认越过多次的包快速重传，超过重试次数后放弃"""
+        sender = ReliableSender({"max_retries": 1})
+        for i in range(5):
+            sender.send(str(i).encode(), now=0.0)
+        self.assertEqual(sender.on_ack(0, [2], now=0.1), [])
+        self.assertEqual(sender.on_ack(0, [2, 3], now=0.1), [])
+        packets = sender.on_ack(0, [2, 3, 4], now=0.1)
+        self.assertEqual([unwrap(loads(p))[0] for p in packets], [1])
+        self.assertIsNotNone(sender.rtt.srtt)
+
+        sender.on_ack(0, [2, 3, 4, 5], now=0.2)
+        sender.poll(now=100.0)
+        self.assertEqual(sender.lost, 1)
+        self.assertEqual(sender.pending, 0)
+
+    def test_receiver_dedupe_and_ack(self):
+        """测试接收方去重并生成累计与选择确认"""
+        receiver = ReliableReceiver()
+        self.assertTrue(receiver.on_packet(1))
+        self.assertTrue(receiver.on_packet(3))
+        self.assertFalse(receiver.on_packet(3))
+        self.assertFalse(receiver.on_packet(1))
+        self.assertEqual(receiver.ack_fields(), {"ack": 1, "sack": [3]})
+        self.assertTrue(receiver.on_packet(2))
+        self.assertEqual(receiver.ack_fields(), {"ack": 3, "sack": []})
+        self.assertEqual(receiver.duplicates, 2)
+
+class TestReliableTransport(unittest.TestCase):
+    CLIENT = ("127.0.0.1", 5001)
+    STRANGER = ("127.0.0.1", 6666)
+
+    def setUp(self):
+        self.fanout = FakeFanout()
+        self.transport = ReliableTransport(
+            self.fanout, authorize=lambda addr, body: addr == self.CLIENT and body.get("username") == "alice"
+        )
+
+    def test_unauthorized_address_gets_no_session(self):
+        """测试未认可的地址发来可靠包时不建立会话、不回复确认，负载按普通包返回"""
+        body = {"command": "message", "username": "mallory"}
+        for seq in range(1, 100):
+            self.assertEqual(self.transport.receive(self.STRANGER, {"rel": seq, "body": body}), body)
+        self.assertNotIn(self.STRANGER, self.transport)
+        self.assertEqual(self.transport.summary()["sessions"], 0)
+        self.assertEqual(self.fanout.socket.sent, [])
+
+    def test_authorized_address_resumes_numbering(self):
+        """测试已登录客户端的可靠包从当前序号接续建立会话，重复的包被丢弃"""
+        body = {"command": "message", "username": "alice"}
+        self.assertEqual(self.transport.receive(self.CLIENT, {"rel": 7, "body": body}), body)
+        self.assertIn(self.CLIENT, self.transport)
+        self.assertIsNone(self.transport.receive(self.CLIENT, {"rel": 7, "body": body}))
+        self.assertEqual(self.fanout.socket.sent[-1], ({"type": "ack", "ack": 7, "sack": []}, self.CLIENT))
+
+    def test_no_authorize_never_opens(self):
+        transport = ReliableTransport(self.fanout)
+        transport.receive(self.CLIENT, {"rel": 1, "body": {"username": "alice"}})
+        self.assertNotIn(self.CLIENT, transport)
+
+if __name__ == '__main__':
+    unittest.main()
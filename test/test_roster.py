@@ -0,0 +1,35 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.roster import RosterLog
+
+class TestRosterLog(unittest.TestCase):
+    def test_diff_since_version(self):
+        """测试差异只包含净变化"""
+        roster = RosterLog({"max_log": 10})
+        roster.record("general", "alice", True)
+        roster.record("general", "bob", True)
+        since = roster.version("general")
+        roster.record("general", "carol", True)
+        roster.record("general", "bob", False)
+        roster.record("general", "dave", True)
+        roster.record("general", "dave", False)   # 加入后离开，不出现在差异中
+        roster.record("general", "alice", False)
+        roster.record("general", "alice", True)   # 离开后重新加入，不出现在差异中
+        self.assertEqual(roster.diff("general", since, roster.epoch), (8, ["carol"], ["bob"]))
+        self.assertEqual(roster.diff("general", 8, roster.epoch), (8, [], []))
+
+    def test_full_list_required(self):
+        """测试版本超出记录范围或 epoch 不符时需要完整列表"""
+        roster = RosterLog({"max_log": 2})
+        for name in ("a", "b", "c"):
+            roster.record("general", name, True)
+        self.assertIsNone(roster.diff("general", 0, roster.epoch))
+        self.assertEqual(roster.diff("general", 1, roster.epoch), (3, ["b", "c"], []))
+        self.assertIsNone(roster.diff("general", 3, "old-epoch"))
+        self.assertIsNone(roster.diff("general", 5, roster.epoch))
+
+if __name__ == '__main__':
+    unittest.main()
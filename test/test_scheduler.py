@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.scheduler import IngressScheduler
+
+class TestIngressScheduler(unittest.TestCase):
+    def setUp(self):
+        self.handled = []
+        self.shed = []
+        self.scheduler = IngressScheduler(
+            lambda message, addr: self.handled.append(message["command"]),
+            lambda message, addr, retry_after: self.shed.append((message["command"], retry_after)),
+            {"shed_latency": 0.5, "max_queue": 3, "retry_after": 1.0}
+        )
+
+    def drain(self):
+        while self.scheduler.process(timeout=0):
+            pass
+
+    def test_heartbeats_first(self):
+        """测试心跳先于排在前面的普通和低优先级请求处理"""
+        for command in ("register", "message", "heartbeat", "channel_history", "heartbeat", "message"):
+            self.assertTrue(self.scheduler.submit({"command": command}, None))
+        self.drain()
+        self.assertEqual(self.handled, ["heartbeat", "heartbeat", "message", "message",
+                                        "register", "channel_history"])
+
+    def test_shed_on_submit_when_backlogged(self):
+        """测试普通请求已积压超过阈值时直接拒绝新的低优先级请求"""
+        now = time.monotonic()
+        self.scheduler.submit({"command": "message"}, None, now=now - 2)
+        self.assertFalse(self.scheduler.submit({"command": "register"}, None, now=now))
+        self.assertTrue(self.scheduler.submit({"command": "heartbeat"}, None, now=now))
+        self.assertTrue(self.scheduler.submit({"command": "auth"}, None, now=now))
+        self.assertEqual(self.shed, [("register", 4.0)])
+
+    def test_shed_stale_on_process(self):
+        """测试排队过久的低优先级请求不再处理，普通请求仍然处理"""
+        stale = time.monotonic() - 1
+        self.scheduler.submit({"command": "private_history"}, None, now=stale)
+        self.scheduler.submit({"command": "message"}, None, now=stale)
+        self.drain()
+        self.assertEqual(self.handled, ["message"])
+        self.assertEqual([command for command, _ in self.shed], ["private_history"])
+        self.assertGreaterEqual(self.shed[0][1], 2.0)
+
+    def test_queue_limit(self):
+        """测试队列满时拒绝新请求，并记入统计"""
+        for _ in range(4):
+            self.scheduler.submit({"command": "message"}, None)
+        self.assertEqual(self.shed, [("message", 1.0)])
+        report = self.scheduler.report()
+        self.assertEqual(report["shed"], 1)
+        self.assertEqual(report["queued"], 3)
+        self.drain()
+        self.assertEqual(self.scheduler.report()["processed"], [0, 3, 0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.send_queue import SendQueueManager
+
+A = ("127.0.0.1", 5001)
+B = ("127.0.0.1", 5002)
+
+class FakeFanout:
+    def __init__(self):
+        self.sent = []  # (负载, 地址列表)
+
+    def send(self, payload, addrs):
+        self.sent.append((payload, list(addrs)))
+
+def make_manager(policy="drop_oldest", **config):
+    fanout = FakeFanout()
+    disconnected = []
+    manager = SendQueueManager(fanout, {"policy": policy, "max_depth": 3, "max_pps": 100,
+                                        "burst": 5, **config},
+                               on_disconnect=disconnected.append)
+    return manager, fanout, disconnected
+
+def queued(manager, addr):
+    return [payload for payload, _ in manager._queues[addr].items]
+
+class TestSlowClientPolicies(unittest.TestCase):
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            make_manager("block")
+
+    def test_drop_oldest(self):
+        """测试队列满时丢弃最旧的负载，深度保持在 max_depth"""
+        manager, _, disconnected = make_manager("drop_oldest")
+        for i in range(5):
+            manager.enqueue(f"m{i}".encode(), [A])
+        self.assertEqual(queued(manager, A), [b"m2", b"m3", b"m4"])
+        self.assertEqual(manager.metrics()[A]["drops"], 2)
+        self.assertEqual(disconnected, [])
+
+    def test_coalesce(self):
+        """测试队列满时用新负载替换相同 key 的旧负载，没有相同 key 时丢弃最旧的"""
+        manager, _, _ = make_manager("coalesce")
+        manager.enqueue(b"presence v1", [A], key="presence")
+        manager.enqueue(b"m1", [A])
+        manager.enqueue(b"m2", [A])
+        manager.enqueue(b"presence v2", [A], key="presence")
+        self.assertEqual(queued(manager, A), [b"m1", b"m2", b"presence v2"])
+
+        manager.enqueue(b"roster", [A], key="roster")
+        self.assertEqual(queued(manager, A), [b"m2", b"presence v2", b"roster"])
+        metrics = manager.metrics()[A]
+        self.assertEqual((metrics["coalesced"], metrics["drops"]), (1, 1))
+
+    def test_disconnect(self):
+        """测试队列满时清空队列并断开慢客户端，不影响其他客户端"""
+        manager, _, disconnected = make_manager("disconnect")
+        for i in range(3):
+            manager.enqueue(f"m{i}".encode(), [A])
+        manager.enqueue(b"m3", [A, B])
+        self.assertEqual(disconnected, [A])
+        self.assertEqual(queued(manager, A), [])
+        self.assertEqual(queued(manager, B), [b"m3"])
+        self.assertEqual(manager.summary()["disconnects"], 1)
+
+    def test_remove(self):
+        manager, _, _ = make_manager()
+        manager.enqueue(b"m", [A])
+        manager.remove(A)
+        self.assertEqual(manager.summary()["clients"], 0)
+
+class TestPacing(unittest.TestCase):
+    def test_burst_then_rate(self):
+        """测试每个客户端先按 burst 发送，之后按 max_pps 补充令牌"""
+        manager, fanout, _ = make_manager(max_depth=100)
+        for i in range(20):
+            manager.enqueue(f"m{i}".encode(), [A])
+
+        manager._drain()
+        self.assertEqual(len(fanout.sent), 5)
+        self.assertEqual(manager.summary()["queued"], 15)
+
+        # 令牌用完后经过 30ms，按 100 包/秒补充 3 个令牌
+        queue = manager._queues[A]
+        queue.tokens = 0
+        queue.last_refill = time.monotonic() - 0.03
+        manager._drain()
+        self.assertEqual(len(fanout.sent), 8)
+
+        # 空闲很久也只补满到 burst
+        queue.last_refill -= 10
+        manager._drain()
+        self.assertEqual(len(fanout.sent), 13)
+        self.assertEqual(manager.metrics()[A]["sent"], 13)
+
+    def test_shared_payload_batched(self):
+        """测试同一份负载发往多个客户端时合并为一次发送"""
+        manager, fanout, _ = make_manager()
+        manager.enqueue(b"hello", [A, B])
+        manager._drain()
+        self.assertEqual(len(fanout.sent), 1)
+        self.assertEqual(sorted(fanout.sent[0][1]), [A, B])
+        self.assertEqual(manager.summary()["queued"], 0)
+        self.assertEqual(manager._active, set())
+
+    def test_clients_paced_independently(self):
+        """测试一个客户端的令牌耗尽不影响另一个客户端"""
+        manager, fanout, _ = make_manager(max_depth=100)
+        for i in range(10):
+            manager.enqueue(f"a{i}".encode(), [A])
+        manager._drain()
+        manager.enqueue(b"b0", [B])
+        manager._drain()
+        self.assertIn((b"b0", [B]), fanout.sent)
+        self.assertGreaterEqual(manager.metrics()[A]["depth"], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,295 @@
+import unittest
+import sys
+import os
+from collections import defaultdict
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import loads
+from server.chat_server import ChatServer
+from server.config import MESSAGE_CONFIG, PIPELINE_CONFIG
+from server.models.channel import ChannelManager
+from server.models.user import User
+from server.utils.cache import TwoTierCache
+from server.utils.pipeline import Request
+from server.utils.presence import PresenceAggregator
+from server.utils.reliable_transport import ReliableTransport
+from server.utils.roster import RosterLog
+from server.utils.session import SessionStore
+from server.utils.snowflake import SnowflakeGenerator
+from server.utils.subscription import SubscriptionStore
+
+ALICE = ("127.0.0.1", 5001)
+BOB = ("127.0.0.1", 5002)
+NEW_ADDR = ("127.0.0.1", 6001)
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((loads(data), addr))
+
+class FakeChannelDB:
+    """channels 和 channel_members 两张表：secret 为 bob 所有的私有频道，alice 是成员"""
+
+    def __init__(self):
+        self.channels = {
+            name: {"id": channel_id, "name": name, "description": "", "created_at": datetime(2024, 1, 1),
+                   "is_private": is_private, "owner_id": owner_id}
+            for channel_id, name, is_private, owner_id in ((1, "general", False, None), (10, "secret", True, 1))
+        }
+        self.members = {(10, 2)}
+
+    def execute_query(self, query, params=None, read_only=False, session=None):
+        if params is None:
+            return [row for row in self.channels.values() if not row["is_private"]]
+        if "channel_members" in query:
+            return [{"user_id": user_id} for channel_id, user_id in self.members if channel_id == params[0]]
+        row = self.channels.get(params[0])
+        return [row] if row else []
+
+    def execute_update(self, query, params=None, session=None):
+        before = len(self.members)
+        self.members.discard((params[0], params[1]))
+        return before - len(self.members)
+
+class FakeUserManager:
+    def __init__(self):
+        self.users = {name: User(id=user_id, username=name, password_hash="", salt="",
+                                 created_at=datetime(2024, 1, 1))
+                      for user_id, name in ((1, "bob"), (2, "alice"))}
+        self.channels = {}
+
+    def get_user_by_username(self, username):
+        return self.users.get(username)
+
+    def update_user_channel(self, user_id, channel):
+        self.channels[user_id] = channel
+
+    def update_last_login(self, user_id):
+        pass
+
+class FakeMessageManager:
+    def __init__(self):
+        self.messages = []
+
+    def get_channel_messages(self, channel_id, limit=50, session=None, before_id=None):
+        return self.messages
+
+class FakeOfflineManager:
+    def __init__(self):
+        self.queued = {}
+
+    def drain(self, user_id):
+        return self.queued.pop(user_id, [])
+
+class FakeFanout:
+    """可靠传输下层的广播引擎，发出的包记录在 FakeSocket 中"""
+
+    def __init__(self, sock):
+        self.socket = sock
+
+    def send(self, payload, addrs):
+        for addr in addrs:
+            self.socket.sendto(payload, addr)
+        return 0
+
+    def send_each(self, packets):
+        for payload, addr in packets:
+            self.socket.sendto(payload, addr)
+        return 0
+
+def make_server():
+    """不连接数据库、不绑定端口的服务器，只设置处理函数用到的属性"""
+    server = ChatServer.__new__(ChatServer)
+    server.socket = FakeSocket()
+    server.transport = None
+    server.send_queues = None
+    server.clients = {}
+    server.heartbeats = {}
+    server.channel_members = defaultdict(set)
+    server.sessions = SessionStore()
+    server.subscriptions = SubscriptionStore()
+    server.presence = PresenceAggregator(lambda channel, payload: None)
+    server.roster = RosterLog()
+    server.id_generator = SnowflakeGenerator()
+    server.user_manager = FakeUserManager()
+    server.channel_manager = ChannelManager(FakeChannelDB(), TwoTierCache(None))
+    server.message_manager = FakeMessageManager()
+    server.offline_manager = FakeOfflineManager()
+    # 密码校验不在这里测试，已注册的用户即可登录
+    server._authenticate_user = lambda username, password: server.user_manager.get_user_by_username(username)
+    return server
+
+def request(command, username="alice", addr=ALICE):
+    return Request(addr, message={"command": command, "username": username})
+
+class TestRefreshLiveness(unittest.TestCase):
+    def setUp(self):
+        self.server = make_server()
+        self.server.clients["alice"] = (ALICE, "general")
+        self.dispatched = []
+
+    def run_stage(self, req):
+        self.server._refresh_liveness(req, self.dispatched.append)
+
+    def test_known_address_refreshes_and_dispatches(self):
+        self.run_stage(request("message"))
+        self.assertIn("alice", self.server.heartbeats)
+        self.assertEqual(len(self.dispatched), 1)
+        self.assertEqual(self.server.socket.sent, [])
+
+    def test_new_address_requires_resume(self):
+        """测试已登录用户的数据包来自新地址时只提示恢复会话，不执行命令"""
+        self.run_stage(request("message", addr=NEW_ADDR))
+        self.assertEqual(self.dispatched, [])
+        self.assertEqual(self.server.socket.sent, [({"type": "resume_required"}, NEW_ADDR)])
+        self.assertNotIn("alice", self.server.heartbeats)
+
+    def test_session_commands_pass_from_any_address(self):
+        """测试认证、注册、恢复和确认不要求来自已登记的地址"""
+        for command in ("auth", "register", "resume", "ack"):
+            self.run_stage(request(command, addr=NEW_ADDR))
+        self.assertEqual([req.command for req in self.dispatched], ["auth", "register", "resume", "ack"])
+        self.assertEqual(self.server.socket.sent, [])
+
+    def test_unknown_user_passes_through(self):
+        """测试未登录用户的请求交给分发阶段处理（由会话校验拒绝）"""
+        self.run_stage(request("message", username="mallory", addr=NEW_ADDR))
+        self.assertEqual(len(self.dispatched), 1)
+
+class TestResumeAfterKick(unittest.TestCase):
+    def setUp(self):
+        self.server = make_server()
+        self.server.clients["bob"] = (BOB, "general")
+        # alice 在 secret 频道中断开，会话仍可恢复
+        self.token = self.server.sessions.create("alice", "secret", 0)
+        self.server.sessions.detach("alice")
+        self.server.sessions.record_channel("secret", 100, b'{"type":"message","content":"secret"}')
+
+    def resume(self):
+        self.server.socket.sent.clear()
+        self.server._handle_resume({"command": "resume", "username": "alice", "token": self.token}, NEW_ADDR)
+        return [message for message, addr in self.server.socket.sent if addr == NEW_ADDR]
+
+    def assert_moved_to_default(self, replies):
+        self.assertEqual(replies[0]["type"], "resumed")
+        self.assertEqual(replies[0]["channel"], "general")
+        self.assertEqual(replies[0]["replayed"], 0)
+        self.assertNotIn({"type": "message", "content": "secret"}, replies)
+        self.assertEqual(self.server.clients["alice"], (NEW_ADDR, "general"))
+        self.assertNotIn("alice", self.server.channel_members["secret"])
+
+    def test_kick_while_offline_then_resume(self):
+        """测试离线时被移出私有频道的用户恢复会话后回到默认频道，且不补发该频道的消息"""
+        self.server._handle_channel_member(
+            {"command": "kick", "username": "bob", "channel": "secret", "target": "alice"}, invite=False
+        )
+        self.assertEqual(self.server.socket.sent[-1][0]["ok"], True)
+        replies = self.resume()
+        self.assert_moved_to_default(replies)
+
+    def test_membership_removed_elsewhere(self):
+        """测试成员关系在其他进程中被移除时，恢复会话同样检查访问权限"""
+        self.server.channel_manager.remove_member(10, 2)
+        replies = self.resume()
+        self.assert_moved_to_default(replies)
+        self.assertIn({"type": "kicked", "channel": "secret", "current_channel": "general"}, replies)
+        self.assertEqual(self.server.user_manager.channels[2], "general")
+
+    def test_member_resumes_into_private_channel(self):
+        """测试仍是成员的用户恢复到原频道并收到补发"""
+        replies = self.resume()
+        self.assertEqual(replies[0]["channel"], "secret")
+        self.assertEqual(replies[0]["replayed"], 1)
+        self.assertIn({"type": "message", "content": "secret"}, replies)
+        self.assertIn("alice", self.server.channel_members["secret"])
+
+class TestAuth(unittest.TestCase):
+    def setUp(self):
+        self.server = make_server()
+
+    def auth(self, **fields):
+        self.server._handle_auth({"command": "auth", "username": "alice", "password": "x", **fields}, ALICE)
+        return [message for message, addr in self.server.socket.sent]
+
+    def test_login_packet_order(self):
+        """测试登录回复依次为频道列表、历史、离线消息、订阅，客户端把频道列表后的第一条当作历史"""
+        self.server.offline_manager.queued[2] = [
+            {"id": 7, "sender": "bob", "content": "hi", "timestamp": "0", "channel": "general"}
+        ]
+        replies = self.auth()
+        self.assertEqual([reply["type"] for reply in replies],
+                         ["channel_list", "history", "offline_messages", "subscriptions"])
+        self.assertEqual(replies[0]["channels"][0]["name"], "general")
+
+    def test_reliable_not_offered_when_disabled(self):
+        """测试服务器未启用可靠传输时认证回复不带 reliable，即使客户端请求了"""
+        replies = self.auth(reliable=True)
+        self.assertEqual(replies[0]["type"], "channel_list")
+        self.assertNotIn("reliable", replies[0])
+
+    def test_reliable_negotiated_when_enabled(self):
+        """测试启用可靠传输且客户端请求时回复 reliable，并为该地址建立会话"""
+        self.server.transport = ReliableTransport(FakeFanout(self.server.socket))
+        replies = self.auth(reliable=True)
+        self.assertEqual(replies[0]["body"]["type"], "channel_list")
+        self.assertTrue(replies[0]["body"]["reliable"])
+        self.assertIn(ALICE, self.server.transport)
+
+    def test_plain_client_on_reliable_server(self):
+        self.server.transport = ReliableTransport(FakeFanout(self.server.socket))
+        replies = self.auth()
+        self.assertNotIn("reliable", replies[0])
+        self.assertNotIn(ALICE, self.server.transport)
+
+class TestDispatchLimits(unittest.TestCase):
+    """限速和消息长度检查默认关闭，只在配置后生效"""
+
+    def setUp(self):
+        self.rate_limits = PIPELINE_CONFIG["rate_limits"]
+        self.enforce_max_length = PIPELINE_CONFIG["enforce_max_length"]
+
+    def tearDown(self):
+        PIPELINE_CONFIG["rate_limits"] = self.rate_limits
+        PIPELINE_CONFIG["enforce_max_length"] = self.enforce_max_length
+
+    def make_server(self):
+        server = make_server()
+        server._build_dispatcher()
+        server.handled = []
+        server.dispatcher.register("message", lambda request: server.handled.append(request.message["content"]),
+                                   fields=("content",))
+        server.clients["alice"] = ALICE
+        return server
+
+    def send(self, server, content):
+        server._dispatch({"command": "message", "username": "alice", "content": content}, ALICE)
+
+    def test_defaults_do_not_limit(self):
+        """测试默认配置下连续发送和超长消息都照常处理"""
+        server = self.make_server()
+        self.assertEqual(server.rate_limiters, {})
+        long_content = "x" * (MESSAGE_CONFIG["max_length"] + 1)
+        for _ in range(MESSAGE_CONFIG["rate_limit"] + 5):
+            self.send(server, "hi")
+        self.send(server, long_content)
+        self.assertEqual(len(server.handled), MESSAGE_CONFIG["rate_limit"] + 6)
+        self.assertEqual(server.handled[-1], long_content)
+        self.assertEqual(server.socket.sent, [])
+
+    def test_configured_limits(self):
+        """测试配置后超出速率的消息收到 rate_limited，超长消息被丢弃"""
+        PIPELINE_CONFIG["rate_limits"] = {"message": {"per_minute": 60, "burst": 2}}
+        PIPELINE_CONFIG["enforce_max_length"] = True
+        server = self.make_server()
+        self.send(server, "x" * (MESSAGE_CONFIG["max_length"] + 1))
+        for content in ("a", "b", "c"):
+            self.send(server, content)
+        self.assertEqual(server.handled, ["a", "b"])
+        reply, addr = server.socket.sent[0]
+        self.assertEqual((reply["type"], reply["command"], addr), ("rate_limited", "message", ALICE))
+
+if __name__ == '__main__':
+    unittest.main()
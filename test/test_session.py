@@ -0,0 +1,37 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.session import SessionStore
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.store = SessionStore({"ttl": 60, "channel_buffer": 3, "private_buffer": 2})
+
+    def test_resume_requires_token(self):
+        """测试令牌错误或过期时无法恢复"""
+        token = self.store.create("alice", "general", 0)
+        self.assertIsNone(self.store.resume("alice", "wrong"))
+        self.assertIsNone(self.store.resume("bob", token))
+        self.store.detach("alice", now=0)
+        self.assertIsNotNone(self.store.resume("alice", token, now=30))
+        self.store.detach("alice", now=100)
+        self.assertIsNone(self.store.resume("alice", token, now=200))
+
+    def test_replay_after_last_id(self):
+        """测试按 id 补发当前频道和私聊中错过的消息"""
+        token = self.store.create("alice", "general", 10)
+        for message_id in (5, 11, 12):
+            self.store.record_channel("general", message_id, f"g{message_id}".encode())
+        self.store.record_channel("random", 13, b"r13")
+        self.store.record_private(["alice", "bob"], 14, b"p14")
+        self.store.record_channel("general", 15, b"g15")
+
+        session = self.store.resume("alice", token)
+        self.assertEqual(self.store.replay(session, 11), [b"g12", b"p14", b"g15"])
+        # 早于加入频道的消息不补发，频道缓冲区只保留最近的消息
+        self.assertEqual(self.store.replay(session, 0), [b"g11", b"g12", b"p14", b"g15"])
+
+if __name__ == '__main__':
+    unittest.main()
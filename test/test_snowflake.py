@@ -0,0 +1,41 @@
+import unittest
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.snowflake import SnowflakeGenerator
+
+class TestSnowflake(unittest.TestCase):
+    def test_monotonic_and_unique(self):
+        """测试多线程并发生成的 ID 唯一且单线程内严格递增"""
+        generator = SnowflakeGenerator(node_id=5)
+        results = []
+
+        def worker():
+            ids = [generator.next_id() for _ in range(5000)]
+            self.assertEqual(ids, sorted(ids))
+            results.extend(ids)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 20000)
+        self.assertLess(max(results), 2 ** 63)
+
+    def test_layout(self):
+        """测试 ID 中包含节点 ID 和生成时间，不同节点不冲突"""
+        a = SnowflakeGenerator(node_id=1)
+        b = SnowflakeGenerator(node_id=2)
+        id_a, id_b = a.next_id(), b.next_id()
+        self.assertNotEqual(id_a, id_b)
+        self.assertEqual((id_a >> 12) & SnowflakeGenerator.MAX_NODE_ID, 1)
+        self.assertAlmostEqual(a.timestamp_of(id_a), time.time(), delta=1)
+        with self.assertRaises(ValueError):
+            SnowflakeGenerator(node_id=1024)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.subscription import SubscriptionStore
+from fakes import FakeRedis
+
+class TestSubscriptionStore(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.store = SubscriptionStore(self.redis, {"max_channels": 3})
+
+    def test_subscribe_limit_and_unsubscribe(self):
+        """测试订阅数量上限与取消订阅"""
+        self.assertEqual(self.store.subscribe("alice", ["a", "b"]), ["a", "b"])
+        self.assertEqual(self.store.subscribe("alice", ["b", "c", "d"]), ["c"])
+        self.assertEqual(self.store.channels("alice"), {"a", "b", "c"})
+        self.assertEqual(self.store.unsubscribe("alice", ["a", "x"]), ["a"])
+        self.assertFalse(self.store.is_subscribed("alice", "a"))
+        self.assertTrue(self.store.is_subscribed("alice", "b"))
+
+    def test_increment_only_subscribers(self):
+        """测试只给订阅了该频道的用户累加未读数，查看后清零"""
+        self.store.subscribe("alice", ["random"])
+        self.store.subscribe("bob", ["help"])
+        for _ in range(3):
+            self.store.increment(["alice", "bob", "carol"], "random")
+        self.assertEqual(self.store.unread("alice"), {"random": 3})
+        self.assertEqual(self.store.unread("bob"), {"help": 0})
+        self.store.clear("alice", "random")
+        self.assertEqual(self.store.unread("alice"), {"random": 0})
+
+    def test_flush_batches_dirty_users(self):
+        """测试变化的计数在一次 pipeline 中写入 Redis，无变化时不写"""
+        self.store.subscribe("alice", ["random"])
+        self.store.subscribe("bob", ["help"])
+        self.store.increment(["alice"], "random")
+        self.store.flush()
+        self.assertEqual(self.redis.executed, 1)
+        self.assertEqual(self.redis.hashes["unread:alice"], {"random": 1})
+        self.assertEqual(self.redis.hashes["unread:bob"], {"help": 0})
+        self.store.flush()
+        self.assertEqual(self.redis.executed, 1)
+
+    def test_unload_and_load(self):
+        """测试断开时写回并移出内存，再次登录时从 Redis 载入"""
+        self.store.subscribe("alice", ["random", "help"])
+        self.store.increment(["alice"], "help")
+        self.store.unload("alice")
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.load("alice"), {"random": 0, "help": 1})
+        self.store.unsubscribe("alice", ["random", "help"])
+        self.store.flush()
+        self.assertNotIn("unread:alice", self.redis.hashes)
+
+    def test_without_redis(self):
+        """测试 Redis 不可用时仍在内存中工作"""
+        store = SubscriptionStore(None)
+        store.subscribe("alice", ["random"])
+        store.increment(["alice"], "random")
+        store.flush()
+        self.assertEqual(store.load("alice"), {"random": 1})
+
+if __name__ == '__main__':
+    unittest.main()